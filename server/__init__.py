@@ -54,8 +54,19 @@ from server import startup
 from server.routes import browseroute, frontpage, getterroutes, hintroutes, debuggingroutes, lexicalroutes, searchroute, \
 	selectionroutes, textandindexroutes, resetroutes, cssroutes, vectorroutes, authenticationroutes
 
-if hipparchia.config['AUTOVECTORIZE']:
-	from server.threading import vectordbautopilot
+# the spawned workers of the vectorbot pool import all of this too: they must not start the background jobs again
+if multiprocessing.current_process().name == 'MainProcess':
+	if hipparchia.config['AUTOVECTORIZE']:
+		from server.threading import vectordbautopilot
+
+	if hipparchia.config['DICTIONARYENTRYPREWARM']:
+		from server.threading import dictionaryprewarmer
+
+	if hipparchia.config['INCLUDELISTCACHE']:
+		from server.threading import includelistjanitor
+
+	if hipparchia.config['MORPHOLOGYCHARTPREWARM']:
+		from server.threading import morphologychartprewarmer
 
 # put this here and not in 'run.py': otherwise gunicorn will not see it
 hipparchia.config.update(SESSION_COOKIE_SECURE=False, SESSION_COOKIE_HTTPONLY=True, SESSION_COOKIE_SAMESITE='Lax')
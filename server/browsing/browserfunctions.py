@@ -7,8 +7,9 @@
 """
 
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import session
+from flask import copy_current_request_context, session
 
 from server import hipparchia
 from server.dbsupport.citationfunctions import finddblinefromincompletelocus, finddblinefromlocus, locusintocitation, \
@@ -17,17 +18,105 @@ from server.dbsupport.dblinefunctions import dblineintolineobject, returnfirstor
 from server.dbsupport.miscdbfunctions import perseusidmismatch, simplecontextgrabber
 from server.formatting.bibliographicformatting import formatpublicationinfo
 from server.formatting.browserformatting import insertparserids
-from server.hipparchiaobjects.browserobjects import BrowserOutputObject, BrowserPassageObject
+from server.formatting.miscformatting import consolewarning
+from server.formatting.renderingpatterns import findlinemetadata
+from server.hipparchiaobjects.browserobjects import BrowserOutputObject, BrowserPassageObject, RenderedPassageCache
+from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.hipparchiaobjects.dbtextobjects import dbAuthor, dbOpus
 from server.hipparchiaobjects.worklineobject import dbWorkLine
 from server.listsandsession.sessionfunctions import findactivebrackethighlighting
 from server.startup import workdict
 from server.textsandindices.textandindiceshelperfunctions import paragraphformatting, setcontinuationvalue
 
+browserprefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='browserprefetcher')
+
 
 def buildbrowseroutputobject(authorobject: dbAuthor, workobject: dbOpus, locusindexvalue: int, dbcursor) -> BrowserOutputObject:
 	"""
 
+	the passage html comes out of the RenderedPassageCache if we have seen it before; otherwise it is built
+
+	then the passages on either side get built in the background so that paging forwards or backwards will
+	find them waiting in the cache
+
+	:param authorobject:
+	:param workobject:
+	:param locusindexvalue:
+	:param dbcursor:
+	:return:
+	"""
+
+	cache = RenderedPassageCache()
+	key = cache.keyfor(workobject.universalid, locusindexvalue)
+
+	passagehtml = cache.fetch(key)
+	if passagehtml is None:
+		passagehtml = renderbrowserpassage(authorobject, workobject, locusindexvalue, dbcursor)
+		cache.store(key, passagehtml)
+
+	outputobject = BrowserOutputObject(authorobject, workobject, locusindexvalue)
+	outputobject.browserhtml = passagehtml
+
+	if hipparchia.config['BROWSERPREFETCH']:
+		neighbors = [outputobject.psgstarts, outputobject.psgends]
+		neighbors = [n for n in neighbors if n != locusindexvalue]
+		prefetchbrowserpassages(authorobject, workobject, neighbors)
+
+	return outputobject
+
+
+def prefetchbrowserpassages(authorobject: dbAuthor, workobject: dbOpus, locations: list):
+	"""
+
+	build the passages at these locations in the background and park them in the RenderedPassageCache
+
+	the rendering code wants a session: the job carries a copy of this request's context along with it
+
+	one worker does all of the prefetching; the keys that were claimed are always released at the end whether
+	or not the passage got built
+
+	:param authorobject:
+	:param workobject:
+	:param locations:
+	:return:
+	"""
+
+	cache = RenderedPassageCache()
+	keys = [(loc, cache.keyfor(workobject.universalid, loc)) for loc in locations]
+	keys = [k for k in keys if cache.claim(k[1])]
+
+	if not keys:
+		return
+
+	@copy_current_request_context
+	def prefetcher():
+		try:
+			dbconnection = ConnectionObject()
+			try:
+				dbcursor = dbconnection.cursor()
+				for loc, key in keys:
+					try:
+						cache.store(key, renderbrowserpassage(authorobject, workobject, loc, dbcursor))
+					except Exception as e:
+						# the passage will just get built the old way if anyone asks for it
+						consolewarning('prefetchbrowserpassages() failed for {w} @ {l}: {e}'.format(w=workobject.universalid, l=loc, e=e))
+			finally:
+				dbconnection.connectioncleanup()
+		finally:
+			for loc, key in keys:
+				cache.release(key)
+
+	try:
+		browserprefetcher.submit(prefetcher)
+	except RuntimeError:
+		# the executor has been shut down
+		for loc, key in keys:
+			cache.release(key)
+
+
+def renderbrowserpassage(authorobject: dbAuthor, workobject: dbOpus, locusindexvalue: int, dbcursor) -> str:
+	"""
+
 	this function does a lot of work via a number of subfunctions
 
 	lots of refactoring required if you change anything...
@@ -35,8 +124,6 @@ def buildbrowseroutputobject(authorobject: dbAuthor, workobject: dbOpus, locusin
 	:param authorobject:
 	:param workobject:
 	:param locusindexvalue:
-	:param linesofcontext:
-	:param numbersevery:
 	:param dbcursor:
 	:return:
 	"""
@@ -124,11 +211,7 @@ def buildbrowseroutputobject(authorobject: dbAuthor, workobject: dbOpus, locusin
 		previousline = line
 
 	# [c] build the output
-	outputobject = BrowserOutputObject(authorobject, workobject, locusindexvalue)
-
-	outputobject.browserhtml = passage.generatepassagehtml()
-
-	return outputobject
+	return passage.generatepassagehtml()
 
 
 def checkfordocumentmetadata(workline: dbWorkLine, workobject: dbOpus) -> str:
@@ -146,28 +229,20 @@ def checkfordocumentmetadata(workline: dbWorkLine, workobject: dbOpus) -> str:
 	metadata = list()
 	linetemplate = fetchhtmltemplateformetadatarow()
 
-	datefinder = re.compile(r'<hmu_metadata_date value="(.*?)" />')
-	regionfinder = re.compile(r'<hmu_metadata_region value="(.*?)" />')
-	cityfinder = re.compile(r'<hmu_metadata_city value="(.*?)" />')
-	pubfinder = re.compile(r'<hmu_metadata_publicationinfo value="(.*?)" />')
-
-	date = re.search(datefinder, workline.markedup)
-	region = re.search(regionfinder, workline.markedup)
-	city = re.search(cityfinder, workline.markedup)
-	pub = re.search(pubfinder, workline.markedup)
+	found = findlinemetadata(workline.markedup)
 
 	metadatatags = list()
-	if region:
-		metadatatags.append(('Region', 'regioninfo', region.group(1)))
-	if city:
-		metadatatags.append(('City', 'cityinfo', city.group(1)))
+	if 'region' in found:
+		metadatatags.append(('Region', 'regioninfo', found['region']))
+	if 'city' in found:
+		metadatatags.append(('City', 'cityinfo', found['city']))
 
-	if workobject.provenance and city is None:
+	if workobject.provenance and 'city' not in found:
 		metadatatags.append(('Provenance', 'provenance', workobject.provenance))
-	if pub:
-		metadatatags.append(('Additional publication info', 'pubinfo', pub.group(1)))
-	if date:
-		metadatatags.append(('Editor\'s date', 'textdate', date.group(1)))
+	if 'publicationinfo' in found:
+		metadatatags.append(('Additional publication info', 'pubinfo', found['publicationinfo']))
+	if 'date' in found:
+		metadatatags.append(('Editor\'s date', 'textdate', found['date']))
 
 	for m in metadatatags:
 		metadata.append(linetemplate.format(lb=m[0], cl=m[1], tx=m[2]))
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import select
+from collections import deque
+from typing import List
+
+import psycopg2
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.connectionobject import AsyncConnectionObject, ConnectionObject
+
+
+def executequeriesconcurrently(querylist: List[tuple], readonly=True) -> List[list]:
+	"""
+
+	run a pile of small, independent queries at the same time instead of one after another
+
+	querylist is a list of (query, data) tuples; you get back a list of fetchall() results in the same order
+
+	this is for latency-bound fan-out work: fetching the context lines for search results that live in 40
+	different author tables, probing the wordcounts for every term in a phrase, etc. Each of these queries
+	is cheap for postgres; what costs is waiting for the round trip. So we keep ASYNCQUERYCONNECTIONS psycopg2
+	async connections busy and select() on them: the round trips overlap.
+
+	a query that fails yields an empty list (and a console warning); a connection that fails sends the
+	leftover work through executequeriessequentially()
+
+	:param querylist:
+	:param readonly:
+	:return:
+	"""
+
+	maxconnections = min(hipparchia.config['ASYNCQUERYCONNECTIONS'], len(querylist))
+
+	if maxconnections < 2:
+		return executequeriessequentially(querylist, readonly)
+
+	results = [list() for _ in querylist]
+	pending = deque(enumerate(querylist))
+
+	try:
+		connections = [AsyncConnectionObject(readonlyconnection=readonly) for _ in range(maxconnections)]
+	except psycopg2.OperationalError as e:
+		consolewarning('executequeriesconcurrently() could not open async connections: {e}'.format(e=e), color='red')
+		return executequeriessequentially(querylist, readonly)
+
+	ok = psycopg2.extensions.POLL_OK
+
+	while connections:
+		for c in connections:
+			if c.isready() and pending:
+				jobnumber, job = pending.popleft()
+				query, data = job
+				c.dispatch(jobnumber, query, data)
+
+		working = [c for c in connections if not c.isready()]
+		if not working:
+			break
+
+		readers = [c for c in working if c.state == psycopg2.extensions.POLL_READ]
+		writers = [c for c in working if c.state == psycopg2.extensions.POLL_WRITE]
+		select.select(readers, writers, list(), 1)
+
+		for c in working:
+			try:
+				state = c.poll()
+			except psycopg2.OperationalError as e:
+				# the connection itself is gone
+				consolewarning('async connection failed: {e}'.format(e=e), color='red')
+				if c.jobnumber is not None:
+					pending.appendleft((c.jobnumber, querylist[c.jobnumber]))
+				c.abandonjob()
+				c.state = None
+				connections.remove(c)
+				c.connectioncleanup()
+				continue
+			except psycopg2.Error as e:
+				# the query failed; the connection is still usable
+				consolewarning('async query failed: {q}\n\t{e}'.format(q=querylist[c.jobnumber][0], e=e), color='red')
+				c.abandonjob()
+				continue
+			if state == ok and c.jobnumber is not None:
+				results[c.jobnumber] = c.collect()
+
+	for c in connections:
+		c.connectioncleanup()
+
+	if pending:
+		leftovers = list(pending)
+		redone = executequeriessequentially([p[1] for p in leftovers], readonly)
+		for p, r in zip(leftovers, redone):
+			results[p[0]] = r
+
+	return results
+
+
+def executequeriessequentially(querylist: List[tuple], readonly=True) -> List[list]:
+	"""
+
+	the fallback for executequeriesconcurrently(): one normal connection and one query after another
+
+	:param querylist:
+	:param readonly:
+	:return:
+	"""
+
+	dbconnection = ConnectionObject(readonlyconnection=readonly)
+	dbconnection.setautocommit()
+	dbcursor = dbconnection.cursor()
+
+	results = list()
+	for query, data in querylist:
+		try:
+			dbcursor.execute(query, data)
+			if dbcursor.description:
+				results.append(dbcursor.fetchall())
+			else:
+				results.append(list())
+		except psycopg2.Error as e:
+			consolewarning('query failed: {q}\n\t{e}'.format(q=query, e=e), color='red')
+			results.append(list())
+
+	dbconnection.connectioncleanup()
+
+	return results
@@ -173,7 +173,8 @@ def bulklexicalgrab(listofwords: List[str], tabletouse: str, targetcolumn: str,
 
 	try:
 		dbcursor.execute(query)
-		results = resultiterator(dbcursor)
+		# not resultiterator(): the cursor is gone once the connection is cleaned up below
+		results = dbcursor.fetchall()
 	except psycopg2.ProgrammingError:
 		# if you do not have the wordcounts installed: 'ProgrammingError: relations "wordcounts_a" does not exist
 		results = list()
@@ -8,9 +8,11 @@
 
 import re
 
+from server import hipparchia
 from server.dbsupport.dblinefunctions import dblineintolineobject, returnfirstorlastlinenumber, worklinetemplate
 from server.formatting.miscformatting import consolewarning
 from server.formatting.wordformatting import avoidsmallvariants
+from server.hipparchiaobjects.citationtreeobjects import CitationTreeStore
 from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.hipparchiaobjects.dbtextobjects import dbOpus
 from server.hipparchiaobjects.worklineobject import dbWorkLine
@@ -86,6 +88,21 @@ def findvalidlevelvalues(workobject: dbOpus, partialcitationtuple: tuple, cursor
 		except IndexError:
 			atlevel = availablelevels
 
+	if hipparchia.config['CITATIONTREES']:
+		# the tree knows the answer without a trip through 34k lineobjects
+		tree = CitationTreeStore().treefor(workobject)
+		prefix = tuple(partialcitationtuple[:availablelevels - atlevel])
+		children = [c for c in tree.children(prefix) if c != 't']
+		if not children:
+			return LowandHighInfo(availablelevels, atlevel - 1, workstructure[atlevel - 1], '-9999', '', [''])
+		low = children[0]
+		high = max(children, key=lambda c: tree.lastline(prefix + (c,)))
+		try:
+			rng = [str(r) for r in sorted([int(c) for c in children])]
+		except ValueError:
+			rng = sorted(children)
+		return LowandHighInfo(availablelevels, atlevel - 1, workstructure[atlevel - 1], low, high, rng)
+
 	audb = workid[0:6]
 	lvl = 'l'+str(atlevel - 1)
 
@@ -134,6 +151,32 @@ def findvalidlevelvalues(workobject: dbOpus, partialcitationtuple: tuple, cursor
 	return lowandhighobject
 
 
+def citationtreelookup(workobject: dbOpus, topdowncitation: list, findlastline=False) -> int:
+	"""
+
+	ask the CitationTree for the first (or last) line of a citation that starts at the top level
+
+		Herodotus 3.11 --> ['3', '11'] --> 7412
+
+	None if the trees are disabled or if the citation does not exist: then it is back to the db
+
+	:param workobject:
+	:param topdowncitation:
+	:param findlastline:
+	:return:
+	"""
+
+	if not hipparchia.config['CITATIONTREES']:
+		return None
+
+	tree = CitationTreeStore().treefor(workobject)
+
+	if findlastline:
+		return tree.lastline(tuple(topdowncitation))
+	else:
+		return tree.firstline(tuple(topdowncitation))
+
+
 def locusintocitation(workobject: dbOpus, lineobject: dbWorkLine) -> str:
 	"""
 
@@ -248,14 +291,22 @@ def finddblinefromlocus(workobject: dbOpus, citationtuple: tuple, dbcursor, find
 
 	citation = list(citationtuple)
 
+	firstlevel = 0
 	if citation[0] == '_0':
 		query = re.sub(r'level_00_value=%s AND ', '', query)
 		citation = citation[1:]
+		firstlevel = 1
 
 	if not citation:
 		indexvalue = workdict[workid].starts
 		return indexvalue
 
+	if firstlevel + len(citation) == workobject.availablelevels:
+		# the citation runs all of the way up to the top level and so the tree can handle it
+		indexvalue = citationtreelookup(workobject, list(reversed(citation)), findlastline)
+		if indexvalue is not None:
+			return indexvalue
+
 	data = tuple([workid] + citation)
 
 	try:
@@ -364,6 +415,13 @@ def finddblinefromincompletelocus(workobject: dbOpus, citationlist: list, dbcurs
 		citationlist.reverse()
 		# the last selection box was empty and you were sent '_0' instead of a real value
 		citationlist = [c for c in citationlist if c != '_0']
+
+		treeline = citationtreelookup(workobject, citationlist, findlastline)
+		if treeline is not None:
+			if dbconnection:
+				dbconnection.connectioncleanup()
+			return {'code': 'success', 'line': treeline}
+
 		auid = workobject.universalid[0:6]
 
 		query = list()
@@ -6,8 +6,12 @@
 		(see LICENSE in the top level directory of the distribution)
 """
 
+import hashlib
+
 from server.hipparchiaobjects.connectionobject import ConnectionObject
 
+databasefingerprints = dict()
+
 
 def buildoptionchecking() -> dict:
 	"""
@@ -43,3 +47,75 @@ def buildoptionchecking() -> dict:
 			# into {'hideknownblemishes': 'y', 'htmlifydatabase': 'n', 'simplifybrackets': 'y', 'simplifyquotes': 'y', 'smartsinglequotes': 'y'}
 			optiondict[o] = {a.split(': ')[0]: a.split(': ')[1] for a in optiondict[o]}
 	return optiondict
+
+
+def databasefingerprint() -> str:
+	"""
+
+	a short hash of the 'builderversion' table: a new build of the database will yield a new fingerprint
+
+	anything that stores derived data on disk can file it under this name and so never serve stale material
+
+	:return:
+	"""
+
+	try:
+		return databasefingerprints['builderversion']
+	except KeyError:
+		pass
+
+	dbconnection = ConnectionObject()
+	dbcursor = dbconnection.cursor()
+
+	q = 'SELECT * FROM builderversion'
+	try:
+		dbcursor.execute(q)
+		found = sorted([str(r) for r in dbcursor.fetchall()])
+	except:
+		# psycopg2.errors.UndefinedTable; but Windows will tell you that there is no 'errors' module...
+		found = ['unknown build']
+	dbconnection.connectioncleanup()
+
+	databasefingerprints['builderversion'] = hashlib.md5(str(found).encode('utf-8')).hexdigest()[:12]
+
+	return databasefingerprints['builderversion']
+
+
+def dictionaryfingerprint() -> str:
+	"""
+
+	a short hash of the state of the dictionary tables: they are loaded separately and so 'builderversion' knows
+	nothing about them
+
+	reloading a dictionary gives the table a new oid (or at least a new filenode); a different dictionary will also
+	have a different size
+
+	:return:
+	"""
+
+	try:
+		return databasefingerprints['dictionaries']
+	except KeyError:
+		pass
+
+	dbconnection = ConnectionObject()
+	dbcursor = dbconnection.cursor()
+
+	qtemplate = """
+	SELECT '{d}_dictionary'::regclass::oid, pg_relation_filenode('{d}_dictionary'), count(*), max(id_number)
+		FROM {d}_dictionary
+	"""
+
+	found = list()
+	for d in ['greek', 'latin']:
+		try:
+			dbcursor.execute(qtemplate.format(d=d))
+			found.append(str(dbcursor.fetchone()))
+		except:
+			# psycopg2.errors.UndefinedTable; but Windows will tell you that there is no 'errors' module...
+			found.append('no {d} dictionary'.format(d=d))
+	dbconnection.connectioncleanup()
+
+	databasefingerprints['dictionaries'] = hashlib.md5(str(found).encode('utf-8')).hexdigest()[:12]
+
+	return databasefingerprints['dictionaries']
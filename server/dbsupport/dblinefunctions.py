@@ -8,6 +8,7 @@
 
 from collections import deque
 
+from server.dbsupport.asyncdbfunctions import executequeriesconcurrently
 from server.dbsupport.miscdbfunctions import perseusidmismatch, resultiterator
 from server.dbsupport.tablefunctions import assignuniquename
 from server.hipparchiaobjects.connectionobject import ConnectionObject
@@ -282,3 +283,45 @@ def bulkenvironsfetcher(table: str, searchresultlist: list, context: int) -> lis
 	dbconnection.connectioncleanup()
 
 	return searchresultlist
+
+
+def concurrentenvironsfetcher(hitlocations: dict, context: int) -> list:
+	"""
+
+	bulkenvironsfetcher() for many tables at once
+
+	hitlocations is a dict of {authortable: [SearchResult, SearchResult, ...]}
+
+	bulkenvironsfetcher() was called once per table and so a search with hits in 40 authors waited on 80 round trips
+	one after another; here there is one query per table and the queries are all in flight at the same time
+
+	:param hitlocations:
+	:param context:
+	:return:
+	"""
+
+	qtemplate = 'SELECT {wtmpl} FROM {au} WHERE index = ANY(%s)'
+
+	tables = list(hitlocations.keys())
+	querylist = list()
+
+	for table in tables:
+		tosearch = set()
+		for r in hitlocations[table]:
+			focusline = r.getindex()
+			tosearch.update(range(int(focusline - (context / 2)), int(focusline + (context / 2)) + 1))
+			r.lineobjects = list()
+		querylist.append((qtemplate.format(wtmpl=worklinetemplate, au=table), (list(tosearch),)))
+
+	foundlines = executequeriesconcurrently(querylist)
+
+	searchresultlist = list()
+	for table, results in zip(tables, foundlines):
+		indexedlines = {l.index: l for l in [dblineintolineobject(r) for r in results]}
+		for r in hitlocations[table]:
+			environs = range(int(r.getindex() - (context / 2)), int(r.getindex() + (context / 2)) + 1)
+			# lines outside of the scope of the table will not be found
+			r.lineobjects = [indexedlines[e] for e in environs if e in indexedlines]
+		searchresultlist.extend(hitlocations[table])
+
+	return searchresultlist
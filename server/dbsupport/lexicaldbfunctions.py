@@ -12,6 +12,7 @@ from typing import List
 import psycopg2
 from flask import session
 
+from server.dbsupport.asyncdbfunctions import executequeriesconcurrently
 from server.dbsupport.bulkdboperations import bulklexicalgrab
 from server.dbsupport.miscdbfunctions import cleanpoolifneeded, resultiterator
 from server.dbsupport.tablefunctions import assignuniquename
@@ -19,10 +20,22 @@ from server.formatting.abbreviations import unpackcommonabbreviations
 from server.formatting.wordformatting import stripaccents, universalregexequivalent
 from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.hipparchiaobjects.dbtextobjects import dbLemmaObject, dbMorphologyObject
+from server.hipparchiaobjects.headwordindexobjects import HeadwordPrefixIndex
 from server.hipparchiaobjects.lexicalobjects import dbDictionaryEntry, dbGreekWord, dbLatinWord
 from server.hipparchiaobjects.wordcountobjects import dbHeadwordObject, dbWordCountObject
+from server.hipparchiaobjects.wordcountstoreobjects import WordCountStore
 from server.listsandsession.genericlistfunctions import flattenlistoflists
 
+headwordcountcolumns = """
+	entry_name , total_count, gr_count, lt_count, dp_count, in_count, ch_count,
+	frequency_classification, early_occurrences, middle_occurrences ,late_occurrences, 
+	acta, agric, alchem, anthol, apocalyp, apocryph, apol, astrol, astron, biogr, bucol, caten, chronogr, comic, comm, 
+	concil, coq, dialog, docu, doxogr, eccl, eleg, encom, epic, epigr, epist, evangel, exeget, fab, geogr, gnom, gramm, 
+	hagiogr, hexametr, hist, homilet, hymn, hypoth, iamb, ignotum, invectiv, inscr, jurisprud, lexicogr, liturg, lyr, 
+	magica, math, mech, med, metrolog, mim, mus, myth, narrfict, nathist, onir, orac, orat, paradox, parod, paroem, 
+	perieg, phil, physiognom, poem, polyhist, prophet, pseudepigr, rhet, satura, satyr, schol, tact, test, theol, trag
+"""
+
 
 def headwordsearch(seeking: str, limit: str, usedictionary: str, usecolumn: str) -> List[tuple]:
 	"""
@@ -46,6 +59,11 @@ def headwordsearch(seeking: str, limit: str, usedictionary: str, usecolumn: str)
 	:return:
 	"""
 
+	# the in-memory index can answer most requests without a trip to postgres
+	foundentries = HeadwordPrefixIndex(usedictionary).find(seeking, int(limit))
+	if foundentries:
+		return foundentries
+
 	cleanpoolifneeded()
 	dbconnection = ConnectionObject()
 	dbcursor = dbconnection.cursor()
@@ -54,24 +72,26 @@ def headwordsearch(seeking: str, limit: str, usedictionary: str, usecolumn: str)
 
 	query = qstring.format(d=usedictionary, c=usecolumn, lim=limit)
 
-	if seeking[0] == ' ' and seeking[-1] == ' ':
-		data = ('^' + seeking[1:-1] + '$',)
-	elif seeking[0] == ' ' and seeking[-1] != ' ':
-		data = ('^' + seeking[1:] + '.*?',)
-	elif seeking[0] == '^' and seeking[-1] == '$':
-		# esp if the dictionary sent this via next/previous entry
-		data = (seeking,)
-	else:
-		data = ('.*?' + seeking + '.*?',)
+	if foundentries is None:
+		# the index could not handle this one
+		if seeking[0] == ' ' and seeking[-1] == ' ':
+			data = ('^' + seeking[1:-1] + '$',)
+		elif seeking[0] == ' ' and seeking[-1] != ' ':
+			data = ('^' + seeking[1:] + '.*?',)
+		elif seeking[0] == '^' and seeking[-1] == '$':
+			# esp if the dictionary sent this via next/previous entry
+			data = (seeking,)
+		else:
+			data = ('.*?' + seeking + '.*?',)
 
-	dbcursor.execute(query, data)
+		dbcursor.execute(query, data)
 
-	# note that the dictionary db has a problem with vowel lengths vs accents
-	# SELECT * FROM greek_dictionary WHERE entry_name LIKE %s d ('μνᾱ/αϲθαι,μνάομαι',)
-	try:
-		foundentries = dbcursor.fetchall()
-	except:
-		foundentries = list()
+		# note that the dictionary db has a problem with vowel lengths vs accents
+		# SELECT * FROM greek_dictionary WHERE entry_name LIKE %s d ('μνᾱ/αϲθαι,μνάομαι',)
+		try:
+			foundentries = dbcursor.fetchall()
+		except:
+			foundentries = list()
 
 	# print('foundentries', foundentries)
 	# '/dictsearch/scrof'
@@ -232,19 +252,9 @@ def querytotalwordcounts(word: str, dbcursor=None) -> dbHeadwordObject:
 		dbcursor = dbconnection.cursor()
 
 	table = 'dictionary_headword_wordcounts'
-	qtemplate = """
-		SELECT 
-			entry_name , total_count, gr_count, lt_count, dp_count, in_count, ch_count,
-			frequency_classification, early_occurrences, middle_occurrences ,late_occurrences, 
-			acta, agric, alchem, anthol, apocalyp, apocryph, apol, astrol, astron, biogr, bucol, caten, chronogr, comic, comm, 
-			concil, coq, dialog, docu, doxogr, eccl, eleg, encom, epic, epigr, epist, evangel, exeget, fab, geogr, gnom, gramm, 
-			hagiogr, hexametr, hist, homilet, hymn, hypoth, iamb, ignotum, invectiv, inscr, jurisprud, lexicogr, liturg, lyr, 
-			magica, math, mech, med, metrolog, mim, mus, myth, narrfict, nathist, onir, orac, orat, paradox, parod, paroem, 
-			perieg, phil, physiognom, poem, polyhist, prophet, pseudepigr, rhet, satura, satyr, schol, tact, test, theol, trag
-		FROM {tbl} WHERE entry_name=%s
-	"""
-
-	q = qtemplate.format(tbl=table)
+	qtemplate = 'SELECT {cols} FROM {tbl} WHERE entry_name=%s'
+
+	q = qtemplate.format(cols=headwordcountcolumns, tbl=table)
 	d = (word,)
 	try:
 		dbcursor.execute(q, d)
@@ -266,6 +276,146 @@ def querytotalwordcounts(word: str, dbcursor=None) -> dbHeadwordObject:
 	return hwcountobject
 
 
+def bulkquerytotalwordcounts(words: List[str]) -> dict:
+	"""
+
+	querytotalwordcounts() for many words in one query
+
+	return {word: dbHeadwordObject}; words without counts are absent
+
+	:param words:
+	:return:
+	"""
+
+	dbconnection = ConnectionObject()
+	dbconnection.setautocommit()
+	dbcursor = dbconnection.cursor()
+
+	q = 'SELECT {cols} FROM dictionary_headword_wordcounts WHERE entry_name = ANY(%s)'.format(cols=headwordcountcolumns)
+	d = (list(set(words)),)
+	try:
+		dbcursor.execute(q, d)
+		found = dbcursor.fetchall()
+	except psycopg2.ProgrammingError:
+		# you have not installed the wordcounts (yet)
+		found = list()
+
+	dbconnection.connectioncleanup()
+
+	countobjects = {f[0]: dbHeadwordObject(*f) for f in found}
+
+	return countobjects
+
+
+def bulkprobedictionary(entrynames: List[str], usedictionary: str) -> List[dbDictionaryEntry]:
+	"""
+
+	probedictionary() for a pile of headwords at once
+
+	dictsearch() used to call probedictionary() for each find; each of those made three queries (the entry, the
+	previous entry, the next entry) and then lexicalOutputObject() went back for the wordcounts, the parser xref,
+	and the lemma: 100 finds meant 600+ round trips
+
+	here three queries run concurrently:
+		[a] all of the entries along with their previous/next neighbors (via LATERAL)
+		[b] all of the headword wordcounts
+		[c] all of the lemmata (which supply the parser xrefs)
+
+	the results of [b] and [c] are stashed in each wordobject's 'prefetched' dict where lexicalOutputObject()
+	will find them
+
+	any name that is not found exactly gets sent through probedictionary() so that its fallbacks can try their luck
+
+	:param entrynames:
+	:param usedictionary:
+	:return:
+	"""
+
+	assert usedictionary in ['greek', 'latin'], 'bulkprobedictionary() needs usedictionary to be "greek" or "latin"'
+
+	names = list(dict.fromkeys(entrynames))
+	if not names:
+		return list()
+
+	if usedictionary == 'latin':
+		extracolumn = 'entry_key'
+		objecttemplate = dbLatinWord
+	else:
+		extracolumn = 'unaccented_entry'
+		objecttemplate = dbGreekWord
+
+	entrytemplate = """
+	SELECT d.entry_name, d.metrical_entry, d.id_number, d.pos, d.translations, d.entry_body, d.{ec},
+		p.entry_name, p.id_number, n.entry_name, n.id_number
+	FROM {d}_dictionary d
+		LEFT JOIN LATERAL 
+			(SELECT entry_name, id_number FROM {d}_dictionary WHERE id_number < d.id_number ORDER BY id_number DESC LIMIT 1) p ON true
+		LEFT JOIN LATERAL 
+			(SELECT entry_name, id_number FROM {d}_dictionary WHERE id_number > d.id_number ORDER BY id_number ASC LIMIT 1) n ON true
+	WHERE d.entry_name = ANY(%s) ORDER BY d.id_number ASC
+	"""
+
+	counttemplate = 'SELECT {cols} FROM dictionary_headword_wordcounts WHERE entry_name = ANY(%s)'
+	lemmatemplate = 'SELECT dictionary_entry, xref_number, derivative_forms FROM {d}_lemmata WHERE dictionary_entry = ANY(%s)'
+
+	trimmednames = list({re.sub(r'[¹²³⁴⁵⁶⁷⁸⁹]', str(), n) for n in names})
+
+	querylist = [(entrytemplate.format(ec=extracolumn, d=usedictionary), (names,))]
+
+	fetchcounts = session['showwordcounts'] and session['available']['wordcounts_0']
+	if fetchcounts:
+		querylist.append((counttemplate.format(cols=headwordcountcolumns), (names,)))
+
+	fetchlemmata = session['available'][usedictionary + '_lemmata']
+	if fetchlemmata:
+		querylist.append((lemmatemplate.format(d=usedictionary), (names + trimmednames,)))
+
+	results = executequeriesconcurrently(querylist)
+	entries = results.pop(0)
+
+	countobjects = dict()
+	if fetchcounts:
+		countobjects = {c[0]: dbHeadwordObject(*c) for c in results.pop(0)}
+
+	lemmata = dict()
+	if fetchlemmata:
+		for lem in results.pop(0):
+			try:
+				lemmata[lem[0]].append(lem)
+			except KeyError:
+				lemmata[lem[0]] = [lem]
+
+	wordobjects = list()
+	for e in entries:
+		wordobject = objecttemplate(*e[:7])
+		if e[8] is not None:
+			wordobject.preventry = e[7]
+			wordobject.preventryid = e[8]
+		if e[10] is not None:
+			wordobject.nextentry = e[9]
+			wordobject.nextentryid = e[10]
+		if fetchcounts:
+			wordobject.prefetched['counts'] = countobjects.get(wordobject.entry)
+		if fetchlemmata:
+			trimmed = re.sub(r'[¹²³⁴⁵⁶⁷⁸⁹]', str(), wordobject.entry)
+			xreflemmata = lemmata.get(wordobject.entry, lemmata.get(trimmed, list()))
+			wordobject.prefetched['xref'] = ', '.join([str(lem[1]) for lem in xreflemmata])
+			try:
+				wordobject.prefetched['lemma'] = dbLemmaObject(*lemmata[trimmed][0])
+			except KeyError:
+				wordobject.prefetched['lemma'] = dbLemmaObject('[entry not found]', -1, '')
+		wordobjects.append(wordobject)
+
+	found = {w.entry for w in wordobjects}
+	for n in names:
+		if n not in found:
+			fallback = probedictionary(usedictionary + '_dictionary', 'entry_name', n, '=', trialnumber=0)
+			if fallback:
+				wordobjects.extend(fallback)
+
+	return wordobjects
+
+
 def probedictionary(usedictionary: str, usecolumn: str, seeking: str, syntax: str, dbcursor=None, trialnumber=0) -> List:
 	"""
 
@@ -456,19 +606,18 @@ def findcountsviawordcountstable(wordtocheck):
 	:return:
 	"""
 
+	store = WordCountStore()
+	if store.isloaded():
+		return store.lookup(wordtocheck)
+
 	dbconnection = ConnectionObject()
 	dbcursor = dbconnection.cursor()
 
-	initial = stripaccents(wordtocheck[0])
 	# alternatives = re.sub(r'[uv]','[uv]',c)
 	# alternatives = '^'+alternatives+'$'
-	if initial in 'abcdefghijklmnopqrstuvwxyzαβψδεφγηιξκλμνοπρϲτυωχθζ':
-		# note that we just lost "'φερον", "'φερεν", "'φέρεν", "'φερεϲ", "'φερε",...
-		# but the punctuation killer probably zapped them long ago
-		# this needs to be addressed in HipparchiaBuilder
-		q = 'SELECT * FROM wordcounts_{i} WHERE entry_name = %s'.format(i=initial)
-	else:
-		q = 'SELECT * FROM wordcounts_0 WHERE entry_name = %s'
+	# note that the punctuation killer probably zapped "'φερον", etc. long ago
+	# this needs to be addressed in HipparchiaBuilder
+	q = 'SELECT * FROM {t} WHERE entry_name = %s'.format(t=wordcounttablefor(wordtocheck))
 
 	d = (wordtocheck,)
 	try:
@@ -484,6 +633,51 @@ def findcountsviawordcountstable(wordtocheck):
 	return result
 
 
+def wordcounttablefor(word: str) -> str:
+	"""
+
+	the wordcounts are split up into letter-keyed tables: which one do you want?
+
+	:param word:
+	:return:
+	"""
+
+	initial = stripaccents(word[0])
+	# note that we just lost "'φερον", "'φερεν", "'φέρεν", "'φερεϲ", "'φερε",...
+	if initial not in 'abcdefghijklmnopqrstuvwxyzαβψδεφγηιξκλμνοπρϲτυωχθζ':
+		initial = '0'
+
+	return 'wordcounts_{i}'.format(i=initial)
+
+
+def concurrentwordcountlookups(wordstocheck: List[str]) -> dict:
+	"""
+
+	findcountsviawordcountstable() for a handful of words at once: the probes run concurrently
+
+	returns {word: (entry_name, total_count, gr_count, lt_count, dp_count, in_count, ch_count)}; words that were
+	not found are absent from the dict
+
+	:param wordstocheck:
+	:return:
+	"""
+
+	wordstocheck = [w for w in wordstocheck if w]
+
+	store = WordCountStore()
+	if store.isloaded():
+		return store.lookupmany(wordstocheck)
+
+	qtemplate = 'SELECT * FROM {t} WHERE entry_name = %s'
+	querylist = [(qtemplate.format(t=wordcounttablefor(w)), (w,)) for w in wordstocheck]
+
+	results = executequeriesconcurrently(querylist)
+
+	found = {w: r[0] for w, r in zip(wordstocheck, results) if r}
+
+	return found
+
+
 def grablemmataobjectfor(db, dbcursor=None, word=None, xref=None, allowsuperscripts=False):
 	"""
 
@@ -731,6 +925,18 @@ def lookformorphologymatches(word: str, dbcursor, trialnumber=0, revertword=None
 		# if you don't do the next, the len() check will fail
 		morphobjects = [morphobjects]
 
+	return mergemorphologyobjects(morphobjects)
+
+
+def mergemorphologyobjects(morphobjects: List[dbMorphologyObject]) -> dbMorphologyObject:
+	"""
+
+	several rows for one observed form need to be turned into a single object
+
+	:param morphobjects:
+	:return:
+	"""
+
 	if len(morphobjects) == 1:
 		morphobject = morphobjects[0]
 	else:
@@ -755,58 +961,65 @@ def lookformorphologymatches(word: str, dbcursor, trialnumber=0, revertword=None
 def bulkfindwordcounts(listofwords: List[str]) -> List[dbWordCountObject]:
 	"""
 
-	note that the lists of words should all start with the same letter since the wordcount tables are letter-keyed
+	bulkfindallwordcounts() as a list: the words no longer need to start with the same letter
+
+	:param listofwords:
+	:return:
+	"""
+
+	return list(bulkfindallwordcounts(listofwords).values())
+
+
+def bulkfindallwordcounts(listofwords: List[str]) -> dict:
+	"""
+
+	the wordcounts of any collection of words in one round trip
 
-	hipparchiaDB=# CREATE TEMP TABLE bulkcounter_51807f8bbe08 AS SELECT values AS  entriestocheck FROM unnest(ARRAY['κατακλειούϲηϲ', 'κατακλῇϲαι', 'κατακλεῖϲαι']) values;
+	the wordcount tables are letter-keyed: so the words get sorted by table and every table that is needed gets
+	its own SELECT inside of a single UNION ALL
 
-	hipparchiaDB=# SELECT * FROM wordcounts_κ WHERE EXISTS (SELECT 1 FROM bulkcounter_51807f8bbe08 tocheck WHERE tocheck.entriestocheck = wordcounts_κ.entry_name);
+	hipparchiaDB=# SELECT * FROM wordcounts_κ WHERE entry_name = ANY(ARRAY['κατακλειούϲηϲ', 'κατακλῇϲαι'])
+		UNION ALL SELECT * FROM wordcounts_π WHERE entry_name = ANY(ARRAY['πνεῦμα']);
 	  entry_name   | total_count | gr_count | lt_count | dp_count | in_count | ch_count
 	---------------+-------------+----------+----------+----------+----------+----------
-	 κατακλεῖϲαι   |          31 |       30 |        0 |        0 |        1 |        0
 	 κατακλειούϲηϲ |           3 |        3 |        0 |        0 |        0 |        0
 	 κατακλῇϲαι    |           1 |        1 |        0 |        0 |        0 |        0
+	 πνεῦμα        |       23686 |    23686 |        0 |        0 |        0 |        0
 	(3 rows)
 
+	returns {word: dbWordCountObject}; words that were not found are absent from the dict
+
 	:param listofwords:
 	:return:
 	"""
 
-	dbconnection = ConnectionObject(readonlyconnection=False)
-	dbcursor = dbconnection.cursor()
+	store = WordCountStore()
+	if store.isloaded():
+		return {w: dbWordCountObject(*c) for w, c in store.lookupmany(listofwords).items()}
 
-	try:
-		firstletteroffirstword = stripaccents(listofwords[0][0])
-	except IndexError:
-		return list()
+	bytable = dict()
+	for w in set(listofwords):
+		if w:
+			bytable.setdefault(wordcounttablefor(w), list()).append(w)
 
-	if firstletteroffirstword not in 'abcdefghijklmnopqrstuvwxyzαβψδεφγηιξκλμνοπρϲτυωχθζ':
-		firstletteroffirstword = '0'
+	if not bytable:
+		return dict()
 
-	tqtemplate = """
-	CREATE TEMP TABLE bulkcounter_{rnd} AS
-		SELECT values AS 
-			entriestocheck FROM unnest(ARRAY[%s]) values
-	"""
+	qtemplate = 'SELECT * FROM {t} WHERE entry_name = ANY(%s)'
+	query = '\n\tUNION ALL\n\t'.join([qtemplate.format(t=t) for t in bytable])
+	data = tuple(bytable.values())
 
-	uniquename = assignuniquename(12)
-	tempquery = tqtemplate.format(rnd=uniquename)
-	data = (listofwords,)
-	dbcursor.execute(tempquery, data)
-
-	qtemplate = """
-	SELECT * FROM wordcounts_{x} WHERE EXISTS 
-		(SELECT 1 FROM bulkcounter_{rnd} tocheck WHERE tocheck.entriestocheck = wordcounts_{x}.entry_name)
-	"""
+	dbconnection = ConnectionObject()
+	dbconnection.setautocommit()
+	dbcursor = dbconnection.cursor()
 
-	query = qtemplate.format(rnd=uniquename, x=firstletteroffirstword)
 	try:
-		dbcursor.execute(query)
+		dbcursor.execute(query, data)
 		results = resultiterator(dbcursor)
+		wordcountobjects = {r[0]: dbWordCountObject(*r) for r in results}
 	except psycopg2.ProgrammingError:
 		# if you do not have the wordcounts installed: 'ProgrammingError: relations "wordcounts_a" does not exist
-		results = list()
-
-	wordcountobjects = [dbWordCountObject(*r) for r in results]
+		wordcountobjects = dict()
 
 	dbconnection.connectioncleanup()
 
@@ -837,6 +1050,54 @@ def bulkfindmorphologyobjects(listofwords: List[str], language: str) -> List[dbM
 	return morphobjects
 
 
+def bulkfindmorphologymatches(setofterms) -> dict:
+	"""
+
+	the first thing that lookformorphologymatches() tries, but for all of the terms at once: one query per language
+
+	returns {term: dbMorphologyObject} for the terms that are found just as they are; the rest still need
+	lookformorphologymatches() and its retries
+
+	:param setofterms:
+	:return:
+	"""
+
+	bylanguage = {'greek': dict(), 'latin': dict()}
+	for t in setofterms:
+		if not t:
+			continue
+		if re.search(r'[a-z]', t):
+			usedictionary = 'latin'
+		else:
+			usedictionary = 'greek'
+		# βοῶ̣ντεϲ -> βοῶντεϲ
+		bylanguage[usedictionary].setdefault(re.sub(r'̣', str(), t), list()).append(t)
+
+	found = dict()
+	for usedictionary in bylanguage:
+		forms = bylanguage[usedictionary]
+		if not forms:
+			continue
+
+		try:
+			if not session['available'][usedictionary + '_morphology']:
+				continue
+		except RuntimeError:
+			# no session in a thread: see lookformorphologymatches()
+			pass
+
+		rows = dict()
+		for m in bulkfindmorphologyobjects(list(forms.keys()), usedictionary):
+			rows.setdefault(m.observed, list()).append(m)
+
+		for observed in rows:
+			morphobject = mergemorphologyobjects(rows[observed])
+			for t in forms.get(observed, list()):
+				found[t] = morphobject
+
+	return found
+
+
 def rankheadwordsbyprevalence(listofheadwords: list) -> dict:
 	"""
 
@@ -844,6 +1105,11 @@ def rankheadwordsbyprevalence(listofheadwords: list) -> dict:
 
 	# print('rankheadwordsbyprevalence() listofheadwords', listofheadwords)
 
+	store = WordCountStore()
+	if store.isloaded():
+		ranked = store.headwordtotals(listofheadwords)
+		return {**{h: 0 for h in listofheadwords}, **ranked}
+
 	dbconnection = ConnectionObject(readonlyconnection=False)
 	dbconnection.setautocommit()
 	dbcursor = dbconnection.cursor()
@@ -7,13 +7,52 @@
 """
 
 import re
+from typing import Dict, List
 
 # lifted from HipparchiaBuilder
 # need this to accept betacode input for searches
 
+
 def replacegreekbetacode(texttoclean: str) -> str:
 	"""
 	swap betacode for unicode values
+
+	one pass, left to right, always taking the longest betacode sequence found in the lookup table that
+	buildbetacodetable() derives from the substitution functions below
+
+	the result is the same as that of sequentialreplacegreekbetacode(); see comparebetacodeconverters()
+
+	:param texttoclean:
+	:return:
+	"""
+
+	table = betacodetable
+	lengths = betacodekeylengths
+	converted = list()
+	position = 0
+	end = len(texttoclean)
+	while position < end:
+		for length in lengths.get(texttoclean[position], tuple()):
+			sequence = texttoclean[position:position + length]
+			try:
+				converted.append(table[sequence])
+				position += length
+				break
+			except KeyError:
+				pass
+		else:
+			converted.append(texttoclean[position])
+			position += 1
+
+	return str().join(converted)
+
+
+def sequentialreplacegreekbetacode(texttoclean: str) -> str:
+	"""
+	swap betacode for unicode values
+
+	the original version: dozens of re.sub() passes over the whole string; kept as the reference implementation
+
 	:param texttoclean:
 	:return:
 	"""
@@ -1078,5 +1117,203 @@ def lowercases(match: re.match, g=0) -> str:
 	return substitute
 
 
-# test = 'h(=|'
-# print('betacodeconversiontest:\n\t{b}\n\t{u}'.format(b=test, u=replacegreekbetacode(test.upper())))
+class _BetacodeLetter(object):
+	"""
+
+	just enough of a re.match for the substitution functions: they only ever ask for the letter
+
+	"""
+
+	def __init__(self, letter: str):
+		self.letter = letter
+
+	def group(self, g=0) -> str:
+		return self.letter
+
+
+def buildbetacodetable() -> Dict[str, str]:
+	"""
+
+	turn the regex passes of capitalletters() and lowercaseletters() into {betacode: unicode}
+
+		{'*)\\|A': 'ᾊ', ..., 'A)/': 'ἄ', ..., 'S1': 'ϲ', ..., 'A': 'α', ...}
+
+	the passes are listed in the order in which those functions run them; when two passes would produce the
+	same key the earlier one wins because it would have gotten there first
+
+	[NB: 'csca' and 'crca' in capitalletters() both look for a rough breathing; so '*(=|A' comes out as 'ᾎ' and
+	'*)=|A' is never matched: that is preserved here]
+
+	:return:
+	"""
+
+	capitalpasses = [
+		# capital + breathing + accent + adscript
+		(')\\|', 'AHW', capitalsmoothgraveadscript),
+		('(\\|', 'AHW', capitalroughgraveadscript),
+		(')/|', 'AHW', capitalsmoothacuteadscript),
+		('(/|', 'AHW', capitalroughacuteadscript),
+		('(=|', 'AHW', capitalsmoothcircumflexadscript),
+		('(=|', 'AHW', capitalroughcircumflexadscript),
+		# capital + breathing + accent
+		(')\\', 'AEIOUHW', capitalsmoothgrave),
+		('(\\', 'AEIOUHW', capitalroughgrave),
+		(')/', 'AEIOUHW', capitalsmoothacute),
+		('(/', 'AEIOUHW', capitalroughacute),
+		(')=', 'AEIOUHW', capitalsmoothcircumflex),
+		('(=', 'AEIOUHW', capitalroughcircumflex),
+		# capital + breathing
+		(')', 'AEIOUHWR', capitalsmooth),
+		('(', 'AEIOUHWR', capitalrough),
+		# capital + accent
+		('\\', 'AEIOUHW', capitalgrave),
+		('/', 'AEIOUHW', capitalacute),
+		# capital + adscript
+		('|', 'AHW', capitaladscript),
+	]
+
+	lowercasepasses = [
+		# lowercase + breathing + accent + subscript
+		(')\\|', 'AHW', lowercasesmoothgravesubscript),
+		('(\\|', 'AHW', lowercaseroughgravesubscript),
+		(')/|', 'AHW', lowercasesmoothacutesubscript),
+		('(/|', 'AHW', lowercaseroughacutesubscript),
+		(')=|', 'AHW', lowercasesmoothcircumflexsubscript),
+		('(=|', 'AHW', lowercaseroughcircumflexsubscript),
+		# lowercase + breathing + accent
+		(')\\', 'AEIOUHW', lowercasesmoothgrave),
+		('(\\', 'AEIOUHW', lowercaseroughgrave),
+		(')/', 'AEIOUHW', lowercasesmoothacute),
+		('(/', 'AEIOUHW', lowercaseroughacute),
+		(')=', 'AEIOUHW', lowercasesmoothcircumflex),
+		('(=', 'AEIOUHW', lowercaseroughcircumflex),
+		# lowercase + accent + subscript
+		('\\|', 'AHW', lowercasegravesub),
+		('/|', 'AHW', lowercaseacutedsub),
+		('=|', 'AHW', lowercasesircumflexsub),
+		# lowercase + breathing + subscript
+		(')|', 'AHW', lowercasesmoothsub),
+		('(|', 'AHW', lowercaseroughsub),
+		# lowercase + accent + diaresis
+		('\\+', 'IU', lowercasegravediaresis),
+		('/+', 'IU', lowercaseacutediaresis),
+		('=+', 'U', lowercasesircumflexdiaresis),
+		# lowercase + breathing
+		(')', 'AEIOUHWR', lowercasesmooth),
+		('(', 'AEIOUHWR', lowercaserough),
+		# lowercase + accent
+		('\\', 'AEIOUHW', lowercasegrave),
+		('/', 'AEIOUHW', lowercaseacute),
+		('=', 'AEIOUHW', lowercascircumflex),
+		# lowercase + diaresis
+		('+', 'IU', lowercasediaresis),
+		# lowercase + subscript
+		('|', 'AHW', lowercasesubscript),
+	]
+
+	alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+	sigmas = ['S', 'S1', 'S2', 'S3']
+
+	table = dict()
+
+	def addtotable(sequence: str, substitute: str):
+		if sequence not in table:
+			table[sequence] = substitute
+
+	for marks, letters, substitutionfunction in capitalpasses:
+		for letter in letters:
+			addtotable('*' + marks + letter, substitutionfunction(_BetacodeLetter(letter)))
+	for s in sigmas:
+		addtotable('*' + s, u'\u03f9')
+	for letter in alphabet:
+		addtotable('*' + letter, capitals(_BetacodeLetter(letter)))
+
+	for marks, letters, substitutionfunction in lowercasepasses:
+		for letter in letters:
+			addtotable(letter + marks, substitutionfunction(_BetacodeLetter(letter)))
+	for s in sigmas:
+		addtotable(s, u'ϲ')
+	for letter in alphabet:
+		addtotable(letter, lowercases(_BetacodeLetter(letter)))
+
+	# combining dot
+	addtotable('?', u'\u0323')
+	# exclmation point not properly documented
+	addtotable('!', u'\u2219')
+
+	return table
+
+
+def keylengthsbyfirstcharacter(table: Dict[str, str]) -> Dict[str, tuple]:
+	"""
+
+	{'*': (5, 4, 3, 2), 'A': (4, 3, 2, 1), ...}: the lengths to try at a position, longest first
+
+	:param table:
+	:return:
+	"""
+
+	lengths = dict()
+	for key in table:
+		lengths.setdefault(key[0], set()).add(len(key))
+
+	return {c: tuple(sorted(lengths[c], reverse=True)) for c in lengths}
+
+
+betacodetable = buildbetacodetable()
+betacodekeylengths = keylengthsbyfirstcharacter(betacodetable)
+
+
+def comparebetacodeconverters(samples=20000, seed=1, verbose=True) -> List[str]:
+	"""
+
+	check replacegreekbetacode() against sequentialreplacegreekbetacode() and time them both
+
+	the random strings are made out of every betacode sequence there is, the pieces of those sequences, and
+	some characters that are not betacode at all; returns the inputs that gave different results
+
+	strings with one of the handful of impossible sequences that the old tables turn into '' (e.g., '*)U') are
+	skipped: sequentialreplacegreekbetacode() deletes them and the next regex pass then sees the neighbors as if
+	they were adjacent; e.g., 'W)=*(=E|' becomes 'W)=|' and so 'ᾦ'; a single pass cannot (and should not) imitate that
+
+	python3 server/formatting/betacodetounicode.py
+
+		19996 random strings (4 skipped): 0 disagreements
+		sequential: 2.546s
+		table:      0.497s
+
+	:param samples:
+	:param seed:
+	:param verbose:
+	:return:
+	"""
+
+	import random
+	from timeit import timeit
+
+	randomizer = random.Random(seed)
+	impossible = [k for k in betacodetable if not betacodetable[k]]
+	pieces = [k for k in betacodetable if betacodetable[k]] + list('*()\\/=|+?!123 .,;:[]<>{}#%@$0456789-_^') + ['ab', 'ΑΒ', '⒣']
+
+	corpus = list()
+	for n in range(samples):
+		corpus.append(str().join(randomizer.choice(pieces) for p in range(randomizer.randint(1, 40))))
+
+	corpus = [c for c in corpus if not any(i in c for i in impossible)]
+
+	disagreements = [c for c in corpus if replacegreekbetacode(c) != sequentialreplacegreekbetacode(c)]
+
+	if verbose:
+		m = '{n} random strings ({s} skipped): {d} disagreements'
+		print(m.format(n=len(corpus), s=samples - len(corpus), d=len(disagreements)))
+		for d in disagreements[:10]:
+			print('\t{b}\t{s}\t{t}'.format(b=d, s=sequentialreplacegreekbetacode(d), t=replacegreekbetacode(d)))
+		sequential = timeit(lambda: [sequentialreplacegreekbetacode(c) for c in corpus], number=1)
+		tabledriven = timeit(lambda: [replacegreekbetacode(c) for c in corpus], number=1)
+		print('sequential: {s}s\ntable:      {t}s'.format(s=round(sequential, 3), t=round(tabledriven, 3)))
+
+	return disagreements
+
+
+if __name__ == '__main__':
+	comparebetacodeconverters()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+from heapq import merge
+from typing import Iterable, List
+
+from server.formatting.wordformatting import hipparchiatranstable
+
+
+def buildcollationtable() -> dict:
+	"""
+
+	the hipparchia transtable folds every sigma into a lunate sigma; but lunate comes after omega...
+
+	so fold the accents and then turn every 'ϲ' back into a 'σ': and do both in one translate() by
+	rewriting the values of a copy of the transtable
+
+	:return:
+	"""
+
+	lunate = 'ϲ'
+	sigma = 'σ'
+
+	collationtable = dict()
+	for k, v in hipparchiatranstable.items():
+		if isinstance(v, int):
+			v = chr(v)
+		if v is not None:
+			v = v.replace(lunate, sigma)
+		collationtable[k] = v
+
+	collationtable[ord(lunate)] = sigma
+
+	return collationtable
+
+
+collationtable = buildcollationtable()
+
+
+def polytoniccollationkey(word: str) -> tuple:
+	"""
+
+	sort() looks at your numeric value, but α and ά and ᾶ need not have neighboring numerical values
+
+	sort on the folded form first and then on the word itself so that words that collide once the
+	diacriticals are gone still come out in a stable order
+
+		θαλάττηϲ -> ('θαλαττησ', 'θαλάττηϲ')
+
+	:param word:
+	:return:
+	"""
+
+	return word.translate(collationtable), word
+
+
+def polytonicsorted(unsortedwords: Iterable[str]) -> List[str]:
+	"""
+
+	polytonicsort() without the '-snip-' augment: empty words are dropped, as they always were
+
+	:param unsortedwords:
+	:return:
+	"""
+
+	return sorted([w for w in unsortedwords if w], key=polytoniccollationkey)
+
+
+def mergesortedruns(*runs: Iterable[str]) -> List[str]:
+	"""
+
+	merge lists that have already been put into polytonic order: e.g., the vocabularies of several works
+	that were each sorted on their own
+
+	no need to sort the whole thing all over again
+
+	:param runs:
+	:return:
+	"""
+
+	return list(merge(*runs, key=polytoniccollationkey))
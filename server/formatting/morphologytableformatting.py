@@ -8,8 +8,6 @@
 
 import re
 
-from flask import session
-
 from server.formatting.miscformatting import consolewarning, htmlcommentdecorator
 
 
@@ -112,13 +110,15 @@ def findmylatintenses(mood: str, voice: str) -> dict:
 	return mytenses
 
 
-def declinedtabletemplate(dialect='attic', duals=True, lang='greek', skipgenders=None) -> str:
+def declinedtabletemplate(dialect='attic', duals=True, lang='greek', skipgenders=None, emptyrows=False) -> str:
 	"""
 
 
 	:param dialect:
 	:param duals:
 	:param lang:
+	:param skipgenders:
+	:param emptyrows: session['morphemptyrows']
 	:return:
 	"""
 
@@ -196,7 +196,7 @@ def declinedtabletemplate(dialect='attic', duals=True, lang='greek', skipgenders
 				allcellsinrow.append(morphcell.format(mo=mo))
 			thisrow = '\n\t\t'.join(allcellsinrow)
 			allrows.append(morphrowtemplate.format(allcells=thisrow))
-		if session['morphemptyrows']:
+		if emptyrows:
 			allrows.append(blankrow)
 
 	rows = '\n'.join(allrows)
@@ -206,7 +206,7 @@ def declinedtabletemplate(dialect='attic', duals=True, lang='greek', skipgenders
 	return thetablehtml
 
 
-def verbtabletemplate(mood: str, voice: str, dialect='attic', duals=True, lang='greek') -> str:
+def verbtabletemplate(mood: str, voice: str, dialect='attic', duals=True, lang='greek', emptyrows=False) -> str:
 	"""
 
 	Smythe §383ff
@@ -215,12 +215,11 @@ def verbtabletemplate(mood: str, voice: str, dialect='attic', duals=True, lang='
 
 		<td class="morphcell">_attic_subj_pass_pl_2nd_pres_</td>
 
+	the caller has already folded session['morphduals'] into 'duals'; 'emptyrows' is session['morphemptyrows']
+
 	:return:
 	"""
 
-	if not session['morphduals']:
-		duals = False
-
 	mytenses = dict()
 	if lang == 'greek':
 		try:
@@ -342,7 +341,7 @@ def verbtabletemplate(mood: str, voice: str, dialect='attic', duals=True, lang='
 						allcellsinrow.append(morphcell.format(mo=mo))
 					thisrow = '\n\t\t'.join(allcellsinrow)
 					allrows.append(morphrowtemplate.format(allcells=thisrow))
-				if session['morphemptyrows']:
+				if emptyrows:
 					allrows.append(blankrow)
 	elif mood == 'inf':
 		allcellsinrow = list()
@@ -360,13 +359,14 @@ def verbtabletemplate(mood: str, voice: str, dialect='attic', duals=True, lang='
 
 
 @htmlcommentdecorator
-def filloutmorphtabletemplate(lookupdict: dict, wordcountdict: dict, template: str) -> str:
+def filloutmorphtabletemplate(lookupdict: dict, wordcountdict: dict, template: str, emptyrows=False) -> str:
 	"""
 
 	regex swap the verbtabletemplate items
 
 	:param lookupdict:
 	:param template:
+	:param emptyrows: session['morphemptyrows']
 	:return:
 	"""
 
@@ -410,7 +410,7 @@ def filloutmorphtabletemplate(lookupdict: dict, wordcountdict: dict, template: s
 
 		template = re.sub(c, substitute, template)
 
-	if not session['morphemptyrows']:
+	if not emptyrows:
 		template = purgeemptyrows(template)
 
 	return template
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import re
+from timeit import timeit
+
+"""
+
+every pattern and translation table that the line renderers need, compiled once per process
+
+browsing, textmaker, the exporter, and the search result formatter all push every line through the same handful
+of substitutions; several of the functions involved used to re.compile() or str.maketrans() on every call and
+leave it to the re module's cache to bail them out
+
+where two passes over a line are independent of one another they are folded into a single pass here
+
+NB: nothing in here imports from the rest of the server: benchmarkrendering() can be run from the command line
+
+"""
+
+# wordformatting.py: forcelunates(), attemptsigmadifferentiation()
+forcelunatestable = str.maketrans('σςΣ', 'ϲϲϹ')
+unlunatetable = str.maketrans('ϲϹ', 'σΣ')
+# look out for ς’ instead of σ’
+straypunct = r'\<\>\{\}\[\]\(\)⟨⟩₍₎\.\?\!⌉⎜͙✳※¶§͜﹖→𐄂𝕔;:ˈ＇,‚‛‘“”„·‧∣'
+combininglowerdot = u'\u0323'
+terminalsigma = re.compile(r'σ(?=[' + combininglowerdot + straypunct + r'\s]|$)')
+
+# wordformatting.py: uforvoutsideofmarkup(); the capturing group makes split() keep the markup at the odd positions
+markupsplitter = re.compile(r'(<.*?>)')
+
+# dbWorkLine.unformattedline(), cleanvectortext()
+markupfinder = re.compile(r'<.*?>')
+
+# dbWorkLine.hmuspanrewrite() + dbWorkLine.hmufontshiftsintospans(): one pass instead of four
+hmuformattingrewriter = re.compile(r'</hmu_span_.*?>|</hmu_fontshift_.*?>|<hmu_span_(.*?)>|<hmu_fontshift_(.*?)_(.*?)>')
+
+# dbWorkLine.fixhmuirrationaloragnization(): openings and closings in one scan
+hmuformattingtags = re.compile(r'<(/?)hmu_(span|fontshift)_(.*?)>')
+
+# checkfordocumentmetadata(): one scan instead of four
+metadatafinder = re.compile(r'<hmu_metadata_(date|region|city|publicationinfo) value="(.*?)" />')
+
+# highlightsearchterm(): substitutes that would put markup inside of markup
+badhighlighta = re.compile(r'<[^\s>]{0,}<span class="match">.*?</span>.*?>')
+badhighlightb = re.compile(r'<.*?<span class="match">.*?</span>')
+
+# cleanvectortext()
+vectorabbreviationfinder = re.compile(r'\w+\.')
+vectorcleaningtable = str.maketrans('vjσς', 'uiϲϲ')
+
+
+def forcelunatesigmas(text: str) -> str:
+	return text.translate(forcelunatestable)
+
+
+def differentiatesigmas(text: str) -> str:
+	text = text.translate(unlunatetable)
+	return re.sub(terminalsigma, 'ς', text)
+
+
+def swapuforvoutsideofmarkup(textwithmarkup: str) -> str:
+	"""
+
+	the pieces at the even positions of the split are the text; the odd ones are the markup
+
+	:param textwithmarkup:
+	:return:
+	"""
+
+	pieces = re.split(markupsplitter, textwithmarkup)
+	pieces[0::2] = [p.replace('v', 'u') for p in pieces[0::2]]
+	return str().join(pieces)
+
+
+def stripmarkup(text: str) -> str:
+	return re.sub(markupfinder, str(), text)
+
+
+def rewritehmuformatting(line: str, language: str) -> str:
+	"""
+
+	'<hmu_span_expanded_text>'                  -> '<span class="expanded_text">'
+	'<hmu_fontshift_latin_italic>'              -> '<span class="latin italic">' [or '<span class="italic">' in a latin line]
+	'</hmu_span_...>' & '</hmu_fontshift_...>'  -> '</span>'
+
+	:param line:
+	:param language:
+	:return:
+	"""
+
+	def rewriter(match) -> str:
+		if match.group(1) is not None:
+			return '<span class="{s}">'.format(s=match.group(1))
+		if match.group(2) is not None:
+			shift = match.group(3).replace('_', ' ')
+			if match.group(2) != language:
+				return '<span class="{a} {b}">'.format(a=match.group(2), b=shift)
+			return '<span class="{b}">'.format(b=shift)
+		return '</span>'
+
+	return re.sub(hmuformattingrewriter, rewriter, line)
+
+
+def splithmuformattingtags(line: str) -> tuple:
+	"""
+
+	([<match>, ...], [<match>, ...]) for the openings and closings: one scan instead of two
+
+	:param line:
+	:return:
+	"""
+
+	openings = list()
+	closings = list()
+	for tag in re.finditer(hmuformattingtags, line):
+		if tag.group(1):
+			closings.append(tag)
+		else:
+			openings.append(tag)
+	return openings, closings
+
+
+def hmutagpositions(tags: list) -> dict:
+	return {t.start(): '{a}_{b}'.format(a=t.group(2), b=t.group(3)) for t in tags}
+
+
+def findhmuformattingtags(line: str) -> tuple:
+	"""
+
+	({position: 'span_expanded_text', ...}, {position: 'span_expanded_text', ...}) for the openings and closings
+
+	:param line:
+	:return:
+	"""
+
+	openings, closings = splithmuformattingtags(line)
+	return hmutagpositions(openings), hmutagpositions(closings)
+
+
+def findlinemetadata(line: str) -> dict:
+	"""
+
+	{'date': '...', 'region': '...', 'city': '...', 'publicationinfo': '...'}: the first value of each kind
+
+	:param line:
+	:return:
+	"""
+
+	found = dict()
+	for m in re.finditer(metadatafinder, line):
+		if m.group(1) not in found:
+			found[m.group(1)] = m.group(2)
+	return found
+
+
+def highlightisvalid(newline: str) -> bool:
+	return not re.search(badhighlighta, newline) and not re.search(badhighlightb, newline)
+
+
+"""
+
+the benchmark
+
+	python3 -m server.formatting.renderingpatterns
+
+the 'sequential' functions are the old code: they are here only so that benchmarkrendering() has something to
+compare against and to check that the single passes still give the same answers
+
+"""
+
+samplelines = [
+	'<hmu_span_expanded_text><hmu_fontshift_greek_smallerthannormal>τίϲ ἡ τάραξιϲ</hmu_span_expanded_text> τοῦ βίου; τί βάρβιτοϲ</hmu_fontshift_greek_smallerthannormal>',
+	'&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;<hmu_fontshift_latin_smallcapitals>errantes</hmu_fontshift_latin_smallcapitals><hmu_fontshift_latin_normal> pascentes, ut alibi “mille meae Siculis</hmu_fontshift_latin_normal>',
+	'&nbsp;&nbsp;&nbsp;<hmu_fontshift_latin_normal>II 47.</hmu_fontshift_latin_normal><hmu_fontshift_latin_italic> prognosticorum causas persecuti sunt et <hmu_span_latin_expanded_text>Boëthus Stoicus</hmu_span_latin_expanded_text>,</hmu_fontshift_latin_italic>',
+	'<hmu_metadata_notes value="Non. 109M" /><hmu_metadata_documentnumber value="12" />Nolo équidem: sed tu huic, quém scis quali in té siet',
+	'<hmu_metadata_publicationinfo value="BSA 47.1952.187,3 [SEG 12.419]" /><hmu_metadata_region value="Lakonia" /><hmu_metadata_city value="Sparta" /><hmu_metadata_date value="II spc" />[— — —]ΑΡΙϹΤΟ[— — —]',
+	'πραγμάτων προάγειν τὸν λόγον ϲεμνὸν ϲφόδρα. <span class="expanded_text">εἰ μὴ',
+	'ἤν τιϲ ὀφείλων ἐξαρνῆται. Πρ. πόθεν οὖν ἐδάνειϲ’ ὁ',
+	'Civitatem peregrinvs vsvrpans veneat, <span class="smallcapitals">lex</span> Papia Poppaea, M. Tullius Cicero a. d. VIII Id. Nov.',
+]
+
+
+def _sequentialattemptsigmadifferentiation(text: str) -> str:
+	text = text.translate(str.maketrans('ϲϹ', 'σΣ'))
+	boundaries = r'([' + combininglowerdot + straypunct + r'\s]|$)'
+	terminal = re.compile(r'σ' + boundaries)
+	return re.sub(terminal, r'ς\1', text)
+
+
+def _sequentialuforvoutsideofmarkup(textwithmarkup: str) -> str:
+	spans = re.finditer(re.compile(r'<.*?>'), textwithmarkup)
+	ranges = [s.span() for s in spans]
+	if ranges:
+		ranges = [range(r[0], r[1]) for r in ranges]
+		preserve = {item for sublist in ranges for item in sublist}
+		newstr = ['u' if n not in preserve and c == 'v' else c for n, c in enumerate(textwithmarkup)]
+		return str().join(newstr)
+	return re.sub(r'v', 'u', textwithmarkup)
+
+
+def _sequentialhmurewrite(line: str, language: str) -> str:
+	def skipper(one, two):
+		two = two.replace('_', ' ')
+		if one != language:
+			return '<span class="{a} {b}">'.format(a=one, b=two)
+		return '<span class="{b}">'.format(b=two)
+
+	line = re.sub(re.compile(r'<hmu_span_(.*?)>'), r'<span class="\1">', line)
+	line = re.sub(re.compile(r'</hmu_span_(.*?)>'), r'</span>', line)
+	line = re.sub(re.compile(r'<hmu_fontshift_(.*?)_(.*?)>'), lambda x: skipper(x.group(1), x.group(2)), line)
+	line = re.sub(re.compile(r'</hmu_fontshift_.*?>'), r'</span>', line)
+	return line
+
+
+def _sequentialhmutags(line: str) -> tuple:
+	opener = re.compile(r'<hmu_(span|fontshift)_(.*?)>')
+	closer = re.compile(r'</hmu_(span|fontshift)_(.*?)>')
+	openspans = {x.span()[0]: '{a}_{b}'.format(a=x.group(1), b=x.group(2)) for x in re.finditer(opener, line)}
+	closedspans = {x.span()[0]: '{a}_{b}'.format(a=x.group(1), b=x.group(2)) for x in re.finditer(closer, line)}
+	return openspans, closedspans
+
+
+def _sequentialmetadata(line: str) -> dict:
+	found = dict()
+	for kind in ['date', 'region', 'city', 'publicationinfo']:
+		m = re.search(r'<hmu_metadata_{k} value="(.*?)" />'.format(k=kind), line)
+		if m:
+			found[kind] = m.group(1)
+	return found
+
+
+def benchmarkrendering(repeats=20000, verbose=True) -> dict:
+	"""
+
+	time the old and the new versions of each step on samplelines and make sure that they agree
+
+	a typical run:
+		      sigmas: 2.468s -> 2.012s (1.2x) disagreements: 0
+		       uforv: 2.750s -> 0.559s (4.9x) disagreements: 0
+		  hmurewrite: 1.354s -> 0.507s (2.7x) disagreements: 0
+		     hmutags: 0.902s -> 0.629s (1.4x) disagreements: 0
+		    metadata: 0.725s -> 0.519s (1.4x) disagreements: 0
+
+	:param repeats:
+	:param verbose:
+	:return:
+	"""
+
+	comparisons = {
+		'sigmas': (_sequentialattemptsigmadifferentiation, differentiatesigmas),
+		'uforv': (_sequentialuforvoutsideofmarkup, swapuforvoutsideofmarkup),
+		'hmurewrite': (lambda x: _sequentialhmurewrite(x, 'latin'), lambda x: rewritehmuformatting(x, 'latin')),
+		'hmutags': (_sequentialhmutags, findhmuformattingtags),
+		'metadata': (_sequentialmetadata, findlinemetadata),
+	}
+
+	results = dict()
+	for c in comparisons:
+		old, new = comparisons[c]
+		disagreements = [s for s in samplelines if old(s) != new(s)]
+		oldtime = timeit(lambda: [old(s) for s in samplelines], number=repeats)
+		newtime = timeit(lambda: [new(s) for s in samplelines], number=repeats)
+		results[c] = (oldtime, newtime, len(disagreements))
+		if verbose:
+			print('{c:>12}: {o:.3f}s -> {n:.3f}s ({x:.1f}x) disagreements: {d}'.format(c=c, o=oldtime, n=newtime, x=oldtime / newtime, d=len(disagreements)))
+
+	return results
+
+
+if __name__ == '__main__':
+	benchmarkrendering()
@@ -7,17 +7,17 @@
 """
 
 import re
-from collections import deque
 from copy import deepcopy
 from typing import List
 
 from flask import session
 
 from server.dbsupport.citationfunctions import locusintocitation
-from server.dbsupport.dblinefunctions import bulkenvironsfetcher
+from server.dbsupport.dblinefunctions import concurrentenvironsfetcher
 from server.formatting.bibliographicformatting import formatname
 from server.formatting.bracketformatting import brackethtmlifysearchfinds
 from server.formatting.miscformatting import htmlcommentdecorator
+from server.formatting.renderingpatterns import highlightisvalid
 from server.formatting.wordformatting import universalregexequivalent
 from server.hipparchiaobjects.worklineobject import dbWorkLine
 from server.hipparchiaobjects.searchobjects import SearchObject, SearchResult
@@ -32,9 +32,9 @@ def buildresultobjects(hitdict: dict, authordict: dict, workdict: dict, searchob
 	"""
 	build result objects for the lines you have found
 
-	this version will send you through bulkenvironsfetcher() which will ensure that you do not make 2500 queries for 2500 results
+	this version will send you through concurrentenvironsfetcher() which will ensure that you do not make 2500 queries for 2500 results
 
-	instead you will make one query per author table
+	instead you will make one query per author table [and these queries run concurrently]
 
 	this is MUCH faster: 25-50x faster if you go wild and allow for thousands of results
 
@@ -83,14 +83,9 @@ def buildresultobjects(hitdict: dict, authordict: dict, workdict: dict, searchob
 		activepoll.allworkis(len(hitlocations))
 		activepoll.remain(len(hitlocations))
 
-		updatedresultlist = deque()
-		count = 0
-
-		for table in hitlocations:
-			resultswithenvironments = bulkenvironsfetcher(table, hitlocations[table], so.context)
-			updatedresultlist.extend(resultswithenvironments)
-			count += 1
-			activepoll.remain(len(hitlocations)-count)
+		# one query per table and all of them in flight at once
+		updatedresultlist = concurrentenvironsfetcher(hitlocations, so.context)
+		activepoll.remain(0)
 
 		updatedresultlist = sorted(updatedresultlist, key=lambda x: x.hitnumber)
 
@@ -243,10 +238,8 @@ def highlightsearchterm(lineobject: dbWorkLine, regexequivalent, spanname) -> st
 	#   a search for 'val' can give you 'value' in a line that has 'qualis' (via the [uv] match...)
 	#   <hmu_metadata_notes <span class="match">val</span>ue="Non. 109M" /><hmu_metadata_documentnumber value="12" />Nolo équidem: sed tu huic, quém scis quali in té siet
 	#
-	#   test every substitute to make sure it does not produce marked up markup
+	#   test every substitute to make sure it does not produce marked up markup: see highlightisvalid()
 
-	badpatterna = re.compile(r'<[^\s>]{0,}<span class="match">.*?</span>.*?>')
-	badpatternb = re.compile(r'<.*?<span class="match">.*?</span>')
 	validresult = False
 
 	finds = list(re.finditer(regexequivalent, line))
@@ -272,7 +265,7 @@ def highlightsearchterm(lineobject: dbWorkLine, regexequivalent, spanname) -> st
 
 		newline = '{ls}<span class="{sp}">{fg}</span>{le}'.format(ls=line[0:find.start()], sp=spanname, fg=find.group(), le=line[find.end():])
 
-		if not re.search(badpatterna, newline) and not re.search(badpatternb, newline):
+		if highlightisvalid(newline):
 			validresult = True
 
 	return newline
@@ -396,11 +389,8 @@ def unbalancedspancleaner(html: str) -> str:
 	:return:
 	"""
 
-	o = re.compile(r'<span')
-	c = re.compile(r'</span>')
-
-	opened = len(re.findall(o, html))
-	closed = len(re.findall(c, html))
+	opened = html.count('<span')
+	closed = html.count('</span>')
 
 	supplement = str()
 
@@ -14,6 +14,7 @@ from flask import session
 from server.dbsupport.citationfunctions import prolixlocus
 from server.dbsupport.dblinefunctions import dblineintolineobject, grabonelinefromwork
 from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.selectionobjects import CompiledSelectionCache
 from server.listsandsession.checksession import probeforsessionvariables
 
 
@@ -107,6 +108,29 @@ def sessiontimeexclusionsinfo():
 
 def sessionselectionsinfo(authordict: dict, workdict: dict) -> dict:
 	"""
+
+	the html only changes when the selections do: see CompiledSelectionCache
+
+	:param authordict:
+	:param workdict:
+	:return:
+	"""
+
+	try:
+		# it is possible to hit this function before the session has been set, so...
+		session['auselections']
+	except KeyError:
+		probeforsessionvariables()
+
+	compiled = CompiledSelectionCache().fetch(session)
+	if compiled.selectionsinfo is None:
+		compiled.selectionsinfo = buildsessionselectionsinfo(authordict, workdict)
+
+	return compiled.selectionsinfo
+
+
+def buildsessionselectionsinfo(authordict: dict, workdict: dict) -> dict:
+	"""
 	build the selections html either for a or b:
 		#selectionstable + #selectioninfocell
 		#selectionstable + #exclusioninfocell
@@ -9,6 +9,7 @@ import re
 from string import punctuation
 
 from server import hipparchia
+from server.formatting.renderingpatterns import differentiatesigmas, forcelunatestable, swapuforvoutsideofmarkup
 
 # the one: because sometimes you don't want to zap τ’, δ’, κτλ.
 # the other: and sometimes you do
@@ -98,22 +99,21 @@ def stripaccents(texttostrip: str, transtable=None) -> str:
 	there are more others ways to do this; but this is the fast way
 	it turns out that this was one of the slowest functions in the profiler
 
-	transtable should be passed here outside of a loop
-	but if you are just doing things one-off, then it is fine to have
-	stripaccents() look up transtable itself
+	stripaccents() used to build a fresh transtable whenever it was not handed one;
+	now it just uses the one that was built when this module was imported
 
 	:param texttostrip:
 	:param transtable:
 	:return:
 	"""
 
-	# if transtable == None:
-	# 	transtable = buildhipparchiatranstable()
+	if transtable is None:
+		transtable = hipparchiatranstable
 
 	try:
 		stripped = texttostrip.translate(transtable)
 	except TypeError:
-		stripped = stripaccents(texttostrip, transtable=buildhipparchiatranstable())
+		stripped = texttostrip.translate(hipparchiatranstable)
 
 	return stripped
 
@@ -175,6 +175,10 @@ def buildhipparchiatranstable() -> dict:
 	return transtable
 
 
+# built once at import: stripaccents() falls back on this when it is not handed a table
+hipparchiatranstable = buildhipparchiatranstable()
+
+
 def gkattemptelision(hypenatedgreekheadword: str) -> str:
 	"""
 
@@ -535,10 +539,7 @@ def forcelunates(text: str) -> str:
 	:return:
 	"""
 
-	invals = "σςΣ"
-	outvals = "ϲϲϹ"
-
-	cleantext = text.translate(str.maketrans(invals, outvals))
+	cleantext = text.translate(forcelunatestable)
 
 	return cleantext
 
@@ -571,19 +572,8 @@ def attemptsigmadifferentiation(text: str) -> str:
 	:return:
 	"""
 
-	# first pass
-	invals = "ϲϹ"
-	outvals = "σΣ"
-
-	text = text.translate(str.maketrans(invals, outvals))
-
-	# then do terminal sigma
-	# look out for ς’ instead of σ’
-	straypunct = r'\<\>\{\}\[\]\(\)⟨⟩₍₎\.\?\!⌉⎜͙✳※¶§͜﹖→𐄂𝕔;:ˈ＇,‚‛‘“”„·‧∣'
-	combininglowerdot = u'\u0323'
-	boundaries = r'([' + combininglowerdot + straypunct + '\s]|$)'
-	terminalsigma = re.compile(r'σ' + boundaries)
-	cleantext = re.sub(terminalsigma, r'ς\1', text)
+	# the patterns live in renderingpatterns.py so that they are compiled once and not once per line
+	cleantext = differentiatesigmas(text)
 
 	return cleantext
 
@@ -726,25 +716,7 @@ def uforvoutsideofmarkup(textwithmarkup) -> str:
 	:return:
 	"""
 
-	markupfinder = re.compile(r'<.*?>')
-
-	spans = re.finditer(markupfinder, textwithmarkup)
-	ranges = [s.span() for s in spans]
-	if ranges:
-		# e.g., ranges = [(26, 54), (57, 64), (64, 85), (102, 109), (109, 137), (138, 145), (145, 166), (181, 188)]
-		ranges = [range(r[0], r[1]) for r in ranges]
-		flatten = lambda l: [item for sublist in l for item in sublist]
-		preserve = set(flatten(ranges))
-		textbyposition = enumerate(textwithmarkup)
-		newstr = list()
-		for t in textbyposition:
-			if t[0] not in preserve and t[1] == 'v':
-				newstr.append('u')
-			else:
-				newstr.append(t[1])
-		newstr = str().join(newstr)
-	else:
-		newstr = re.sub(r'v', 'u', textwithmarkup)
+	newstr = swapuforvoutsideofmarkup(textwithmarkup)
 
 	return newstr
 
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import os
+import pickle
+import tempfile
+from os import path
+
+
+def writeatomically(filename: str, data: bytes):
+	"""
+
+	write to a private temporary file next to the target and then swap it into place
+
+	several threads or worker processes can be caching the same item at the same time: each one gets its own
+	temporary file and so the last os.replace() wins; nobody ever sees (or leaves behind) a half-written file
+
+	raises OSError if the write fails
+
+	:param filename:
+	:param data:
+	:return:
+	"""
+
+	directory = path.dirname(path.abspath(filename))
+	os.makedirs(directory, exist_ok=True)
+
+	descriptor, temporaryname = tempfile.mkstemp(prefix='.{f}.'.format(f=path.basename(filename)), suffix='.tmp', dir=directory)
+	try:
+		with os.fdopen(descriptor, 'wb') as f:
+			f.write(data)
+		# mkstemp() files are 0600; the other workers might not be running as the same user
+		os.chmod(temporaryname, 0o644)
+		os.replace(temporaryname, filename)
+	except BaseException:
+		try:
+			os.remove(temporaryname)
+		except OSError:
+			pass
+		raise
+
+
+def pickleatomically(filename: str, item):
+	"""
+
+	writeatomically() for anything that can be pickled
+
+	:param filename:
+	:param item:
+	:return:
+	"""
+
+	writeatomically(filename, pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL))
@@ -6,6 +6,8 @@
 		(see LICENSE in the top level directory of the distribution)
 """
 
+import threading
+
 from flask import session
 
 from server import hipparchia
@@ -13,6 +15,7 @@ from server.formatting.bibliographicformatting import avoidlonglines
 from server.formatting.bracketformatting import gtltsubstitutes
 from server.formatting.miscformatting import htmlcommentdecorator
 from server.formatting.wordformatting import avoidsmallvariants
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
 
 
 class BrowserOutputObject(object):
@@ -182,3 +185,53 @@ class BrowserPassageObject(object):
 		if hipparchia.config['INSISTUPONSTANDARDANGLEBRACKETS']:
 			html = gtltsubstitutes(html)
 		return html
+
+
+class RenderedPassageCache(object):
+	"""
+
+	a borg that remembers the html of passages that have already been built for the browser
+
+	the texts never change; what can change is how a passage gets rendered: hence the session values in the key
+
+	"""
+
+	_lock = threading.Lock()
+	_passages = LRUMemory('BROWSERPASSAGECACHESIZE')
+	_inflight = set()
+
+	renderingflags = ['browsercontext', 'simpletextoutput', 'authorflagging', 'debughtml', 'debugdb', 'zaplunates',
+	                  'zapvees', 'bracketsquare', 'bracketround', 'bracketangled', 'bracketcurly']
+
+	@staticmethod
+	def keyfor(workid: str, locusindexvalue: int, thesession=None) -> tuple:
+		if not thesession:
+			thesession = session
+		return tuple([workid, locusindexvalue] + [thesession[f] for f in RenderedPassageCache.renderingflags])
+
+	def fetch(self, key: tuple) -> str:
+		return RenderedPassageCache._passages.fetch(key)
+
+	def store(self, key: tuple, html: str):
+		with RenderedPassageCache._lock:
+			RenderedPassageCache._passages.store(key, html)
+			RenderedPassageCache._inflight.discard(key)
+
+	def claim(self, key: tuple) -> bool:
+		"""
+
+		the prefetcher should not build something that is already built or already being built
+
+		:param key:
+		:return:
+		"""
+
+		with RenderedPassageCache._lock:
+			if key in RenderedPassageCache._passages or key in RenderedPassageCache._inflight:
+				return False
+			RenderedPassageCache._inflight.add(key)
+			return True
+
+	def release(self, key: tuple):
+		with RenderedPassageCache._lock:
+			RenderedPassageCache._inflight.discard(key)
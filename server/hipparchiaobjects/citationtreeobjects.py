@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import pickle
+from os import path
+
+from server import hipparchia
+from server.dbsupport.dbbuildinfo import databasefingerprint
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.atomicfileobjects import pickleatomically
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+
+
+class CitationTree(object):
+	"""
+
+	every citation prefix of a work mapped onto the lines it covers and onto the values that can come next
+
+	the keys run from the top level down: Herodotus 3.11.5 is book 3, section 11, line 5 and so
+
+		()              -> [firstindex, lastindex, ['1', '2', '3', ...]]
+		('3',)          -> [firstindex, lastindex, ['1', '2', ..., '11', ...]]
+		('3', '11')     -> [firstindex, lastindex, ['1', '2', ..., '5', ...]]
+		('3', '11', '5')-> [firstindex, lastindex, []]
+
+	the children are in the order in which they first appear in the text
+
+	"""
+
+	def __init__(self, workid: str, levels: int, starts: int, ends: int):
+		self.workid = workid
+		self.levels = levels
+		self.starts = starts
+		self.ends = ends
+		self.nodes = dict()
+
+	def covers(self, starts: int, ends: int) -> bool:
+		return self.starts == starts and self.ends == ends
+
+	def addline(self, index: int, topdowncitation: tuple):
+		for depth in range(0, len(topdowncitation) + 1):
+			prefix = topdowncitation[:depth]
+			try:
+				node = self.nodes[prefix]
+				node[1] = index
+			except KeyError:
+				node = [index, index, list()]
+				self.nodes[prefix] = node
+				if depth > 0:
+					self.nodes[topdowncitation[:depth - 1]][2].append(topdowncitation[depth - 1])
+
+	def haslocus(self, topdowncitation: tuple) -> bool:
+		return tuple(topdowncitation) in self.nodes
+
+	def firstline(self, topdowncitation: tuple) -> int:
+		try:
+			return self.nodes[tuple(topdowncitation)][0]
+		except KeyError:
+			return None
+
+	def lastline(self, topdowncitation: tuple) -> int:
+		try:
+			return self.nodes[tuple(topdowncitation)][1]
+		except KeyError:
+			return None
+
+	def children(self, topdowncitation: tuple) -> list:
+		try:
+			return self.nodes[tuple(topdowncitation)][2]
+		except KeyError:
+			return list()
+
+
+class CitationTreeStore(object):
+	"""
+
+	a borg that holds CitationTree objects
+
+	a tree is built the first time a work is asked about: one query that grabs nothing but the index and the six
+	level values; if CITATIONTREEDIRECTORY is set it is also saved to disk under the database fingerprint
+
+	"""
+
+	_memory = LRUMemory('CITATIONTREEMEMORYLIMIT')
+
+	def _filename(self, workid: str) -> str:
+		directory = path.join(hipparchia.config['CITATIONTREEDIRECTORY'], databasefingerprint())
+		return path.join(directory, '{w}.citations'.format(w=workid))
+
+	def treefor(self, workobject) -> CitationTree:
+		"""
+
+		memory, then disk, then the db
+
+		:param workobject:
+		:return:
+		"""
+
+		workid = workobject.universalid
+
+		tree = CitationTreeStore._memory.fetch(workid)
+		if tree and tree.covers(workobject.starts, workobject.ends):
+			return tree
+
+		tree = None
+		if hipparchia.config['CITATIONTREEDIRECTORY']:
+			tree = self._loadfromdisk(workobject)
+
+		if not tree:
+			tree = self._buildtree(workobject)
+			if hipparchia.config['CITATIONTREEDIRECTORY']:
+				self._writetodisk(tree)
+
+		self._remember(tree)
+
+		return tree
+
+	@staticmethod
+	def _buildtree(workobject) -> CitationTree:
+		levels = workobject.availablelevels
+		tree = CitationTree(workobject.universalid, levels, workobject.starts, workobject.ends)
+
+		# top level first
+		columns = ', '.join(['level_0{n}_value'.format(n=n) for n in range(levels - 1, -1, -1)])
+		q = 'SELECT index, {c} FROM {db} WHERE wkuniversalid=%s ORDER BY index ASC'.format(c=columns, db=workobject.universalid[0:6])
+		d = (workobject.universalid,)
+
+		dbconnection = ConnectionObject()
+		dbcursor = dbconnection.cursor()
+		dbcursor.execute(q, d)
+		for r in dbcursor.fetchall():
+			tree.addline(r[0], tuple(r[1:]))
+		dbconnection.connectioncleanup()
+
+		return tree
+
+	def _loadfromdisk(self, workobject) -> CitationTree:
+		filename = self._filename(workobject.universalid)
+		if not path.isfile(filename):
+			return None
+
+		try:
+			with open(filename, 'rb') as f:
+				tree = pickle.load(f)
+		except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+			consolewarning('could not read the citation tree in {f}: {e}'.format(f=filename, e=e), color='red')
+			return None
+
+		if not tree.covers(workobject.starts, workobject.ends):
+			return None
+
+		return tree
+
+	def _writetodisk(self, tree: CitationTree):
+		filename = self._filename(tree.workid)
+		try:
+			pickleatomically(filename, tree)
+		except OSError as e:
+			consolewarning('could not write the citation tree to {f}: {e}'.format(f=filename, e=e), color='red')
+
+	def _remember(self, tree: CitationTree):
+		CitationTreeStore._memory.store(tree.workid, tree)
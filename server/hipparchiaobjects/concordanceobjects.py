@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import pickle
+from os import path
+
+from server import hipparchia
+from server.dbsupport.dbbuildinfo import databasefingerprint
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.atomicfileobjects import pickleatomically
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+
+
+class WorkConcordance(object):
+	"""
+
+	the complete word index of one work
+
+		postings:   {word: [index1, index2, ...]}
+		loci:       {index: locus}
+
+	indexmaker.py needs (workid, index, locus) tuples; they can be rebuilt from this for any range of lines
+
+	"""
+
+	def __init__(self, workid: str, starts: int, ends: int, postings: dict, loci: dict):
+		self.workid = workid
+		self.starts = starts
+		self.ends = ends
+		self.postings = postings
+		self.loci = loci
+
+	def covers(self, starts: int, ends: int) -> bool:
+		return self.starts == starts and self.ends == ends
+
+	def indexentries(self, firstline: int, lastline: int, anchored: bool) -> dict:
+		"""
+
+		return what linesintoindex() would have given you for lines firstline through lastline
+
+			{'illic': [('lt0472w001', 2048, '68A.35')], 'carpitur': [('lt0472w001', 2048, '68A.35')], ...}
+
+		:param firstline:
+		:param lastline:
+		:param anchored:
+		:return:
+		"""
+
+		if anchored:
+			template = '<indexedlocation id="linenumber/{au}/{wk}/{idx}">{loc}</indexedlocation>'
+			au = self.workid[:6]
+			wk = self.workid[7:]
+			citations = {i: template.format(au=au, wk=wk, idx=i, loc=self.loci[i]) for i in self.loci if firstline <= i <= lastline}
+		else:
+			citations = {i: self.loci[i] for i in self.loci if firstline <= i <= lastline}
+
+		wholework = firstline <= self.starts and lastline >= self.ends
+
+		entries = dict()
+		for word in self.postings:
+			if wholework:
+				hits = [(self.workid, i, citations[i]) for i in self.postings[word]]
+			else:
+				hits = [(self.workid, i, citations[i]) for i in self.postings[word] if i in citations]
+			if hits:
+				entries[word] = hits
+
+		return entries
+
+
+class ConcordanceStore(object):
+	"""
+
+	a borg that holds WorkConcordance objects
+
+	the texts do not change, so the index to a work is the same every time you ask for it; building it again
+	for every '/text/index/...' request was pure waste
+
+	the most recently used CONCORDANCECACHEMEMORYLIMIT works stay in memory; if CONCORDANCECACHEDIRECTORY
+	is set every concordance is also written to disk so that it survives a restart
+
+	the on-disk copies live in a subdirectory named after a fingerprint of the 'builderversion' table: a rebuilt
+	database gets a new fingerprint and so the old concordances will just be ignored
+
+	"""
+
+	_memory = LRUMemory('CONCORDANCECACHEMEMORYLIMIT')
+
+	def _filename(self, workid: str) -> str:
+		directory = path.join(hipparchia.config['CONCORDANCECACHEDIRECTORY'], databasefingerprint())
+		return path.join(directory, '{w}.pickle'.format(w=workid))
+
+	def fetch(self, workid: str, starts: int, ends: int) -> WorkConcordance:
+		"""
+
+		memory, then disk; None if you need to build it yourself
+
+		:param workid:
+		:param starts:
+		:param ends:
+		:return:
+		"""
+
+		concordance = ConcordanceStore._memory.fetch(workid)
+		if concordance and concordance.covers(starts, ends):
+			return concordance
+
+		if not hipparchia.config['CONCORDANCECACHEDIRECTORY']:
+			return None
+
+		filename = self._filename(workid)
+		if not path.isfile(filename):
+			return None
+
+		try:
+			with open(filename, 'rb') as f:
+				concordance = pickle.load(f)
+		except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+			consolewarning('could not read the concordance in {f}: {e}'.format(f=filename, e=e), color='red')
+			return None
+
+		if not concordance.covers(starts, ends):
+			return None
+
+		self._remember(concordance)
+		return concordance
+
+	def store(self, concordance: WorkConcordance):
+		self._remember(concordance)
+
+		if not hipparchia.config['CONCORDANCECACHEDIRECTORY']:
+			return
+
+		filename = self._filename(concordance.workid)
+		try:
+			# two requests for the same work should not leave a half-written file behind
+			pickleatomically(filename, concordance)
+		except OSError as e:
+			consolewarning('could not write the concordance to {f}: {e}'.format(f=filename, e=e), color='red')
+
+	def _remember(self, concordance: WorkConcordance):
+		ConcordanceStore._memory.store(concordance.workid, concordance)
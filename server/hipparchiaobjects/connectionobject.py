@@ -8,6 +8,8 @@
 
 import sys
 import threading
+import time
+from os import getpid
 
 import psycopg2
 import psycopg2.pool as connectionpool
@@ -15,6 +17,7 @@ import psycopg2.pool as connectionpool
 from server import hipparchia
 from server.dbsupport.tablefunctions import assignuniquename
 from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.queryrecorderobjects import RecordingCursor
 from server.threading.mpthreadcount import setthreadcount
 
 
@@ -103,6 +106,11 @@ class GenericConnectionObject(object):
 	def cursor(self):
 		return self.curs
 
+	def recordqueries(self):
+		# QUERYRECORDER: every cursor of this connection reports to the QueryRecorder; see '/debug/queryrecorder'
+		if hipparchia.config['QUERYRECORDER']:
+			self.dbconnection.cursor_factory = RecordingCursor
+
 	def commit(self):
 		getattr(self.dbconnection, 'commit')()
 
@@ -148,6 +156,219 @@ class GenericConnectionObject(object):
 		pass
 
 
+class ConnectionPoolMonitor(object):
+	"""
+
+	keep score on what the connection pools are doing and nudge them back into shape
+
+	a PoolError used to be silent apart from a console warning: a simple connection would get made
+	and nobody would ever know that the pool was too small; now we record
+
+		checkouts and how long they took
+		how many checkouts had to wait for a connection to be returned
+		how many checkouts gave up and fell back to a SimpleConnectionObject()
+		how old the connections are
+		how many broken/stale connections got recycled
+		how often the pool grew or shrank
+
+	the pool is allowed to grow (up to POOLMAXIMUMSIZE) when it is exhausted and will shrink back
+	towards its original size once the demand has subsided (checked every POOLSHRINKINTERVAL seconds)
+
+	this is all per-process: forked search workers keep their own (uninteresting) numbers
+
+	"""
+
+	_lock = threading.Lock()
+	_stats = dict()
+	_births = dict()
+	_floors = dict()
+
+	countertemplate = {'checkouts': 0, 'totallatency': 0.0, 'maxlatency': 0.0, 'waits': 0, 'fallbacks': 0,
+	                   'brokenrecycled': 0, 'stalerecycled': 0, 'growths': 0, 'shrinks': 0, 'peakinuse': 0,
+	                   'lastshrinkcheck': 0.0}
+
+	@staticmethod
+	def _counters(ctype: str) -> dict:
+		if ctype not in ConnectionPoolMonitor._stats:
+			ConnectionPoolMonitor._stats[ctype] = dict(ConnectionPoolMonitor.countertemplate)
+			ConnectionPoolMonitor._stats[ctype]['lastshrinkcheck'] = time.time()
+		return ConnectionPoolMonitor._stats[ctype]
+
+	@staticmethod
+	def maximumpoolsize(basesize: int) -> int:
+		cap = hipparchia.config['POOLMAXIMUMSIZE']
+		if not cap:
+			cap = setthreadcount() * 4
+		return max(cap, basesize)
+
+	@staticmethod
+	def registerpool(pool, ctype: str):
+		"""
+
+		remember the original dimensions of the pool and the birthdays of its initial connections
+
+		"""
+		if not pool:
+			return
+		with ConnectionPoolMonitor._lock, pool._lock:
+			ConnectionPoolMonitor._floors[ctype] = (pool.minconn, pool.maxconn)
+			ConnectionPoolMonitor._counters(ctype)
+			now = time.time()
+			for c in pool._pool:
+				ConnectionPoolMonitor._births[id(c)] = now
+
+	@staticmethod
+	def connectionage(connection) -> float:
+		try:
+			return time.time() - ConnectionPoolMonitor._births[id(connection)]
+		except KeyError:
+			ConnectionPoolMonitor._births[id(connection)] = time.time()
+			return 0.0
+
+	@staticmethod
+	def forget(connection):
+		ConnectionPoolMonitor._births.pop(id(connection), None)
+
+	@staticmethod
+	def isbroken(connection) -> bool:
+		if connection.closed:
+			return True
+		try:
+			status = connection.get_transaction_status()
+		except psycopg2.InterfaceError:
+			return True
+		return status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+
+	@staticmethod
+	def isstale(connection) -> bool:
+		maxage = hipparchia.config['POOLCONNECTIONMAXAGE']
+		if not maxage:
+			return False
+		return ConnectionPoolMonitor.connectionage(connection) > maxage
+
+	@staticmethod
+	def recordcheckout(ctype: str, latency: float, waited: bool, inuse: int):
+		with ConnectionPoolMonitor._lock:
+			c = ConnectionPoolMonitor._counters(ctype)
+			c['checkouts'] += 1
+			c['totallatency'] += latency
+			c['maxlatency'] = max(c['maxlatency'], latency)
+			c['peakinuse'] = max(c['peakinuse'], inuse)
+			if waited:
+				c['waits'] += 1
+
+	@staticmethod
+	def recordfallback(ctype: str):
+		with ConnectionPoolMonitor._lock:
+			ConnectionPoolMonitor._counters(ctype)['fallbacks'] += 1
+
+	@staticmethod
+	def recordrecycle(ctype: str, connection, reason: str):
+		with ConnectionPoolMonitor._lock:
+			ConnectionPoolMonitor._counters(ctype)[reason + 'recycled'] += 1
+			ConnectionPoolMonitor.forget(connection)
+
+	@staticmethod
+	def growpool(pool, ctype: str) -> bool:
+		"""
+
+		an exhausted pool gets one more connection if it is still below the size limit
+
+		minconn grows too: otherwise the new connection is closed as soon as it is returned and then
+		reopened by the next checkout
+
+		NB: always take ConnectionPoolMonitor._lock before pool._lock; getconn() and putconn() take only the latter
+
+		"""
+		with ConnectionPoolMonitor._lock, pool._lock:
+			basesize = ConnectionPoolMonitor._floors.get(ctype, (pool.minconn, pool.maxconn))[1]
+			if pool.maxconn >= ConnectionPoolMonitor.maximumpoolsize(basesize):
+				return False
+			pool.maxconn += 1
+			pool.minconn = min(pool.minconn + 1, pool.maxconn)
+			ConnectionPoolMonitor._counters(ctype)['growths'] += 1
+		return True
+
+	@staticmethod
+	def considershrinking(pool, ctype: str):
+		"""
+
+		every POOLSHRINKINTERVAL seconds compare the peak demand with the size of the pool
+
+		if the pool grew in response to a burst of activity it is now allowed to drift back towards the original size;
+		surplus idle connections get closed
+
+		"""
+		interval = hipparchia.config['POOLSHRINKINTERVAL']
+		with ConnectionPoolMonitor._lock, pool._lock:
+			c = ConnectionPoolMonitor._counters(ctype)
+			now = time.time()
+			if not interval or now - c['lastshrinkcheck'] < interval:
+				return
+			floormin, floormax = ConnectionPoolMonitor._floors.get(ctype, (pool.minconn, pool.maxconn))
+			peak = c['peakinuse']
+			c['peakinuse'] = len(pool._used)
+			c['lastshrinkcheck'] = now
+			newmax = max(floormax, peak + 1)
+			newmin = max(floormin, min(pool.minconn, peak + 1))
+			if newmax >= pool.maxconn and newmin >= pool.minconn:
+				return
+			pool.maxconn = min(pool.maxconn, newmax)
+			pool.minconn = min(pool.minconn, newmin, pool.maxconn)
+			c['shrinks'] += 1
+			while len(pool._pool) > pool.minconn:
+				surplus = pool._pool.pop()
+				ConnectionPoolMonitor.forget(surplus)
+				try:
+					surplus.close()
+				except psycopg2.InterfaceError:
+					pass
+
+	@staticmethod
+	def report(pools: dict) -> dict:
+		"""
+
+		everything we know about the pools as a dict that is ready for json.dumps()
+
+		"""
+		report = dict()
+		with ConnectionPoolMonitor._lock:
+			for ctype in pools:
+				pool = pools[ctype]
+				if not pool:
+					continue
+				with pool._lock:
+					report[ctype] = ConnectionPoolMonitor._reportonepool(pool, ctype)
+		return report
+
+	@staticmethod
+	def _reportonepool(pool, ctype: str) -> dict:
+		c = dict(ConnectionPoolMonitor._counters(ctype))
+		del c['lastshrinkcheck']
+		try:
+			c['meanlatencyms'] = round(1000 * c['totallatency'] / c['checkouts'], 3)
+		except ZeroDivisionError:
+			c['meanlatencyms'] = 0.0
+		c['maxlatencyms'] = round(1000 * c['maxlatency'], 3)
+		del c['totallatency']
+		del c['maxlatency']
+		c['minconn'] = pool.minconn
+		c['maxconn'] = pool.maxconn
+		c['sizelimit'] = ConnectionPoolMonitor.maximumpoolsize(ConnectionPoolMonitor._floors.get(ctype, (0, pool.maxconn))[1])
+		c['idle'] = len(pool._pool)
+		c['inuse'] = len(pool._used)
+		now = time.time()
+		ages = [now - ConnectionPoolMonitor._births[id(x)] for x in pool._pool + list(pool._used.values())
+		        if id(x) in ConnectionPoolMonitor._births]
+		if ages:
+			c['oldestconnection'] = round(max(ages), 1)
+			c['meanconnectionage'] = round(sum(ages) / len(ages), 1)
+		else:
+			c['oldestconnection'] = 0.0
+			c['meanconnectionage'] = 0.0
+		return c
+
+
 class PooledConnectionObject(GenericConnectionObject):
 	"""
 
@@ -188,8 +409,10 @@ class PooledConnectionObject(GenericConnectionObject):
 			poolsize = setthreadcount() + 3
 
 			# three known pool types; simple should be faster as you are avoiding locking
-			pooltype = connectionpool.SimpleConnectionPool
-			# pooltype = connectionpool.ThreadedConnectionPool
+			# but ConnectionPoolMonitor resizes the pools from whichever thread is checking out or returning a
+			# connection: so getconn() and putconn() have to share a lock with it
+			# pooltype = connectionpool.SimpleConnectionPool
+			pooltype = connectionpool.ThreadedConnectionPool
 			# pooltype = connectionpool.PersistentConnectionPool
 
 			# [A] 'ro' pool
@@ -231,6 +454,8 @@ class PooledConnectionObject(GenericConnectionObject):
 
 			PooledConnectionObject._pools['ro'] = readonlypool
 			PooledConnectionObject._pools['rw'] = readandwritepool
+			ConnectionPoolMonitor.registerpool(readonlypool, 'ro')
+			ConnectionPoolMonitor.registerpool(readandwritepool, 'rw')
 
 		assert self.cytpe in ['ro', 'rw'], 'connection type must be either "ro" or "rw"'
 		self.pool = PooledConnectionObject._pools[self.cytpe]
@@ -238,18 +463,18 @@ class PooledConnectionObject(GenericConnectionObject):
 		if self.cytpe == 'rw':
 			self.readonlyconnection = False
 
-		if threading.current_thread().name == 'vectorbot':
+		if threading.current_thread().name == 'vectorbot' or not self.pool:
 			# the vectobot lives in a thread and it will exhaust the pool
 			self.simpleconnectionfallback()
 		else:
-			try:
-				self.dbconnection = self.pool.getconn(key=self.uniquename)
-			except psycopg2.pool.PoolError:
-				# the pool is exhausted: try a basic connection instead
-				# but in the long run should probably make a bigger pool/debug something
+			self.dbconnection = self.checkoutconnection()
+			if not self.dbconnection:
+				# the pool is exhausted and is not allowed to grow any further: try a basic connection instead
 				# at the moment the only way to hit this error is via some sort of platform bug that yields a hung search
 				# that is, something like a ryzen c-state aborted search damages the pool in the long run...
+				# [or POOLMAXIMUMSIZE is too small for the number of users: see '/debug/poolstatus']
 				consolewarning('PoolError: emergency fallback to SimpleConnectionObject()')
+				ConnectionPoolMonitor.recordfallback(self.cytpe)
 				self.simpleconnectionfallback()
 				PooledConnectionObject.poolneedscleaning = True
 
@@ -257,8 +482,72 @@ class PooledConnectionObject(GenericConnectionObject):
 			self.setautocommit()
 
 		self.setreadonly(self.readonlyconnection)
+		self.recordqueries()
 		self.curs = getattr(self.dbconnection, 'cursor')()
 
+	def checkoutconnection(self):
+		"""
+
+		grab a connection from the pool and keep score while doing it
+
+			[a] broken or stale connections are closed and replaced
+			[b] an exhausted pool will grow if it is allowed to
+			[c] otherwise wait up to POOLCHECKOUTWAIT seconds for a connection to be returned
+
+		return None if all of that fails
+
+		:return:
+		"""
+
+		monitor = ConnectionPoolMonitor
+		starttime = time.time()
+		deadline = starttime + hipparchia.config['POOLCHECKOUTWAIT']
+		waited = False
+		recycles = 0
+		connection = None
+
+		while not connection:
+			try:
+				connection = self.pool.getconn(key=self.uniquename)
+			except psycopg2.pool.PoolError:
+				if monitor.growpool(self.pool, self.cytpe):
+					continue
+				if time.time() > deadline:
+					break
+				waited = True
+				time.sleep(.01)
+				continue
+
+			reason = None
+			if monitor.isbroken(connection):
+				reason = 'broken'
+			elif monitor.isstale(connection):
+				reason = 'stale'
+
+			if reason:
+				recycles += 1
+				self.pool.putconn(connection, key=self.uniquename, close=True)
+				monitor.recordrecycle(self.cytpe, connection, reason)
+				connection = None
+				if recycles > self.pool.maxconn:
+					# the pool keeps handing out bad connections: the caller falls back to a simple connection
+					break
+
+		monitor.recordcheckout(self.cytpe, time.time() - starttime, waited, len(self.pool._used))
+
+		return connection
+
+	@staticmethod
+	def poolstatus() -> dict:
+		"""
+
+		checkout latency, waits, fallbacks, connection ages, etc. for '/debug/poolstatus'
+
+		:return:
+		"""
+
+		return ConnectionPoolMonitor.report(PooledConnectionObject._pools)
+
 	@staticmethod
 	def resetpool():
 		# dangerous to do this while anything interesting is going on
@@ -290,15 +579,30 @@ class PooledConnectionObject(GenericConnectionObject):
 		:return:
 		"""
 
-		self.commit()
-		try:
-			self.dbconnection.set_session(readonly=False)
-		except psycopg2.OperationalError:
-			# ubuntu19 and fedora31 constantly send you here
-			# consolewarning('change your connection type to "simple" in "networksettings.py"; pooled connections are failing', color='red')
-			pass
-		self.setdefaultisolation()
-		self.pool.putconn(self.dbconnection, key=self.uniquename)
+		# a dead connection cannot commit(): check first and just throw it away
+		broken = ConnectionPoolMonitor.isbroken(self.dbconnection)
+		recycle = broken or ConnectionPoolMonitor.isstale(self.dbconnection)
+
+		if not broken:
+			try:
+				self.commit()
+			except (psycopg2.InterfaceError, psycopg2.OperationalError):
+				# it died in between the check and the commit()
+				broken = recycle = True
+
+		if not broken:
+			try:
+				self.dbconnection.set_session(readonly=False)
+			except psycopg2.OperationalError:
+				# ubuntu19 and fedora31 constantly send you here
+				# consolewarning('change your connection type to "simple" in "networksettings.py"; pooled connections are failing', color='red')
+				pass
+			self.setdefaultisolation()
+
+		if recycle:
+			ConnectionPoolMonitor.forget(self.dbconnection)
+		self.pool.putconn(self.dbconnection, key=self.uniquename, close=recycle)
+		ConnectionPoolMonitor.considershrinking(self.pool, self.cytpe)
 		# print('connection returned to pool:', self.uniquename)
 
 		return
@@ -313,11 +617,14 @@ class SimpleConnectionObject(GenericConnectionObject):
 
 	add connectioncleanup() to the mix
 
+	a failed login ends the program: unless 'exitonfailure' is False, in which case the psycopg2.OperationalError is
+	passed on to a caller that has something better to do
+
 	"""
 
 	poolneedscleaning = False
 
-	def __init__(self, autocommit='defaultisno', readonlyconnection=True, ctype='ro'):
+	def __init__(self, autocommit='defaultisno', readonlyconnection=True, ctype='ro', exitonfailure=True):
 		super().__init__(autocommit, readonlyconnection)
 		assert ctype in ['ro', 'rw'], 'connection type must be either "ro" or "rw"'
 		if ctype != 'rw':
@@ -335,6 +642,8 @@ class SimpleConnectionObject(GenericConnectionObject):
 												database=GenericConnectionObject.dbname,
 												password=p)
 		except psycopg2.OperationalError as operror:
+			if not exitonfailure:
+				raise
 			thefailure = operror.args[0]
 			unknown = 'no pg_hba.conf entry for'
 			if unknown in thefailure:
@@ -346,6 +655,7 @@ class SimpleConnectionObject(GenericConnectionObject):
 			self.setautocommit()
 
 		self.setreadonly(self.readonlyconnection)
+		self.recordqueries()
 		self.curs = getattr(self.dbconnection, 'cursor')()
 		self.thisisafallback = False
 
@@ -376,6 +686,109 @@ class SimpleConnectionObject(GenericConnectionObject):
 		return self.thisisafallback
 
 
+class AsyncConnectionObject(GenericConnectionObject):
+	"""
+
+	a psycopg2 connection in asynchronous mode
+
+	nothing blocks: the connection is opened, the query is sent, and then you have to poll() until the
+	server says it is done; this lets one thread keep several of these busy at once (see asyncdbfunctions.py)
+
+	async connections are always autocommit and cannot set_session(); read-only-ness is set via the
+	connection options instead
+
+	finished connections are kept for re-use: note the pid check because a forked worker must not use a
+	socket that belongs to its parent
+
+	"""
+
+	_idle = list()
+	_lock = threading.Lock()
+
+	def __init__(self, readonlyconnection=True):
+		super().__init__('autocommit', readonlyconnection)
+		self.pid = getpid()
+		self.jobnumber = None
+		self.state = psycopg2.extensions.POLL_WRITE
+
+		with AsyncConnectionObject._lock:
+			while AsyncConnectionObject._idle and not self.dbconnection:
+				pid, readonly, c = AsyncConnectionObject._idle.pop()
+				if pid == self.pid and readonly == self.readonlyconnection and not c.closed:
+					self.dbconnection = c
+					self.state = psycopg2.extensions.POLL_OK
+
+		if not self.dbconnection:
+			if self.readonlyconnection:
+				u = GenericConnectionObject.dbuser
+				p = GenericConnectionObject.dbpass
+				o = '-c default_transaction_read_only=on'
+			else:
+				u = GenericConnectionObject.dbwriteuser
+				p = GenericConnectionObject.dbwritepass
+				o = str()
+
+			self.dbconnection = psycopg2.connect(user=u,
+			                                     host=GenericConnectionObject.dbhost,
+			                                     port=GenericConnectionObject.dbport,
+			                                     database=GenericConnectionObject.dbname,
+			                                     password=p,
+			                                     options=o,
+			                                     async_=True)
+
+	def fileno(self):
+		# this is what lets select() watch the object
+		return self.dbconnection.fileno()
+
+	def isready(self) -> bool:
+		return self.state == psycopg2.extensions.POLL_OK and self.jobnumber is None
+
+	def dispatch(self, jobnumber: int, query: str, data=None):
+		self.jobnumber = jobnumber
+		self.curs = self.dbconnection.cursor()
+		self.curs.execute(query, data)
+		self.state = psycopg2.extensions.POLL_WRITE
+
+	def poll(self) -> int:
+		self.state = self.dbconnection.poll()
+		return self.state
+
+	def collect(self) -> list:
+		if self.curs.description:
+			results = self.curs.fetchall()
+		else:
+			results = list()
+		self.curs.close()
+		self.curs = None
+		self.jobnumber = None
+		return results
+
+	def abandonjob(self):
+		self.curs = None
+		self.jobnumber = None
+		self.state = psycopg2.extensions.POLL_OK
+
+	def connectioncleanup(self):
+		"""
+
+		hand the connection back to the stash if it is healthy; otherwise close it
+
+		"""
+
+		keep = not self.dbconnection.closed and self.state == psycopg2.extensions.POLL_OK and self.jobnumber is None
+		with AsyncConnectionObject._lock:
+			if keep and len(AsyncConnectionObject._idle) < hipparchia.config['ASYNCQUERYCONNECTIONS']:
+				AsyncConnectionObject._idle.append((self.pid, self.readonlyconnection, self.dbconnection))
+			else:
+				try:
+					self.dbconnection.close()
+				except psycopg2.InterfaceError:
+					pass
+		self.dbconnection = None
+
+		return
+
+
 if hipparchia.config['CONNECTIONTYPE'] == 'simple':
 	class ConnectionObject(SimpleConnectionObject):
 		pass
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from typing import List
+
+import psycopg2
+
+from server.dbsupport.miscdbfunctions import resultiterator
+from server.formatting.wordformatting import hipparchiatranstable
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+
+
+class HeadwordPrefixIndex(object):
+	"""
+
+	an accent-folded, sorted, in-memory list of every headword in a dictionary
+
+	headwordsearch() used to send '.*?scrof.*?' to postgres as a '~*' query and that means a sequential scan of
+	the whole dictionary for every lookup; most lookups are really 'starts with' or 'is exactly' requests and
+	those can be answered via bisect()
+
+	    ' scrof'    -> prefix
+	    ' scrofa '  -> exact
+	    '^scrofa$'  -> exact
+	    'scrof'     -> substring [a linear scan, but of a python list and not of a table]
+
+	anything with real regex in it goes back to postgres: find() returns None
+
+	this is a borg: each dictionary is loaded once (on first use) and then shared
+
+	"""
+
+	_indices = dict()
+	_lock = threading.Lock()
+
+	unhandledregex = re.compile(r'[.*+?()|{}\\\[\]^$]')
+	transtable = hipparchiatranstable
+	ujfolding = str.maketrans('vj', 'ui')
+
+	def __init__(self, language: str):
+		assert language in ['greek', 'latin'], 'HeadwordPrefixIndex() only knows "greek" and "latin"'
+		self.language = language
+		with HeadwordPrefixIndex._lock:
+			if language not in HeadwordPrefixIndex._indices:
+				HeadwordPrefixIndex._indices[language] = self._loadindex(language)
+		self.keys, self.entries = HeadwordPrefixIndex._indices[language]
+
+	@staticmethod
+	def fold(word: str) -> str:
+		# stripaccents() turns 'U' into 'V': so lower() *after* that
+		folded = word.translate(HeadwordPrefixIndex.transtable).lower()
+		return folded.translate(HeadwordPrefixIndex.ujfolding)
+
+	@staticmethod
+	def _loadindex(language: str) -> tuple:
+		"""
+
+		return (sortedkeys, entries) where entries[n] is the (entry_name, id_number) that goes with sortedkeys[n]
+
+		greek is keyed via 'unaccented_entry' and latin via 'entry_name' since that is what headwordsearch()
+		was querying
+
+		"""
+
+		if language == 'greek':
+			column = 'unaccented_entry'
+		else:
+			column = 'entry_name'
+
+		dbconnection = ConnectionObject()
+		dbcursor = dbconnection.cursor()
+
+		q = 'SELECT entry_name, id_number, {c} FROM {lg}_dictionary'.format(c=column, lg=language)
+		try:
+			dbcursor.execute(q)
+			found = [(HeadwordPrefixIndex.fold(r[2]), r[0], r[1]) for r in resultiterator(dbcursor) if r[2]]
+		except psycopg2.ProgrammingError:
+			# psycopg2.ProgrammingError: relation "greek_dictionary" does not exist
+			found = list()
+
+		dbconnection.connectioncleanup()
+
+		found.sort()
+		keys = [f[0] for f in found]
+		entries = [(f[1], f[2]) for f in found]
+
+		return keys, entries
+
+	def isempty(self) -> bool:
+		return not self.keys
+
+	def find(self, seeking: str, limit: int) -> List[tuple]:
+		"""
+
+		return [(entry_name, id_number), ...] sorted by id_number; or None if 'seeking' is something only postgres can do
+
+		dictsearch() will have already turned 'u' into '[uvUV]', etc.: undo that
+
+		:param seeking:
+		:param limit:
+		:return:
+		"""
+
+		if self.isempty() or not seeking:
+			return None
+
+		s = seeking.replace('[uvUV]', 'u').replace('[ijIJ]', 'i')
+
+		if s[0] == ' ' and s[-1] == ' ' and len(s) > 2:
+			mode = 'exact'
+			s = s[1:-1]
+		elif s[0] == ' ':
+			mode = 'prefix'
+			s = s[1:]
+		elif s[0] == '^' and s[-1] == '$':
+			mode = 'exact'
+			s = s[1:-1]
+		else:
+			mode = 'substring'
+
+		if not s or ' ' in s or re.search(HeadwordPrefixIndex.unhandledregex, s):
+			return None
+
+		s = self.fold(s)
+
+		if mode == 'exact':
+			positions = range(bisect_left(self.keys, s), bisect_right(self.keys, s))
+		elif mode == 'prefix':
+			positions = range(bisect_left(self.keys, s), bisect_left(self.keys, s + '\U0010ffff'))
+		else:
+			positions = [i for i, k in enumerate(self.keys) if s in k]
+
+		found = sorted([self.entries[p] for p in positions], key=lambda x: x[1])
+
+		return found[:limit]
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import os
+import re
+import threading
+import time
+from hashlib import md5
+
+import psycopg2
+
+from server import hipparchia
+from server.dbsupport.tablefunctions import assignuniquename
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.connectionobject import SimpleConnectionObject
+
+
+class SharedIncludeLists(object):
+	"""
+
+	a borg that knows whether the include-lists can be materialized as shared tables
+
+	wholeworktemptablecontents() hands the searchers a statement along the lines of
+
+		CREATE TEMPORARY TABLE gr0001_includelist AS SELECT values AS includeindex FROM unnest(ARRAY[...]) values
+
+	and every query used to give that table a random name and build it all over again: once per lemma chunk,
+	once more for the second pass of a proximity search, again for vector acquisition, and then again the next
+	time anyone searched the same list of works
+
+	now the name comes from the contents of the list and the table is built once as an UNLOGGED table that every
+	connection can see; 'includelistregistry' records when each of them was last used and purgestaleincludelists()
+	drops the ones that have been sitting idle for longer than INCLUDELISTCACHETTL
+
+	the searchers are on readonly connections: so the shared table is built by DBWRITEUSER on an 'rw' connection and
+	then handed over to DBUSER via GRANT SELECT
+
+	if that does not work [no CREATE privilege, no 'rw' login, ...] each connection still keeps and reuses its own
+	temporary copy of a list since the name no longer changes from query to query; sharing is tried again after
+	'cooldown' seconds
+
+	every process keeps one 'rw' connection for all of this and remembers which tables it has already built or
+	touched: a list that is in '_known' is simply used; the registry only hears about it again once 'touchfraction'
+	of INCLUDELISTCACHETTL has gone by [which is still long before purgestaleincludelists() would want to drop it]
+
+	"""
+
+	_lock = threading.Lock()
+	_registryready = False
+	_unavailableuntil = 0.0
+	cooldown = 300
+	touchfraction = 0.25
+
+	_connectionlock = threading.Lock()
+	_connection = None
+	_connectionpid = None
+	_inherited = list()
+	# {tablename: time.time() of the last time this process built or touched it}
+	_known = dict()
+	registry = 'includelistregistry'
+	sharedfinder = re.compile(r'CREATE TEMPORARY TABLE IF NOT EXISTS (\w+_includelist_shared\w+) AS (.*)$', re.DOTALL)
+
+	@staticmethod
+	def coolingdown() -> bool:
+		return time.time() < SharedIncludeLists._unavailableuntil
+
+	@staticmethod
+	def unavailable(reason: str):
+		consolewarning('shared include-lists are unavailable for the next {s}s: {r}'.format(s=SharedIncludeLists.cooldown, r=reason), color='red')
+		SharedIncludeLists._registryready = False
+		SharedIncludeLists._unavailableuntil = time.time() + SharedIncludeLists.cooldown
+
+	@staticmethod
+	def connection() -> SimpleConnectionObject:
+		"""
+
+		this process's own 'rw' connection: made on first use and then kept; call with '_connectionlock' held
+
+		not a pooled connection: this is very often called from inside of a forked search worker
+
+		a connection that came across a fork belongs to the parent: it is set aside and never used or closed here
+		[closing it would close it for the parent too]
+
+		raises psycopg2.Error if DBWRITEUSER cannot log in
+
+		:return:
+		"""
+
+		if SharedIncludeLists._connectionpid != os.getpid():
+			if SharedIncludeLists._connection:
+				SharedIncludeLists._inherited.append(SharedIncludeLists._connection)
+			SharedIncludeLists._connection = None
+			SharedIncludeLists._connectionpid = os.getpid()
+
+		if not SharedIncludeLists._connection:
+			SharedIncludeLists._connection = SimpleConnectionObject(autocommit='autocommit', ctype='rw', exitonfailure=False)
+
+		return SharedIncludeLists._connection
+
+	@staticmethod
+	def dropconnection():
+		"""
+
+		forget a connection that has failed: the next call to connection() makes a new one
+
+		:return:
+		"""
+
+		dbconnection = SharedIncludeLists._connection
+		SharedIncludeLists._connection = None
+		if dbconnection:
+			try:
+				dbconnection.connectioncleanup()
+			except psycopg2.Error:
+				pass
+
+	@staticmethod
+	def isfresh(tablename: str) -> bool:
+		lasttouch = SharedIncludeLists._known.get(tablename, 0.0)
+		return time.time() - lasttouch < hipparchia.config['INCLUDELISTCACHETTL'] * SharedIncludeLists.touchfraction
+
+	@staticmethod
+	def remember(tablename: str):
+		now = time.time()
+		ttl = hipparchia.config['INCLUDELISTCACHETTL']
+		SharedIncludeLists._known[tablename] = now
+		if len(SharedIncludeLists._known) > 1000:
+			SharedIncludeLists._known = {t: SharedIncludeLists._known[t] for t in SharedIncludeLists._known if now - SharedIncludeLists._known[t] < ttl}
+
+	@staticmethod
+	def available(dbcursor) -> bool:
+		"""
+
+		make sure that the registry exists; and find out whether we are allowed to make it in the first place
+
+		:param dbcursor: a cursor of an 'rw' connection
+		:return:
+		"""
+
+		if SharedIncludeLists._registryready:
+			return True
+		if SharedIncludeLists.coolingdown():
+			return False
+
+		with SharedIncludeLists._lock:
+			dbcursor.execute('SELECT has_schema_privilege(current_user, current_schema(), %s)', ('CREATE',))
+			if not dbcursor.fetchone()[0]:
+				SharedIncludeLists.unavailable('DBWRITEUSER may not create tables')
+				return False
+
+			q = """
+			CREATE UNLOGGED TABLE IF NOT EXISTS {r} (
+				tablename varchar(64) PRIMARY KEY,
+				lastused timestamp DEFAULT now()
+			)
+			"""
+			dbcursor.execute(q.format(r=SharedIncludeLists.registry))
+			SharedIncludeLists._registryready = True
+
+		return True
+
+
+def nameincludelist(tempquery: str) -> tuple:
+	"""
+
+	pick the name that will replace 'UNIQUENAME' in '{au}_includelist_UNIQUENAME' and send it back along with the
+	statement that builds the table
+
+	with INCLUDELISTCACHE the name comes from the line numbers in the list [and the statement is allowed to find that
+	the table is already there]; otherwise it is random as it always was
+
+		('shared5c1e9d8bd8d4a3b2', 'CREATE TEMPORARY TABLE IF NOT EXISTS gr0001_includelist_UNIQUENAME AS ...')
+
+	:param tempquery:
+	:return:
+	"""
+
+	if not hipparchia.config['INCLUDELISTCACHE']:
+		return assignuniquename(), tempquery
+
+	contents = tempquery.split(' AS ', 1)[-1]
+	contents = re.sub(r'\s+', ' ', contents).strip()
+	suffix = 'shared{h}'.format(h=md5(contents.encode('utf-8')).hexdigest()[:16])
+	statement = tempquery
+	if 'IF NOT EXISTS' not in statement:
+		statement = statement.replace('CREATE TEMPORARY TABLE ', 'CREATE TEMPORARY TABLE IF NOT EXISTS ', 1)
+
+	return suffix, statement
+
+
+def buildsharedincludelist(tablename: str, contents: str) -> bool:
+	"""
+
+	build [or just touch] a shared include-list on this process's 'rw' connection and let DBUSER read it
+
+	nothing at all happens if this process has built or touched the table recently
+
+	the advisory lock keeps two workers from building the same table at the same time and keeps
+	purgestaleincludelists() from dropping it in between its creation and its registration
+
+	:param tablename:
+	:param contents:
+	:return:
+	"""
+
+	if SharedIncludeLists.coolingdown():
+		return False
+
+	if SharedIncludeLists.isfresh(tablename):
+		return True
+
+	touch = """
+	INSERT INTO {r} (tablename, lastused) VALUES (%s, now())
+		ON CONFLICT (tablename) DO UPDATE SET lastused = now()
+	"""
+
+	built = False
+	with SharedIncludeLists._connectionlock:
+		try:
+			dbcursor = SharedIncludeLists.connection().cursor()
+			if SharedIncludeLists.available(dbcursor):
+				dbcursor.execute('SELECT pg_advisory_lock(hashtext(%s))', (tablename,))
+				try:
+					dbcursor.execute('CREATE UNLOGGED TABLE IF NOT EXISTS {t} AS {c}'.format(t=tablename, c=contents))
+					dbcursor.execute('GRANT SELECT ON {t} TO {u}'.format(t=tablename, u=hipparchia.config['DBUSER']))
+					dbcursor.execute(touch.format(r=SharedIncludeLists.registry), (tablename,))
+					built = True
+				finally:
+					dbcursor.execute('SELECT pg_advisory_unlock(hashtext(%s))', (tablename,))
+		except psycopg2.Error as e:
+			# a failed login is a psycopg2.OperationalError too
+			SharedIncludeLists.dropconnection()
+			SharedIncludeLists.unavailable('could not share {t}: {e}'.format(t=tablename, e=e))
+
+	if built:
+		SharedIncludeLists.remember(tablename)
+
+	return built
+
+
+def executeincludelist(statement: str, dbcursor):
+	"""
+
+	build the include-list: a shared unlogged table if possible; the connection's own temporary table if not
+
+	:param statement:
+	:param dbcursor:
+	:return:
+	"""
+
+	shared = re.search(SharedIncludeLists.sharedfinder, statement)
+
+	if shared and buildsharedincludelist(shared.group(1), shared.group(2)):
+		return
+
+	dbcursor.execute(statement)
+
+	return
+
+
+def purgestaleincludelists(ttl=None) -> int:
+	"""
+
+	drop the shared include-lists that nobody has used in the last INCLUDELISTCACHETTL seconds
+
+	:param ttl:
+	:return:
+	"""
+
+	if ttl is None:
+		ttl = hipparchia.config['INCLUDELISTCACHETTL']
+
+	if SharedIncludeLists.coolingdown():
+		return 0
+
+	findstale = "SELECT tablename FROM {r} WHERE lastused < now() - %s * interval '1 second'"
+	stillstale = "SELECT 1 FROM {r} WHERE tablename = %s AND lastused < now() - %s * interval '1 second'"
+	forget = 'DELETE FROM {r} WHERE tablename = %s'
+	registry = SharedIncludeLists.registry
+
+	dropped = 0
+	with SharedIncludeLists._connectionlock:
+		try:
+			dbcursor = SharedIncludeLists.connection().cursor()
+			if not SharedIncludeLists.available(dbcursor):
+				return 0
+		except psycopg2.Error as e:
+			SharedIncludeLists.dropconnection()
+			SharedIncludeLists.unavailable('purgestaleincludelists() could not reach the registry: {e}'.format(e=e))
+			return 0
+
+		try:
+			dbcursor.execute(findstale.format(r=registry), (ttl,))
+			stale = [s[0] for s in dbcursor.fetchall()]
+			for tablename in stale:
+				dbcursor.execute('SELECT pg_advisory_lock(hashtext(%s))', (tablename,))
+				try:
+					# somebody might have picked it up again while we were busy with the others
+					dbcursor.execute(stillstale.format(r=registry), (tablename, ttl))
+					if dbcursor.fetchone():
+						dbcursor.execute('DROP TABLE IF EXISTS {t}'.format(t=tablename))
+						dbcursor.execute(forget.format(r=registry), (tablename,))
+						SharedIncludeLists._known.pop(tablename, None)
+						dropped += 1
+				finally:
+					dbcursor.execute('SELECT pg_advisory_unlock(hashtext(%s))', (tablename,))
+		except psycopg2.Error as e:
+			SharedIncludeLists.dropconnection()
+			consolewarning('purgestaleincludelists() failed: {e}'.format(e=e), color='red')
+
+	return dropped
@@ -69,6 +69,10 @@ class dbDictionaryEntry(object):
 		self.flaggedsenselist = list()
 		self.phraselist = list()
 		self.flagauthor = None
+		# bulkprobedictionary() can fill this with 'counts', 'xref', and 'lemma' so that nobody has to ask for them again
+		self.prefetched = dict()
+		# loadrenderedentry() fills this with what renderentry() found the last time this entry was converted
+		self.rendered = dict()
 
 		if re.search(r'[a-z]', self.entry):
 			self.usedictionary = 'latin'
@@ -126,13 +130,7 @@ class dbDictionaryEntry(object):
 		:return:
 		"""
 
-		afinder = re.compile(r'<span class="dictauthor">(.*?)</span>')
-		authorlist = re.findall(afinder, self.body)
-		authorlist = list(set(authorlist))
-		notin = ['id.', 'ib.', 'Id.']
-		authorlist[:] = [value for value in authorlist if value not in notin]
-		authorlist.sort()
-		authorlist = [deabbreviateauthors(au, self.usedictionary) for au in authorlist]
+		authorlist = self.findauthors()
 
 		if session['authorssummary']:
 			aa = len(authorlist)
@@ -143,6 +141,44 @@ class dbDictionaryEntry(object):
 
 		return authorlist
 
+	def findauthors(self) -> List[str]:
+		try:
+			return list(self.rendered['authors'])
+		except KeyError:
+			pass
+
+		afinder = re.compile(r'<span class="dictauthor">(.*?)</span>')
+		authorlist = re.findall(afinder, self.body)
+		authorlist = list(set(authorlist))
+		notin = ['id.', 'ib.', 'Id.']
+		authorlist[:] = [value for value in authorlist if value not in notin]
+		authorlist.sort()
+		authorlist = [deabbreviateauthors(au, self.usedictionary) for au in authorlist]
+		return authorlist
+
+	def findquotes(self) -> List[str]:
+		try:
+			return list(self.rendered['quotes'])
+		except KeyError:
+			pass
+
+		qfinder = re.compile(r'<span class="dictquote dictlang_\w+">(.*?)</span>')
+		quotelist = re.findall(qfinder, self.body)
+		quotelist = polytonicsort(quotelist)
+		return quotelist
+
+	def findphrases(self) -> List[str]:
+		try:
+			return list(self.rendered['phrases'])
+		except KeyError:
+			pass
+
+		phrasefinder = re.compile(r'<span class="dicttrans dictrewritten_phrase">(.*?)</span>')
+		phrases = re.findall(phrasefinder, self.body)
+		phrases = list(set(phrases))
+		phrases.sort()
+		return phrases
+
 	def generateflaggedsummary(self) -> List:
 		listofsenses = self.flaggedsenselist
 		listofsenses = [s[0].upper() + s[1:] for s in listofsenses if len(s) > 1]
@@ -173,8 +209,7 @@ class dbDictionaryEntry(object):
 		return listofsenses
 
 	def generatequotesummary(self, lemmaobject=None) -> List:
-		qfinder = re.compile(r'<span class="dictquote dictlang_\w+">(.*?)</span>')
-		quotelist = re.findall(qfinder, self.body)
+		quotelist = self.findquotes()
 
 		# many of the 'quotes' are really just forms of the word
 		# trim these
@@ -184,7 +219,6 @@ class dbDictionaryEntry(object):
 			morphologylist = list()
 
 		quotelist = [x for x in quotelist if x not in morphologylist]
-		quotelist = polytonicsort(quotelist)
 
 		if session['quotesummary']:
 			qq = len(quotelist)
@@ -227,7 +261,7 @@ class dbDictionaryEntry(object):
 		except AttributeError:
 			return str()
 
-	def insertclickablelookups(self):
+	def insertclickablelookups(self, flagauthors=True):
 		"""
 
 		in:
@@ -236,6 +270,8 @@ class dbDictionaryEntry(object):
 		out:
 			<bibl id="perseus/gr0019/003/1214" default="NO" valid="yes">
 
+		renderentry() skips the flagging since that depends on the session: see flagauthorlookups()
+
 		:return:
 		"""
 
@@ -282,11 +318,62 @@ class dbDictionaryEntry(object):
 		# clickableentry = re.sub(diofindera, r'id="perseus/lt\1/\2/\3"', clickableentry)
 		# clickableentry = re.sub(diofinderb, r'id="perseus/lt\1/\2/\3"', clickableentry)
 
+		self.body = clickableentry
+		if flagauthors:
+			self.flagauthorlookups()
+		self.haveclickablelookups = True
+		return
+
+	def flagauthorlookups(self):
+		"""
+
+		mark the lookups that belong to self.flagauthor
+
+		xmltohtmlconversions() keeps both 'class' and 'id' inside a '<bibl>', so this gives the same result
+		whether it runs before the conversion or after it
+
+		:return:
+		"""
+
 		if self.flagauthor and session['authorflagging']:
 			myid = r'id="perseus/{a}'.format(a=self.flagauthor)
-			clickableentry = re.sub(myid, r'class="flagged" ' + myid, clickableentry)
-		self.body = clickableentry
+			self.body = re.sub(myid, r'class="flagged" ' + myid, self.body)
+		return
+
+	def renderentry(self) -> dict:
+		"""
+
+		the whole xml to html conversion of the entry body along with the lists that get mined from the result
+
+		nothing in here depends on the session: it can be cached per entry and handed to loadrenderedentry()
+		the next time somebody clicks on the same word
+
+		:return:
+		"""
+
+		self.constructsensehierarchy()
+		self.runbodyxrefsuite()
+		self.insertclickablelookups(flagauthors=False)
+		# next is optional, really: a good CSS file will parse what you have thus far
+		# (HipparchiaServer v.1.1.2 has the old XML CSS)
+		self.xmltohtmlconversions()
+
+		rendered = {
+			'body': self.body,
+			'authors': self.findauthors(),
+			'quotes': self.findquotes(),
+			'phrases': self.findphrases()
+		}
+
+		return rendered
+
+	def loadrenderedentry(self, rendered: dict):
+		self.body = rendered['body']
+		self.rendered = rendered
+		self.havesensehierarchy = True
+		self.xrefspresent = True
 		self.haveclickablelookups = True
+		self.xmlhasbeenconverted = True
 		return
 
 	def constructsensehierarchy(self):
@@ -18,6 +18,7 @@ from server.formatting.lexicaformatting import formatdictionarysummary, formatpa
 from server.formatting.miscformatting import htmlcommentdecorator
 from server.formatting.wordformatting import attemptsigmadifferentiation, setdictionarylanguage
 from server.hipparchiaobjects.morphanalysisobjects import BaseFormMorphology
+from server.hipparchiaobjects.renderedentryobjects import renderwithcache
 
 
 class multipleWordOutputObject(object):
@@ -148,7 +149,7 @@ class lexicalOutputObject(object):
 		self.id = thiswordobject.id
 		self.usedictionary = setdictionarylanguage(thiswordobject.entry)
 		self.thisheadword = thiswordobject.entry
-		self.headwordprevalence = getobservedwordprevalencedata(self.thisheadword)
+		self.parserxref = None
 		self.entryhead = self.thiswordobject.grabheadmaterial()
 		self.entrysprincipleparts = self._buildprincipleparts()
 		self.entrydistributions = self._builddistributiondict()
@@ -158,10 +159,29 @@ class lexicalOutputObject(object):
 		self.phrasesummary = self._buildphrasesummary()
 		self.entrysummary = self._buildentrysummary()
 
+	@property
+	def headwordprevalence(self) -> str:
+		# nothing uses this at the moment: so do not pay for the query unless someone asks
+		return getobservedwordprevalencedata(self.thisheadword)
+
+	def _getparserxref(self) -> str:
+		if self.parserxref is None:
+			try:
+				self.parserxref = self.thiswordobject.prefetched['xref']
+			except KeyError:
+				self.parserxref = findparserxref(self.thiswordobject)
+		return self.parserxref
+
+	def _getcountobject(self):
+		try:
+			return self.thiswordobject.prefetched['counts']
+		except KeyError:
+			return querytotalwordcounts(self.thisheadword)
+
 	def _buildentrydistributionss(self) -> str:
 		distributions = str()
 		if session['showwordcounts']:
-			countobject = querytotalwordcounts(self.thisheadword)
+			countobject = self._getcountobject()
 			if countobject:
 				prev = formatprevalencedata(countobject)
 				distributions = '<p class="wordcounts">Prevalence (all forms):\n{pr}\n</p>'.format(pr=prev)
@@ -193,7 +213,7 @@ class lexicalOutputObject(object):
 			# and, sadly, some entries do not have a POS: "select pos from latin_dictionary where entry_name='declaro';"
 			# declaro: w.pos ['']
 			# if (fingerprints & set(w.pos)) or w.pos == ['']:
-			xref = findparserxref(w)
+			xref = self._getparserxref()
 			morphanalysis = BaseFormMorphology(w.entry, xref, self.usedictionary, self.id, session)
 			ppts = morphanalysis.getprincipleparts()
 			if ppts and morphanalysis.iammostlyconjugated():
@@ -210,7 +230,10 @@ class lexicalOutputObject(object):
 		blankcursor = None
 		entryword = self.thiswordobject
 		if not entryword.isagloss():
-			lemmaobject = grablemmataobjectfor(self.usedictionary + '_lemmata', word=entryword.entry, dbcursor=blankcursor)
+			try:
+				lemmaobject = entryword.prefetched['lemma']
+			except KeyError:
+				lemmaobject = grablemmataobjectfor(self.usedictionary + '_lemmata', word=entryword.entry, dbcursor=blankcursor)
 			entryword.authorlist = entryword.generateauthorsummary()
 			entryword.senselist = entryword.generatesensessummary()
 			entryword.quotelist = entryword.generatequotesummary(lemmaobject)
@@ -261,16 +284,12 @@ class lexicalOutputObject(object):
 	def _buildphrasesummary(self) -> List[str]:
 		if not session['phrasesummary']:
 			return list(str())
-		phrasefinder = re.compile(r'<span class="dicttrans dictrewritten_phrase">(.*?)</span>')
-		phrases = re.findall(phrasefinder, self.thiswordobject.body)
-		phrases = list(set(phrases))
-		phrases.sort()
-		return phrases
+		return self.thiswordobject.findphrases()
 
 	def _builddistributiondict(self) -> str:
 		distributions = str()
 		if session['showwordcounts']:
-			countobject = querytotalwordcounts(self.thisheadword)
+			countobject = self._getcountobject()
 			if countobject:
 				prev = formatprevalencedata(countobject)
 				distributions = '<p class="wordcounts">Prevalence (all forms):\n{pr}\n</p>'.format(pr=prev)
@@ -280,12 +299,9 @@ class lexicalOutputObject(object):
 		fullentrystring = '<br /><br />\n<span class="lexiconhighlight">Full entry:</span><br />'
 		suppressedmorph = '<br /><br />\n<span class="lexiconhighlight">(Morphology notes hidden)</span><br />'
 		w = self.thiswordobject
-		w.constructsensehierarchy()
-		w.runbodyxrefsuite()
-		w.insertclickablelookups()
-		# next is optional, really: a good CSS file will parse what you have thus far
-		# (HipparchiaServer v.1.1.2 has the old XML CSS)
-		w.xmltohtmlconversions()
+		# constructsensehierarchy(), runbodyxrefsuite(), insertclickablelookups(), xmltohtmlconversions(): or the cached result thereof
+		renderwithcache(w)
+		w.flagauthorlookups()
 		segments = list()
 		segments.append(w.grabheadmaterial())
 		# segments.append(suppressedmorph)
@@ -334,7 +350,7 @@ class lexicalOutputObject(object):
 
 		if session['debuglex']:
 			outputlist.append(codestr.format(wordid=w.id))
-			xref = findparserxref(w)
+			xref = self._getparserxref()
 			outputlist.append(xrefstr.format(xref=xref))
 		outputlist.append('</p>')
 
@@ -350,5 +366,5 @@ class lexicalOutputObject(object):
 		if session['zaplunates']:
 			fullentry = attemptsigmadifferentiation(fullentry)
 
-		fullentry = divtemplate.format(wd=self.thisheadword, idx=findparserxref(w), entry=fullentry)
+		fullentry = divtemplate.format(wd=self.thisheadword, idx=self._getparserxref(), entry=fullentry)
 		return fullentry
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import threading
+from collections import OrderedDict
+
+from server import hipparchia
+
+
+class LRUMemory(object):
+	"""
+
+	an OrderedDict behind a lock that forgets its least recently used items once it holds more than
+	hipparchia.config[sizesetting] of them
+
+	the caching borgs each keep one of these as a class attribute: e.g.
+
+		_memory = LRUMemory('CONCORDANCECACHEMEMORYLIMIT')
+
+	the setting is read on every store() so that a changed config takes effect without a restart
+
+	"""
+
+	def __init__(self, sizesetting: str):
+		self.sizesetting = sizesetting
+		self._lock = threading.Lock()
+		self._items = OrderedDict()
+
+	def __contains__(self, key) -> bool:
+		with self._lock:
+			return key in self._items
+
+	def __len__(self) -> int:
+		with self._lock:
+			return len(self._items)
+
+	def fetch(self, key):
+		"""
+
+		the item (which is now the most recently used one) or None
+
+		:param key:
+		:return:
+		"""
+
+		with self._lock:
+			try:
+				self._items.move_to_end(key)
+				return self._items[key]
+			except KeyError:
+				return None
+
+	def store(self, key, item):
+		with self._lock:
+			self._items[key] = item
+			self._items.move_to_end(key)
+			self._trim()
+
+	def fetchorstore(self, key, builder):
+		"""
+
+		fetch() the item; if it is not there, store() whatever builder() returns: all under one lock
+
+		builder() should be cheap: everybody else waits on it
+
+		:param key:
+		:param builder:
+		:return:
+		"""
+
+		with self._lock:
+			try:
+				self._items.move_to_end(key)
+				return self._items[key]
+			except KeyError:
+				pass
+			item = builder()
+			self._items[key] = item
+			self._trim()
+			return item
+
+	def values(self) -> list:
+		"""
+
+		a snapshot: the items can be looked at after the lock has been let go of
+
+		:return:
+		"""
+
+		with self._lock:
+			return list(self._items.values())
+
+	def _trim(self):
+		limit = max(hipparchia.config[self.sizesetting], 0)
+		while len(self._items) > limit:
+			self._items.popitem(last=False)
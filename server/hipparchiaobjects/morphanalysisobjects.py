@@ -6,15 +6,13 @@
 		(see LICENSE in the top level directory of the distribution)
 """
 
-import itertools
 import re
 from typing import List
 
-from server.dbsupport.lexicaldbfunctions import bulkfindmorphologyobjects, bulkfindwordcounts, grablemmataobjectfor
+from server.dbsupport.lexicaldbfunctions import bulkfindallwordcounts, bulkfindmorphologyobjects, grablemmataobjectfor
 from server.formatting.miscformatting import consolewarning
 from server.formatting.morphologytableformatting import declinedtabletemplate, filloutmorphtabletemplate, \
 	verbtabletemplate
-from server.formatting.wordformatting import stripaccents
 from server.startup import lemmatadict
 
 
@@ -189,10 +187,10 @@ class BaseFormMorphology(object):
 		returnarray = cff.buildhtmlverbtablerows(thesession)
 		return returnarray
 
-	def buildhtmldeclinedtablerows(self) -> List[str]:
+	def buildhtmldeclinedtablerows(self, thesession: dict) -> List[str]:
 		keyedwcounts = self._generatekeyedwordcounts()
 		dff = DeclinedFormFunctions(self.headword, self.listofanalyses, self.language, keyedwcounts, self.knowndialects, self.showalldialects, self.collapseattic)
-		returnarray = dff.buildhtmldeclinedtablerows()
+		returnarray = dff.buildhtmldeclinedtablerows(thesession)
 		return returnarray
 
 	def _generatekeyedwordcounts(self) -> dict:
@@ -206,11 +204,8 @@ class BaseFormMorphology(object):
 		:return:
 		"""
 		wordset = {re.sub(r"'$", str(), a.word) for a in self.listofanalyses}
-		initials = {stripaccents(w[0]) for w in wordset}
-		byinitial = {i: [w for w in wordset if stripaccents(w[0]) == i] for i in initials}
-		wco = [bulkfindwordcounts(byinitial[i]) for i in byinitial]
-		wco = list(itertools.chain(*wco))
-		keyedwcounts = {w.entryname: w.t for w in wco if w}
+		wco = bulkfindallwordcounts(list(wordset))
+		keyedwcounts = {w.entryname: w.t for w in wco.values() if w}
 		return keyedwcounts
 
 	def _getmorphpossibilities(self) -> list:
@@ -688,7 +683,7 @@ class DeclinedFormFunctions(object):
 		self.showalldialects = showalldialects
 		self.collapseattic = collapseattic
 
-	def buildhtmldeclinedtablerows(self) -> List[str]:
+	def buildhtmldeclinedtablerows(self, thesession: dict) -> List[str]:
 		returnarray = list()
 		fd = self._generatedeclinedformdictionary()
 		mygenders = self._getmygenders()
@@ -698,8 +693,8 @@ class DeclinedFormFunctions(object):
 			dialects = self._atticlist()
 		for d in dialects:
 			if self._declinedtablewillhavecontents(d):
-				t = declinedtabletemplate(dialect=d, duals=self._icontainduals(), lang=self.language, skipgenders=skipgenders)
-				returnarray.append(filloutmorphtabletemplate(fd, self.keyedwordcounts, t))
+				t = declinedtabletemplate(dialect=d, duals=self._icontainduals(), lang=self.language, skipgenders=skipgenders, emptyrows=thesession['morphemptyrows'])
+				returnarray.append(filloutmorphtabletemplate(fd, self.keyedwordcounts, t, emptyrows=thesession['morphemptyrows']))
 		return returnarray
 
 	def _atticlist(self) -> list:
@@ -802,6 +797,7 @@ class ConjugatedFormFunctions(object):
 	def buildhtmlverbtablerows(self, thesession: dict) -> List[str]:
 		returnarray = list()
 		moods = self._generatemoodlist(thesession)
+		duals = self._icontainduals() and thesession['morphduals']
 		fd = self._generateverbformdictionary()
 		dialects = self.knowndialects
 		if not self.showalldialects:
@@ -810,8 +806,8 @@ class ConjugatedFormFunctions(object):
 			for v in self.knownvoices:
 				for m in moods:
 					if self._verbtablewillhavecontents(d, v, m):
-						t = verbtabletemplate(m, v, dialect=d, duals=self._icontainduals(), lang=self.language)
-						returnarray.append(filloutmorphtabletemplate(fd, self.keyedwordcounts, t))
+						t = verbtabletemplate(m, v, dialect=d, duals=duals, lang=self.language, emptyrows=thesession['morphemptyrows'])
+						returnarray.append(filloutmorphtabletemplate(fd, self.keyedwordcounts, t, emptyrows=thesession['morphemptyrows']))
 		return returnarray
 
 	def _atticlist(self) -> list:
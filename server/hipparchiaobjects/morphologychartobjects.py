@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+from server import hipparchia
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+from server.hipparchiaobjects.morphanalysisobjects import BaseFormMorphology
+
+
+class MorphologyChartCache(object):
+	"""
+
+	a borg that holds the most recent MORPHOLOGYCHARTCACHESIZE morphology charts
+
+		{'conjugated': ['<table class="verbanalysis">', ...] or None, 'declined': [...] or None}
+
+	knownforms() used to build a BaseFormMorphology() every time: grab every form of the headword, look up its
+	analyses and its wordcounts, parse every analysis, and then fill out one big table template after another;
+	and the charts for λύω or sum get asked for over and over again
+
+	the key is the headword plus the session flags that change what goes into the tables; the title line and
+	the lunate sigma swap are cheap and so they are left to the caller
+
+	"""
+
+	_memory = LRUMemory('MORPHOLOGYCHARTCACHESIZE')
+
+	chartfields = ('morphdialects', 'collapseattic', 'morphduals', 'morphemptyrows', 'morphfinite', 'morphimper',
+	               'morphinfin', 'morphpcpls')
+
+	@staticmethod
+	def defaultsettings() -> dict:
+		"""
+
+		the chartfields as probeforsessionvariables() would set them for a new session
+
+		:return:
+		"""
+
+		return {
+			'morphdialects': hipparchia.config['DEFAULTMORPHDIALECTS'],
+			'collapseattic': True,
+			'morphduals': hipparchia.config['DEFAULTMORPHDUALS'],
+			'morphemptyrows': hipparchia.config['DEFAULTMORPHEMPTYROWS'],
+			'morphfinite': hipparchia.config['DEFAULTMORPHFINITE'],
+			'morphimper': hipparchia.config['DEFAULTMORPHIMPERATIVES'],
+			'morphinfin': hipparchia.config['DEFAULTMORPHINFINITIVES'],
+			'morphpcpls': hipparchia.config['DEFAULTMORPHIMPARTICIPLES']
+		}
+
+	@staticmethod
+	def keyfor(headword: str, xrefid: str, language: str, thesession) -> tuple:
+		return (language, xrefid, headword) + tuple(thesession.get(f) for f in MorphologyChartCache.chartfields)
+
+	def fetch(self, key: tuple) -> dict:
+		return MorphologyChartCache._memory.fetch(key)
+
+	def store(self, key: tuple, chart: dict):
+		MorphologyChartCache._memory.store(key, chart)
+
+	def isknown(self, key: tuple) -> bool:
+		return key in MorphologyChartCache._memory
+
+
+def buildmorphologychart(headword: str, xrefid: str, language: str, lexicalid: str, thesession) -> dict:
+	"""
+
+	the tables for all known forms of a headword: from the MorphologyChartCache if possible
+
+	'thesession' can be the flask session or any dict that has the MorphologyChartCache.chartfields in it
+
+	raises whatever BaseFormMorphology() raises if the headword cannot be analyzed
+
+	:param headword:
+	:param xrefid:
+	:param language:
+	:param lexicalid:
+	:param thesession:
+	:return:
+	"""
+
+	cache = MorphologyChartCache()
+	key = cache.keyfor(headword, xrefid, language, thesession)
+
+	chart = cache.fetch(key)
+	if chart:
+		return chart
+
+	bfo = BaseFormMorphology(headword, xrefid, language, lexicalid, thesession)
+
+	chart = {'conjugated': None, 'declined': None}
+	if bfo.iammostlyconjugated():
+		chart['conjugated'] = bfo.buildhtmlverbtablerows(thesession)
+	if bfo.iamdeclined():
+		chart['declined'] = bfo.buildhtmldeclinedtablerows(thesession)
+
+	cache.store(key, chart)
+
+	return chart
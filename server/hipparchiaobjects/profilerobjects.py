@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from multiprocessing import util as multiprocessingutil
+from os import path
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.atomicfileobjects import writeatomically
+
+
+class SamplingProfiler(object):
+	"""
+
+	a borg that looks at the stacks of the threads it has been told to watch every SAMPLINGPROFILERINTERVAL seconds
+
+	unlike '--profiling' this costs next to nothing when nobody is being watched and not very much when somebody is:
+	it does not trace every call; it just takes a peek now and then
+
+	an operator arms it for a route ('/search/standard') or for one poll id via '/debug/profiler/...'; the arming is
+	a file in SAMPLINGPROFILERDIRECTORY so that every server process sees it
+
+	a search that forks its workers takes the profiler along: a child forked by a thread that was being watched starts
+	watching its own main thread and writes its own file when it is done
+
+	the output is in the 'folded' format that flamegraph.pl, inferno, speedscope, etc. all read:
+
+		$ cat SAMPLINGPROFILERDIRECTORY/20220304_101112_search_standard_*.folded | flamegraph.pl > search.svg
+
+	"""
+
+	_lock = threading.Lock()
+	_watching = dict()
+	_sampler = None
+	_armed = None
+	_armedmtime = None
+
+	@staticmethod
+	def directory() -> str:
+		return hipparchia.config['SAMPLINGPROFILERDIRECTORY']
+
+	@staticmethod
+	def armingfile() -> str:
+		return path.join(SamplingProfiler.directory(), 'armed.json')
+
+	@staticmethod
+	def arm(kind: str, target: str):
+		assert kind in ['route', 'poll'], 'the profiler can only be armed for a "route" or a "poll"'
+		armedwith = json.dumps({'kind': kind, 'target': target})
+		writeatomically(SamplingProfiler.armingfile(), armedwith.encode('utf-8'))
+
+	@staticmethod
+	def disarm():
+		try:
+			os.remove(SamplingProfiler.armingfile())
+		except FileNotFoundError:
+			pass
+
+	@staticmethod
+	def armedfor() -> dict:
+		"""
+
+		{'kind': 'route', 'target': '/search/standard'} or None
+
+		the file only gets read again if it has changed
+
+		:return:
+		"""
+
+		if not SamplingProfiler.directory():
+			return None
+
+		try:
+			mtime = os.stat(SamplingProfiler.armingfile()).st_mtime
+		except OSError:
+			SamplingProfiler._armed = None
+			SamplingProfiler._armedmtime = None
+			return None
+
+		if mtime != SamplingProfiler._armedmtime:
+			try:
+				with open(SamplingProfiler.armingfile()) as f:
+					SamplingProfiler._armed = json.load(f)
+			except (OSError, ValueError):
+				SamplingProfiler._armed = None
+			SamplingProfiler._armedmtime = mtime
+
+		return SamplingProfiler._armed
+
+	@staticmethod
+	def wants(requestpath: str, viewarguments: dict) -> str:
+		"""
+
+		a label for the output if this request should be watched; otherwise an empty string
+
+		:param requestpath:
+		:param viewarguments:
+		:return:
+		"""
+
+		armed = SamplingProfiler.armedfor()
+		if not armed:
+			return str()
+
+		if armed['kind'] == 'route' and requestpath.startswith(armed['target']):
+			return armed['target']
+		if armed['kind'] == 'poll' and armed['target'] in [str(v) for v in (viewarguments or dict()).values()]:
+			return 'poll_{p}'.format(p=armed['target'])
+
+		return str()
+
+	@staticmethod
+	def watch(label: str):
+		"""
+
+		start sampling the current thread
+
+		:param label:
+		:return:
+		"""
+
+		runname = '{t}_{l}'.format(t=time.strftime('%Y%m%d_%H%M%S'), l=label.strip('/').replace('/', '_'))
+		with SamplingProfiler._lock:
+			SamplingProfiler._watching[threading.get_ident()] = {'run': runname, 'stacks': Counter()}
+			if not SamplingProfiler._sampler or not SamplingProfiler._sampler.is_alive():
+				SamplingProfiler._sampler = threading.Thread(target=SamplingProfiler._sample, name='samplingprofiler', daemon=True)
+				SamplingProfiler._sampler.start()
+
+	@staticmethod
+	def stopwatching():
+		"""
+
+		stop sampling the current thread and write out what was seen
+
+		:return:
+		"""
+
+		with SamplingProfiler._lock:
+			watched = SamplingProfiler._watching.pop(threading.get_ident(), None)
+
+		if watched:
+			SamplingProfiler._write(watched)
+
+	@staticmethod
+	def iswatching() -> bool:
+		with SamplingProfiler._lock:
+			return threading.get_ident() in SamplingProfiler._watching
+
+	@staticmethod
+	def _sample():
+		"""
+
+		runs until there is nobody left to watch
+
+		the decision to quit is made under the lock and the sampler unregisters itself before letting go of it:
+		otherwise watch() could see a sampler that is on its way out and not bother to start a new one
+
+		:return:
+		"""
+
+		interval = hipparchia.config['SAMPLINGPROFILERINTERVAL']
+		while True:
+			frames = sys._current_frames()
+			with SamplingProfiler._lock:
+				if not SamplingProfiler._watching:
+					SamplingProfiler._sampler = None
+					return
+				for ident, watched in SamplingProfiler._watching.items():
+					if ident in frames:
+						watched['stacks'][SamplingProfiler._fold(frames[ident])] += 1
+			time.sleep(interval)
+
+	@staticmethod
+	def _fold(frame) -> str:
+		"""
+
+		'run.py:<module>;app.py:wsgi_app;searchroute.py:executesearch;...'
+
+		:param frame:
+		:return:
+		"""
+
+		stack = list()
+		while frame:
+			code = frame.f_code
+			stack.append('{f}:{n}'.format(f=path.basename(code.co_filename), n=code.co_name))
+			frame = frame.f_back
+		stack.reverse()
+		return ';'.join(stack)
+
+	@staticmethod
+	def _write(watched: dict):
+		if not watched['stacks']:
+			return
+		filename = path.join(SamplingProfiler.directory(), '{r}_{p}.folded'.format(r=watched['run'], p=os.getpid()))
+		try:
+			with open(filename, 'w') as f:
+				for stack, count in watched['stacks'].items():
+					f.write('{s} {c}\n'.format(s=stack, c=count))
+		except OSError as e:
+			consolewarning('SamplingProfiler could not write {f}: {e}'.format(f=filename, e=e), color='red')
+
+	@staticmethod
+	def adoptforkedchild():
+		"""
+
+		the child of a fork has only one thread: the copy of the one that called fork()
+
+		if that thread was being watched, keep watching it here with a sampler of our own; the results get written
+		when multiprocessing shuts the worker down
+
+		:return:
+		"""
+
+		ident = threading.get_ident()
+		SamplingProfiler._lock = threading.Lock()
+		SamplingProfiler._sampler = None
+		inherited = SamplingProfiler._watching.get(ident)
+		SamplingProfiler._watching = dict()
+
+		if not inherited:
+			return
+
+		SamplingProfiler._watching[ident] = {'run': inherited['run'], 'stacks': Counter()}
+		SamplingProfiler._sampler = threading.Thread(target=SamplingProfiler._sample, name='samplingprofiler', daemon=True)
+		SamplingProfiler._sampler.start()
+		multiprocessingutil.Finalize(None, SamplingProfiler.stopwatching, exitpriority=10)
+
+	@staticmethod
+	def status() -> dict:
+		found = list()
+		if SamplingProfiler.directory() and path.isdir(SamplingProfiler.directory()):
+			found = sorted(f for f in os.listdir(SamplingProfiler.directory()) if f.endswith('.folded'))
+		return {'directory': SamplingProfiler.directory(), 'armed': SamplingProfiler.armedfor(), 'profiles': found}
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=SamplingProfiler.adoptforkedchild)
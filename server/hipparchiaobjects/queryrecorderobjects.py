@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import json
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing import current_process
+from os import getpid, path, replace
+
+import psycopg2
+import psycopg2.extensions
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+
+
+class QueryRecorder(object):
+	"""
+
+	a borg that writes down what the database was asked to do and how long it took
+
+		{'when': ..., 'process': 'Process-3', 'table': 'gr0012', 'wheretype': 'temptable', 'query': 'SELECT ...',
+		'parameters': "('μῆνιν',)", 'duration': 1.834, 'rows': 200, 'plan': ['Limit  (cost=...', ...]}
+
+	queries slower than QUERYRECORDERTHRESHOLD are run a second time as 'EXPLAIN (ANALYZE, BUFFERS) ...' so that you
+	can see what postgres actually did with them
+
+	the searches are executed by a pool of forked processes: the records cannot just sit in memory here since the
+	process that answers '/debug/queryrecorder' is not the one that ran the queries; so they go into a file that is
+	cut into two segments: once the current one is full it replaces the previous one
+
+	"""
+
+	_lock = threading.Lock()
+	segmentsize = 4 * 1024 * 1024
+	maximumquerylength = 4000
+	maximumparameterlength = 500
+	tablefinder = re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE)
+	explainable = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+	@staticmethod
+	def filename() -> str:
+		if hipparchia.config['QUERYRECORDERFILE']:
+			return hipparchia.config['QUERYRECORDERFILE']
+		return path.join(tempfile.gettempdir(), 'hipparchia_queryrecorder.jsonl')
+
+	@staticmethod
+	def wheretype(querystring: str) -> str:
+		"""
+
+		which of the where-clause styles of searchlistintosqldict() produced this query?
+
+		:param querystring:
+		:return:
+		"""
+
+		if '_includelist' in querystring:
+			return 'temptable'
+		if re.search(r'\bBETWEEN\b', querystring, re.IGNORECASE):
+			return 'between'
+		if re.search(r'\bWHERE\b', querystring, re.IGNORECASE):
+			return 'other'
+		return 'unrestricted'
+
+	def record(self, cursor, query, parameters, duration: float):
+		try:
+			if isinstance(query, bytes):
+				querystring = query.decode('utf-8', errors='replace')
+			elif isinstance(query, str):
+				querystring = query
+			else:
+				# psycopg2.sql.Composed, etc.
+				querystring = query.as_string(cursor)
+		except (AttributeError, TypeError, psycopg2.Error):
+			querystring = str(query)
+
+		table = re.search(QueryRecorder.tablefinder, querystring)
+
+		entry = {
+			'when': time.strftime('%Y-%m-%d %H:%M:%S'),
+			'process': '{n} ({p})'.format(n=current_process().name, p=getpid()),
+			'table': table.group(1) if table else str(),
+			'wheretype': self.wheretype(querystring),
+			'query': querystring[:QueryRecorder.maximumquerylength],
+			'parameters': repr(parameters)[:QueryRecorder.maximumparameterlength],
+			'duration': round(duration, 4),
+			'rows': cursor.rowcount,
+			'plan': list()
+		}
+
+		if duration >= hipparchia.config['QUERYRECORDERTHRESHOLD']:
+			entry['plan'] = self.explain(cursor, querystring, parameters)
+
+		self.write(entry)
+
+	@staticmethod
+	def explain(cursor, querystring: str, parameters) -> list:
+		"""
+
+		run it again as 'EXPLAIN (ANALYZE, BUFFERS)'
+
+		only SELECTs: ANALYZE really does execute the statement; and only in autocommit mode since a failure would
+		otherwise leave the caller's transaction aborted
+
+		:param cursor:
+		:param querystring:
+		:param parameters:
+		:return:
+		"""
+
+		if not re.search(QueryRecorder.explainable, querystring):
+			return list()
+		if not cursor.connection.autocommit:
+			return ['[no plan: the connection was inside of a transaction]']
+
+		explainer = cursor.connection.cursor(cursor_factory=psycopg2.extensions.cursor)
+		try:
+			explainer.execute('EXPLAIN (ANALYZE, BUFFERS) ' + querystring, parameters)
+			plan = [p[0] for p in explainer.fetchall()]
+		except psycopg2.Error as e:
+			plan = ['[no plan: {e}]'.format(e=e)]
+		explainer.close()
+
+		return plan
+
+	def write(self, entry: dict):
+		filename = self.filename()
+		line = json.dumps(entry, ensure_ascii=False) + '\n'
+		with QueryRecorder._lock:
+			try:
+				if path.isfile(filename) and path.getsize(filename) > QueryRecorder.segmentsize:
+					replace(filename, filename + '.1')
+				with open(filename, 'a', encoding='utf-8') as f:
+					f.write(line)
+			except OSError as e:
+				consolewarning('QueryRecorder could not write to {f}: {e}'.format(f=filename, e=e), color='red')
+
+	def entries(self) -> list:
+		"""
+
+		the most recent QUERYRECORDERSIZE records: oldest first
+
+		:return:
+		"""
+
+		filename = self.filename()
+		found = deque(maxlen=max(hipparchia.config['QUERYRECORDERSIZE'], 1))
+		for segment in [filename + '.1', filename]:
+			if not path.isfile(segment):
+				continue
+			try:
+				with open(segment, encoding='utf-8') as f:
+					for line in f:
+						try:
+							found.append(json.loads(line))
+						except ValueError:
+							# a half-written line from a process that was killed mid-write
+							pass
+			except OSError as e:
+				consolewarning('QueryRecorder could not read {f}: {e}'.format(f=segment, e=e), color='red')
+		return list(found)
+
+	def report(self, slowest=25) -> dict:
+		"""
+
+		which tables and which where-clause styles are eating the time?
+
+		:param slowest:
+		:return:
+		"""
+
+		entries = self.entries()
+
+		def summarize(key: str) -> dict:
+			summary = dict()
+			for e in entries:
+				s = summary.setdefault(e[key], {'queries': 0, 'seconds': 0.0, 'rows': 0})
+				s['queries'] += 1
+				s['seconds'] = round(s['seconds'] + e['duration'], 4)
+				s['rows'] += max(e['rows'], 0)
+			return dict(sorted(summary.items(), key=lambda x: x[1]['seconds'], reverse=True))
+
+		report = {
+			'recorded': len(entries),
+			'threshold': hipparchia.config['QUERYRECORDERTHRESHOLD'],
+			'bywheretype': summarize('wheretype'),
+			'bytable': summarize('table'),
+			'slowest': sorted(entries, key=lambda x: x['duration'], reverse=True)[:slowest]
+		}
+
+		return report
+
+
+class RecordingCursor(psycopg2.extensions.cursor):
+	"""
+
+	a cursor that reports every execute() to the QueryRecorder
+
+	ConnectionObject() hands this out instead of the plain cursor if QUERYRECORDER is set
+
+	"""
+
+	def execute(self, query, vars=None):
+		start = time.time()
+		result = super().execute(query, vars)
+		QueryRecorder().record(self, query, vars, time.time() - start)
+		return result
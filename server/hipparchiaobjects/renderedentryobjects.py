@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import hashlib
+import inspect
+import pickle
+from os import path
+
+from server import hipparchia
+from server.dbsupport.dbbuildinfo import dictionaryfingerprint
+from server.formatting import abbreviations
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects import lexicalobjects
+from server.hipparchiaobjects.atomicfileobjects import pickleatomically
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+
+
+class RenderedEntryCache(object):
+	"""
+
+	a borg that holds the output of dbDictionaryEntry.renderentry(): the html of the body (with its sense hierarchy)
+	plus the author, quote, and phrase lists that get pulled out of it
+
+		{'body': '<span class="dictorth ...', 'authors': [...], 'quotes': [...], 'phrases': [...]}
+
+	lexicalOutputObject() used to run the full xml to html conversion every time a word was clicked; the same
+	handful of common words get clicked over and over again
+
+	the most recently used DICTIONARYENTRYCACHEMEMORYLIMIT entries stay in memory; if DICTIONARYENTRYCACHEDIRECTORY
+	is set every entry is also written to disk (and prewarmrenderedentries() can fill that in ahead of time)
+
+	the on-disk copies live in a subdirectory named after a fingerprint of the dictionary tables and of the code
+	that does the converting: reload the dictionaries or edit lexicalobjects.py and the old entries are just ignored
+
+	"""
+
+	_memory = LRUMemory('DICTIONARYENTRYCACHEMEMORYLIMIT')
+	_fingerprint = None
+
+	@staticmethod
+	def fingerprint() -> str:
+		if RenderedEntryCache._fingerprint:
+			return RenderedEntryCache._fingerprint
+
+		try:
+			code = inspect.getsource(lexicalobjects) + inspect.getsource(abbreviations)
+		except (OSError, TypeError):
+			# no source to look at: fall back on the version of the module files
+			code = str(path.getmtime(lexicalobjects.__file__)) + str(path.getmtime(abbreviations.__file__))
+
+		ingredients = [dictionaryfingerprint(), code, str(hipparchia.config['DEABBREVIATEAUTHORS'])]
+		digest = hashlib.md5(str(ingredients).encode('utf-8')).hexdigest()[:12]
+		RenderedEntryCache._fingerprint = digest
+		return digest
+
+	@staticmethod
+	def _key(wordobject) -> tuple:
+		return wordobject.usedictionary, str(wordobject.id)
+
+	def _filename(self, key: tuple) -> str:
+		directory = path.join(hipparchia.config['DICTIONARYENTRYCACHEDIRECTORY'], self.fingerprint(), key[0])
+		return path.join(directory, '{i}.pickle'.format(i=key[1]))
+
+	def isondisk(self, wordobject) -> bool:
+		if not hipparchia.config['DICTIONARYENTRYCACHEDIRECTORY']:
+			return False
+		return path.isfile(self._filename(self._key(wordobject)))
+
+	def fetch(self, wordobject) -> dict:
+		"""
+
+		memory, then disk; None if the entry still needs to be rendered
+
+		:param wordobject:
+		:return:
+		"""
+
+		key = self._key(wordobject)
+
+		rendered = RenderedEntryCache._memory.fetch(key)
+		if rendered:
+			return rendered
+
+		if not hipparchia.config['DICTIONARYENTRYCACHEDIRECTORY']:
+			return None
+
+		filename = self._filename(key)
+		if not path.isfile(filename):
+			return None
+
+		try:
+			with open(filename, 'rb') as f:
+				rendered = pickle.load(f)
+		except (OSError, pickle.UnpicklingError, EOFError) as e:
+			consolewarning('could not read the dictionary entry in {f}: {e}'.format(f=filename, e=e), color='red')
+			return None
+
+		self._remember(key, rendered)
+		return rendered
+
+	def store(self, wordobject, rendered: dict, keepinmemory=True):
+		key = self._key(wordobject)
+		if keepinmemory:
+			self._remember(key, rendered)
+
+		if not hipparchia.config['DICTIONARYENTRYCACHEDIRECTORY']:
+			return
+
+		filename = self._filename(key)
+		try:
+			pickleatomically(filename, rendered)
+		except OSError as e:
+			consolewarning('could not write the dictionary entry to {f}: {e}'.format(f=filename, e=e), color='red')
+
+	def _remember(self, key: tuple, rendered: dict):
+		RenderedEntryCache._memory.store(key, rendered)
+
+
+def renderwithcache(wordobject):
+	"""
+
+	give the wordobject its rendered body: from the cache if possible; otherwise render it and store the result
+
+	:param wordobject:
+	:return:
+	"""
+
+	if not hipparchia.config['DICTIONARYENTRYCACHE']:
+		wordobject.loadrenderedentry(wordobject.renderentry())
+		return
+
+	cache = RenderedEntryCache()
+	rendered = cache.fetch(wordobject)
+	if not rendered:
+		rendered = wordobject.renderentry()
+		cache.store(wordobject, rendered)
+
+	wordobject.loadrenderedentry(rendered)
+	return
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import json
+import threading
+from hashlib import md5
+
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+
+
+class CompiledSelection(object):
+	"""
+
+	what one particular set of selections, exclusions, dates, and corpora works out to
+
+		searchlist: the output of compilesearchlist(): ['gr0012w001', 'gr0012w002', ...]
+		selectionsinfo: the output of sessionselectionsinfo(): the html for #selectionstable
+
+	each gets filled in the first time somebody asks for it
+
+	"""
+
+	def __init__(self, key: str):
+		self.key = key
+		self.searchlist = None
+		self.selectionsinfo = None
+
+
+class CompiledSelectionCache(object):
+	"""
+
+	a borg that holds the most recent SELECTIONCACHESIZE CompiledSelections
+
+	every search, every look at the search list, every vector scope check, and every redraw of the selections table
+	used to turn the same genres, locations, dates, and exclusions into the same list of works all over again
+
+	the key is a hash of the selection-related fields of the session: so selectionmade(), clearselections(),
+	setsessionvariable() [and loading a saved cookie or resetting the session] automatically point a session
+	at a new CompiledSelection; nothing has to remember to throw the old one away
+
+	NB: flask keeps the session in a cookie; 200k work ids will not fit in there: so the session gets the key and the
+	compiled material stays here
+
+	"""
+
+	_lock = threading.Lock()
+	_memory = LRUMemory('SELECTIONCACHESIZE')
+	_reducedmappers = dict()
+
+	selectionfields = (
+		'auselections', 'wkselections', 'psgselections', 'agnselections', 'wkgnselections', 'alocselections',
+		'wlocselections', 'auexclusions', 'wkexclusions', 'psgexclusions', 'agnexclusions', 'wkgnexclusions',
+		'alocexclusions', 'wlocexclusions', 'earliestdate', 'latestdate', 'spuria', 'incerta', 'varia',
+		'latincorpus', 'greekcorpus', 'inscriptioncorpus', 'papyruscorpus', 'christiancorpus'
+	)
+
+	@staticmethod
+	def keyfor(thesession) -> str:
+		fields = [thesession.get(f) for f in CompiledSelectionCache.selectionfields]
+		return md5(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+	def fetch(self, thesession) -> CompiledSelection:
+		key = self.keyfor(thesession)
+		return CompiledSelectionCache._memory.fetchorstore(key, lambda: CompiledSelection(key))
+
+	@staticmethod
+	def reducedmapper(listmapper: dict, activecorpora: str, criterion: str) -> dict:
+		"""
+
+		reducetosessionselections() for a given combination of active corpora never changes: there are only
+		32 of them and only two criteria
+
+		the dict that comes back is shared: read it; do not modify it
+
+		:param listmapper:
+		:param activecorpora:
+		:param criterion:
+		:return:
+		"""
+
+		return CompiledSelectionCache._reducedmappers.get((id(listmapper), activecorpora, criterion))
+
+	@staticmethod
+	def storereducedmapper(listmapper: dict, activecorpora: str, criterion: str, reduced: dict):
+		with CompiledSelectionCache._lock:
+			CompiledSelectionCache._reducedmappers[(id(listmapper), activecorpora, criterion)] = reduced
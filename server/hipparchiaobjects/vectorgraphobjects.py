@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import pickle
+import re
+from hashlib import sha1
+from os import path
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.atomicfileobjects import writeatomically
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+
+
+class VectorGraphCache(object):
+	"""
+
+	a borg that holds the PNGs of the vector graphs under a name derived from everything that went into drawing them
+
+	matplotgraphmatches() used to draw every graph afresh; storevectorgraph() then put it into 'storedvectorimages'
+	only so that fetchvectorgraph() could pull it out (and delete it) a moment later in the next request
+
+	now a graph has a key: ask for the same neighborhood of the same word in the same model and you get the old
+	picture without any matplotlib
+
+	the most recent VECTORGRAPHCACHESIZE graphs are kept in memory; VECTORGRAPHCACHEDIRECTORY will also keep them on
+	disk and then the key is the name of the image and the db is skipped entirely; without a directory the picture
+	still travels through 'storedvectorimages' since another worker process might be the one asked to send it
+
+	"""
+
+	_memory = LRUMemory('VECTORGRAPHCACHESIZE')
+	_validkey = re.compile(r'^[0-9a-f]{40}$')
+
+	@staticmethod
+	def keyfor(*ingredients) -> str:
+		return sha1(pickle.dumps(ingredients)).hexdigest()
+
+	def _filename(self, key: str) -> str:
+		return path.join(hipparchia.config['VECTORGRAPHCACHEDIRECTORY'], '{k}.png'.format(k=key))
+
+	def fetch(self, key: str) -> bytes:
+		"""
+
+		memory, then disk; None if this graph still needs to be drawn
+
+		:param key:
+		:return:
+		"""
+
+		if not VectorGraphCache._validkey.match(key or str()):
+			return None
+
+		imagedata = VectorGraphCache._memory.fetch(key)
+		if imagedata:
+			return imagedata
+
+		if not hipparchia.config['VECTORGRAPHCACHEDIRECTORY']:
+			return None
+
+		filename = self._filename(key)
+		if not path.isfile(filename):
+			return None
+
+		try:
+			with open(filename, 'rb') as f:
+				imagedata = f.read()
+		except OSError as e:
+			consolewarning('could not read the graph in {f}: {e}'.format(f=filename, e=e), color='red')
+			return None
+
+		self._remember(key, imagedata)
+		return imagedata
+
+	def store(self, key: str, imagedata: bytes):
+		self._remember(key, imagedata)
+
+		if not hipparchia.config['VECTORGRAPHCACHEDIRECTORY']:
+			return
+
+		filename = self._filename(key)
+		try:
+			writeatomically(filename, imagedata)
+		except OSError as e:
+			consolewarning('could not write the graph to {f}: {e}'.format(f=filename, e=e), color='red')
+
+	def _remember(self, key: str, imagedata: bytes):
+		VectorGraphCache._memory.store(key, imagedata)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import pickle
+import threading
+from array import array
+from bisect import bisect_left
+from os import path
+from typing import List
+
+import psycopg2
+
+from server import hipparchia
+from server.dbsupport.dbbuildinfo import databasefingerprint
+from server.dbsupport.miscdbfunctions import resultiterator
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.atomicfileobjects import pickleatomically
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+
+
+class WordCountStore(object):
+	"""
+
+	all of the wordcounts in memory: a sorted list of forms and six parallel arrays of counts
+
+	findleastcommonterm(), findleastcommontermcount(), bulkfindwordcounts(), rankheadwordsbyprevalence(), etc.
+	all used to go to the 'wordcounts_<letter>' tables (or 'dictionary_headword_wordcounts') for every decision;
+	now the store can answer via bisect()
+
+	    forms:      ['a', 'aa', ..., 'ϲωφρονῶ', ...]
+	    counts:     {'total': array('L', [...]), 'gr': array('L', [...]), ...}
+
+	the keys are the same as the 'entry_name' of the tables: i.e., graves are already gone but other accents remain;
+	callers were already normalizing their terms for the db and so they can keep doing exactly that
+
+	the store is filled from the db at startup if WORDCOUNTSINMEMORY is set; a snapshot file saves you the
+	db trip on the next launch
+
+	this is a borg; an empty store means "ask the db like you used to"
+
+	"""
+
+	_lock = threading.Lock()
+	_forms = list()
+	_counts = dict()
+	_headwords = list()
+	_headwordtotals = array('L')
+
+	corpora = ['total', 'gr', 'lt', 'dp', 'in', 'ch']
+	letters = '0abcdefghijklmnopqrstuvwxyzαβψδεφγηιξκλμνοπρϲτυωχθζ'
+	snapshotversion = 1
+
+	def isloaded(self) -> bool:
+		return len(WordCountStore._forms) > 0
+
+	def size(self) -> int:
+		return len(WordCountStore._forms)
+
+	def load(self):
+		"""
+
+		snapshot first; then the db (and write a snapshot if one was requested but not found)
+
+		:return:
+		"""
+
+		snapshot = hipparchia.config['WORDCOUNTSNAPSHOTFILE']
+
+		with WordCountStore._lock:
+			if WordCountStore._forms:
+				return
+
+			loaded = False
+			if snapshot and path.isfile(snapshot):
+				loaded = self._loadsnapshot(snapshot)
+
+			if not loaded:
+				self._loadfromdb()
+				if snapshot and WordCountStore._forms:
+					self._writesnapshot(snapshot)
+
+	def _loadfromdb(self):
+		dbconnection = ConnectionObject()
+		dbconnection.setautocommit()
+		dbcursor = dbconnection.cursor()
+
+		found = list()
+		for letter in WordCountStore.letters:
+			q = 'SELECT entry_name, total_count, gr_count, lt_count, dp_count, in_count, ch_count FROM wordcounts_{x}'
+			try:
+				dbcursor.execute(q.format(x=letter))
+				found.extend(resultiterator(dbcursor))
+			except psycopg2.ProgrammingError:
+				# psycopg2.ProgrammingError: relation "wordcounts_ε" does not exist
+				pass
+
+		# the db collation is not python's sort order
+		found.sort(key=lambda x: x[0])
+		WordCountStore._forms = [f[0] for f in found]
+		WordCountStore._counts = {c: array('L', [f[n + 1] or 0 for f in found]) for n, c in enumerate(WordCountStore.corpora)}
+		del found
+
+		q = 'SELECT entry_name, total_count FROM dictionary_headword_wordcounts'
+		try:
+			dbcursor.execute(q)
+			headwords = sorted(resultiterator(dbcursor), key=lambda x: x[0])
+		except psycopg2.ProgrammingError:
+			headwords = list()
+
+		WordCountStore._headwords = [h[0] for h in headwords]
+		WordCountStore._headwordtotals = array('L', [h[1] or 0 for h in headwords])
+
+		dbconnection.connectioncleanup()
+
+	def _loadsnapshot(self, snapshot: str) -> bool:
+		try:
+			with open(snapshot, 'rb') as f:
+				contents = pickle.load(f)
+		except (OSError, pickle.UnpicklingError, EOFError) as e:
+			consolewarning('could not read wordcount snapshot {s}: {e}'.format(s=snapshot, e=e), color='red')
+			return False
+
+		if contents.get('version') != WordCountStore.snapshotversion:
+			consolewarning('ignoring outdated wordcount snapshot {s}'.format(s=snapshot), color='red')
+			return False
+
+		if contents.get('fingerprint') != databasefingerprint():
+			# the db has been rebuilt since the snapshot was taken: a new one will be written after the db load
+			consolewarning('ignoring wordcount snapshot {s}: it was made from a different build of the database'.format(s=snapshot), color='red')
+			return False
+
+		WordCountStore._forms = contents['forms']
+		WordCountStore._counts = contents['counts']
+		WordCountStore._headwords = contents['headwords']
+		WordCountStore._headwordtotals = contents['headwordtotals']
+		return True
+
+	def _writesnapshot(self, snapshot: str):
+		contents = {
+			'version': WordCountStore.snapshotversion,
+			'fingerprint': databasefingerprint(),
+			'forms': WordCountStore._forms,
+			'counts': WordCountStore._counts,
+			'headwords': WordCountStore._headwords,
+			'headwordtotals': WordCountStore._headwordtotals
+		}
+		try:
+			pickleatomically(snapshot, contents)
+		except OSError as e:
+			consolewarning('could not write wordcount snapshot {s}: {e}'.format(s=snapshot, e=e), color='red')
+
+	def clear(self):
+		"""
+
+		drop everything: e.g., after a rebuild of the wordcounts the snapshot is stale and needs to go too
+
+		:return:
+		"""
+
+		with WordCountStore._lock:
+			WordCountStore._forms = list()
+			WordCountStore._counts = dict()
+			WordCountStore._headwords = list()
+			WordCountStore._headwordtotals = array('L')
+
+	@staticmethod
+	def _position(keys: list, word: str):
+		p = bisect_left(keys, word)
+		if p < len(keys) and keys[p] == word:
+			return p
+		return None
+
+	def lookup(self, word: str) -> tuple:
+		"""
+
+		return the same tuple that 'SELECT * FROM wordcounts_x WHERE entry_name = %s' would have returned
+
+			('ὀλίγοϲ', 596, 589, 0, 3, 4, 0)
+
+		or None
+
+		:param word:
+		:return:
+		"""
+
+		p = self._position(WordCountStore._forms, word)
+		if p is None:
+			return None
+		return tuple([word] + [WordCountStore._counts[c][p] for c in WordCountStore.corpora])
+
+	def lookupmany(self, words: List[str]) -> dict:
+		"""
+
+		{word: countstuple}; absent words are absent
+
+		:param words:
+		:return:
+		"""
+
+		found = {w: self.lookup(w) for w in words if w}
+		return {w: found[w] for w in found if found[w]}
+
+	def headwordtotals(self, headwords: List[str]) -> dict:
+		"""
+
+		{headword: total_count}; absent words are absent
+
+		:param headwords:
+		:return:
+		"""
+
+		totals = dict()
+		for h in headwords:
+			p = self._position(WordCountStore._headwords, h)
+			if p is not None:
+				totals[h] = WordCountStore._headwordtotals[p]
+		return totals
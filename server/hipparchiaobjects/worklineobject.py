@@ -15,6 +15,7 @@ from flask import session
 from server import hipparchia
 from server.dbsupport.dbbuildinfo import buildoptionchecking
 from server.formatting.betacodeescapes import andsubstitutes
+from server.formatting.renderingpatterns import hmutagpositions, rewritehmuformatting, splithmuformattingtags, stripmarkup
 from server.formatting.wordformatting import attemptsigmadifferentiation, avoidsmallvariants, forcelunates, tidyupterm, uforvoutsideofmarkup
 
 buildoptions = buildoptionchecking()
@@ -70,12 +71,6 @@ class dbWorkLine(object):
 	andsfinder = re.compile(r'&(\d{1,2})(.*?)(&\d?)')
 	hmuopenfinder = re.compile(r'<(hmu_.*?)>')
 	hmuclosefinder = re.compile(r'</(hmu_.*?)>')
-	hmuspanopenfinder = re.compile(r'<hmu_span_(.*?)>')
-	hmuspanclosefinder = re.compile(r'</hmu_span_(.*?)>')
-	hmushiftfinder = re.compile(r'<hmu_fontshift_(.*?)_(.*?)>')
-	hmushiftcleaner = re.compile(r'</hmu_fontshift_.*?>')
-	hmuformattingopener = re.compile(r'<hmu_(span|fontshift)_(.*?)>')
-	hmuformattingcloser = re.compile(r'</hmu_(span|fontshift)_(.*?)>')
 	bracketclosedfinder = {'square': {'c': re.compile(r'\]')}, 'round': {'c': re.compile(r'\)')}, 'angled': {'c': re.compile(r'⟩')}, 'curly': {'c': re.compile(r'\}')}}
 	bracketfinder = {
 		'square': {'regex': re.compile(r'\[[^\]]{0,}$'),
@@ -237,8 +232,7 @@ class dbWorkLine(object):
 			self.markedup = re.sub(self.smallcaps, vlswaplambda, self.markedup)
 
 		self.fixhmuirrationaloragnization()
-		self.hmuspanrewrite()
-		self.hmufontshiftsintospans()
+		self.hmuformattingintospans()
 
 	def decompose(self) -> tuple:
 		"""
@@ -450,9 +444,7 @@ class dbWorkLine(object):
 		:return:
 		"""
 
-		markup = re.compile(r'(<.*?>)')
-
-		unformatted = re.sub(markup, str(), self.markedup)
+		unformatted = stripmarkup(self.markedup)
 		unformatted = unformatted.replace('&nbsp;', str())
 
 		return unformatted
@@ -773,31 +765,21 @@ class dbWorkLine(object):
 		else:
 			return False
 
-	def hmuspanrewrite(self):
+	def hmuformattingintospans(self):
 		"""
 
 		convert <hmu_span_xxx> ... </hmu_span_xxx> into
 		<span class="xxx">...</span>
 
-		:return:
-		"""
-		try:
-			alreadyconverted = buildoptions[self.db]['htmlifydatabase']
-		except KeyError:
-			alreadyconverted = 'n'
-
-		if alreadyconverted == 'n':
-			self.markedup = re.sub(dbWorkLine.hmuspanopenfinder, r'<span class="\1">', self.markedup)
-			self.markedup = re.sub(dbWorkLine.hmuspanclosefinder, r'</span>', self.markedup)
-
-	def hmufontshiftsintospans(self):
-		"""
+		and turn '<hmu_fontshift_latin_italic>b </hmu_fontshift_latin_italic>'
+		into '<span class="latin italic">b </span>'
 
-		turn '<hmu_fontshift_latin_italic>b </hmu_fontshift_latin_italic>'
+		the language of a fontshift is skipped if it matches the language of the line: "latin normal"
+		in a latin author can lead to a color shift, vel sim. when you really don't need to flag 'latinity'
+		in this context
 
-		into '<span class="latin italic">b </span>'
+		one pass over the line instead of four: see rewritehmuformatting()
 
-		:param texttoclean:
 		:return:
 		"""
 
@@ -812,42 +794,7 @@ class dbWorkLine(object):
 			else:
 				language = 'latin'
 
-			self.markedup = re.sub(dbWorkLine.hmushiftfinder, lambda x: self.matchskipper(x.group(1), x.group(2), language), self.markedup)
-			self.markedup = re.sub(dbWorkLine.hmushiftcleaner, r'</span>', self.markedup)
-
-	@staticmethod
-	def matchskipper(groupone, grouptwo, language: str) -> str:
-		"""
-
-		r'<span class="\1 \2">'
-
-		or
-
-		r'<span class="\2">'
-
-		skip a matchgroup if it matches language
-
-		this is useful because "latin normal" in a latin author can lead to
-		a color shift, vel sim. when you really don't need to flag 'latinity' in this
-		context
-
-		also convert 'smallerthannormal_italic' into 'smallerthannormal italic'
-
-
-		:param groupone:
-		:param grouptwo:
-		:param language:
-		:return:
-		"""
-
-		grouptwo = grouptwo.replace('_', ' ')
-
-		if groupone != language:
-			spanner = '<span class="{a} {b}">'.format(a=groupone, b=grouptwo)
-		else:
-			spanner = '<span class="{b}">'.format(a=groupone, b=grouptwo)
-
-		return spanner
+			self.markedup = rewritehmuformatting(self.markedup, language)
 
 	def hmuopenedbutnotclosed(self):
 		"""
@@ -964,14 +911,10 @@ class dbWorkLine(object):
 			return
 
 		line = self.markedup
-		opener = dbWorkLine.hmuformattingopener
-		closer = dbWorkLine.hmuformattingcloser
-
-		openings = list(re.finditer(opener, line))
-		openspans = {x.span()[0]: '{a}_{b}'.format(a=x.group(1), b=x.group(2)) for x in openings}
 
-		closings = list(re.finditer(closer, line))
-		closedspans = {x.span()[0]: '{a}_{b}'.format(a=x.group(1), b=x.group(2)) for x in closings}
+		openings, closings = splithmuformattingtags(line)
+		openspans = hmutagpositions(openings)
+		closedspans = hmutagpositions(closings)
 
 		balancetest = list()
 		invalidpattern = (False, False, True)
@@ -8,7 +8,8 @@
 import re
 from string import punctuation
 
-from server.formatting.wordformatting import buildhipparchiatranstable, extrapunct, minimumgreek, removegravity, \
+from server.formatting.collationkeys import polytonicsorted
+from server.formatting.wordformatting import extrapunct, hipparchiatranstable, minimumgreek, removegravity, \
 	stripaccents
 
 
@@ -124,32 +125,23 @@ def dropdupes(checklist: list, matchlist: list) -> list:
 
 def polytonicsort(unsortedwords: list) -> list:
 	"""
-	sort() looks at your numeric value, but α and ά and ᾶ need not have neighboring numerical values
+	sort() looks at your numeric value, but α and ά and ᾶ need not have neighboring numerical values
 	stripping diacriticals can help this, but then you get words that collide
 	gotta jump through some extra hoops
 
-		[a] build an unaccented copy of the word in front of the word
-		[b] substitute sigmas for lunate sigmas (because lunate comes after omega...)
-			θαλαττησ-snip-θαλάττηϲ
-		[c] sort the augmented words (where ά and ᾶ only matter very late in the game)
-		[d] remove the augment
-		[e] return
+	this used to glue an unaccented copy onto the front of every word, sort, and then regex the augment away again:
+		θαλαττησ-snip-θαλάττηϲ
+
+	now the same pair is a tuple that sort() builds for itself: see polytoniccollationkey()
+		('θαλαττησ', 'θαλάττηϲ')
+
+	the only difference: the augment made a bare 'ab' sort after 'ab cd' (' ' < '-'); the tuple puts 'ab' first
 
 	:param unsortedwords:
 	:return:
 	"""
 
-	transtable = buildhipparchiatranstable()
-
-	stripped = [re.sub(r'ϲ', r'σ', stripaccents(word, transtable)) + '-snip-' + word for word in unsortedwords if word]
-
-	stripped = sorted(stripped)
-
-	snipper = re.compile(r'(.*?)(-snip-)(.*?)')
-
-	sortedversion = [re.sub(snipper, r'\3', word) for word in stripped]
-
-	return sortedversion
+	return polytonicsorted(unsortedwords)
 
 
 def foundindict(searchdict: dict, element: str, mustbein: str, exactmatch=True) -> list:
@@ -199,10 +191,9 @@ def findsetofallwords(listofwordclusters: list) -> set:
 
 	greekwords = [w for w in allwords if re.search(minimumgreek, w)]
 
-	trans = buildhipparchiatranstable()
 	latinwords = [w for w in allwords if not re.search(minimumgreek, w)]
 
-	allwords = [removegravity(w) for w in greekwords] + [stripaccents(w, trans) for w in latinwords]
+	allwords = [removegravity(w) for w in greekwords] + [stripaccents(w, hipparchiatranstable) for w in latinwords]
 
 	punct = re.compile('[{s}]'.format(s=re.escape(punctuation + extrapunct)))
 
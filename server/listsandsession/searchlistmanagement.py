@@ -11,10 +11,11 @@ import re
 from flask import session
 
 from server.hipparchiaobjects.searchobjects import SearchObject
+from server.hipparchiaobjects.selectionobjects import CompiledSelectionCache
 from server.listsandsession.genericlistfunctions import tidyuplist, foundindict
 from server.listsandsession.sessionfunctions import reducetosessionselections
 from server.listsandsession.checksession import justlatin
-from server.startup import allincerta, allvaria
+from server.startup import allincerta, allvaria, worksortkeys
 
 
 def compilesearchlist(listmapper: dict, s: dict) -> list:
@@ -25,11 +26,31 @@ def compilesearchlist(listmapper: dict, s: dict) -> list:
 		getsearchlistcontents wants just session
 		executesearch might as well use frozensession
 
+	the same selections always compile to the same list: see CompiledSelectionCache
+
 	:param listmapper: 
 	:param s: 
 	:return: 
 	"""
 
+	compiled = CompiledSelectionCache().fetch(s)
+	if compiled.searchlist is None:
+		compiled.searchlist = buildsearchlist(listmapper, s)
+
+	# the callers are free to modify what they get back
+	return list(compiled.searchlist)
+
+
+def buildsearchlist(listmapper: dict, s: dict) -> list:
+	"""
+
+	the actual work of compilesearchlist()
+
+	:param listmapper:
+	:param s:
+	:return:
+	"""
+
 	searching = s['auselections'] + s['agnselections'] + s['wkgnselections'] + s['psgselections'] + s['wkselections'] \
 	             + s['alocselections'] + s['wlocselections']
 	excluding = s['auexclusions'] + s['wkexclusions'] + s['agnexclusions'] + s['wkgnexclusions'] + s['psgexclusions'] \
@@ -197,6 +218,18 @@ def sortresultslist(hits: list, searchobject: SearchObject, authorsdict: dict, w
 	"""
 
 	sortby = searchobject.session['sortorder']
+
+	# the per-work ranks were calculated at startup: see buildworksortkeys()
+	try:
+		ranks = worksortkeys[sortby]
+	except KeyError:
+		ranks = worksortkeys.get('universalid', dict())
+
+	if ranks and all(hit.wkuinversalid in ranks for hit in hits):
+		sortedhits = sorted(hits, key=lambda x: (ranks[x.wkuinversalid], x.index))
+		hitsdict = {idx: hit for idx, hit in enumerate(sortedhits)}
+		return hitsdict
+
 	templist = list()
 
 	for hit in hits:
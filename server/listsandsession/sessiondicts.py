@@ -155,6 +155,59 @@ def buildworkprovenancedict(workdict: dict) -> dict:
 
 
 @timedecorator
+def buildworksortkeys(authordict: dict, workdict: dict) -> dict:
+	"""
+
+	every work gets an integer rank for every possible session['sortorder']:
+
+		{'shortname': {'gr0001w001': 0, 'gr0001w002': 1, ...}, 'converted_date': {...}, ...}
+
+	sortresultslist() used to figure out these criteria afresh for each and every hit; now sorting N hits is just
+	sorting N (int, int) tuples
+
+	the ranks reproduce the old ordering: the criterion first, then author shortname + work title
+
+	:param authordict:
+	:param workdict:
+	:return:
+	"""
+
+	def datecriterion(w) -> int:
+		a = authordict[w[0:6]]
+		try:
+			crit = int(workdict[w].converted_date)
+			if crit > 2000:
+				try:
+					crit = int(a.converted_date)
+				except TypeError:
+					crit = 9999
+		except:
+			try:
+				crit = int(a.converted_date)
+			except TypeError:
+				crit = 9999
+		return crit
+
+	criteria = {
+		'converted_date': datecriterion,
+		'provenance': lambda w: workdict[w].provenance or str(),
+		'location': lambda w: authordict[w[0:6]].location or str(),
+		'shortname': lambda w: authordict[w[0:6]].shortname or str(),
+		'authgenre': lambda w: authordict[w[0:6]].authgenre or str(),
+		'universalid': lambda w: w
+	}
+
+	works = [w for w in workdict if w[0:6] in authordict]
+	sortablestrings = {w: authordict[w[0:6]].shortname + workdict[w].title for w in works}
+
+	sortkeys = dict()
+	for c in criteria:
+		ranked = sorted(works, key=lambda w: (criteria[c](w), sortablestrings[w], w))
+		sortkeys[c] = {w: n for n, w in enumerate(ranked)}
+
+	return sortkeys
+
+
 def buildkeyedlemmata(listofentries: list) -> defaultdict:
 	"""
 
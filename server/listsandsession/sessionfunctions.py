@@ -12,6 +12,7 @@ from typing import List
 from flask import session
 
 from server import hipparchia
+from server.hipparchiaobjects.selectionobjects import CompiledSelectionCache
 from server.listsandsession.checksession import corpusselectionsaspseudobinarystring
 from server.semanticvectors.vectorhelpers import vectordefaults, vectorranges
 from server.startup import authorgenresdict, authorlocationdict, workgenresdict, workprovenancedict
@@ -503,6 +504,11 @@ def reducetosessionselections(listmapper: dict, criterion: str) -> dict:
 	
 	active = corpusselectionsaspseudobinarystring()
 
+	# the same five switches always give you the same dict: build it once
+	reduced = CompiledSelectionCache.reducedmapper(listmapper, active, criterion)
+	if reduced is not None:
+		return reduced
+
 	toactivate = list()
 	position = -1
 
@@ -519,6 +525,8 @@ def reducetosessionselections(listmapper: dict, criterion: str) -> dict:
 	for a in toactivate:
 		d.update(listmapper[a][criterion])
 
+	CompiledSelectionCache.storereducedmapper(listmapper, active, criterion, d)
+
 	return d
 
 
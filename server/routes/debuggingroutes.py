@@ -6,19 +6,36 @@
 		(see LICENSE in the top level directory of the distribution)
 """
 
+import json
 import re
 import time
 from os import path
 
-from flask import redirect, render_template, session, url_for
+from flask import redirect, render_template, request, session, url_for
 
 from server import hipparchia
+from server.hipparchiaobjects.connectionobject import PooledConnectionObject
+from server.hipparchiaobjects.profilerobjects import SamplingProfiler
 from server.hipparchiaobjects.progresspoll import ProgressPoll
+from server.hipparchiaobjects.queryrecorderobjects import QueryRecorder
 from server.startup import authordict, authorgenresdict, authorlocationdict, workdict, workgenresdict, \
 	workprovenancedict
 from server.startup import progresspolldict
 
 PAGE_STR = str
+JSON_STR = str
+
+
+def requestcamefromlocalhost() -> bool:
+	"""
+
+	some debugging information is for the operator of the server and not for the world at large
+
+	:return:
+	"""
+
+	return request.remote_addr in ['127.0.0.1', '::1', 'localhost']
+
 
 #
 # unadorned views for quickly peeking at the data
@@ -129,6 +146,110 @@ def showsessioncontents() -> PAGE_STR:
 	return render_template('genericlistdumper.html', info=output, css=stylesheet)
 
 
+@hipparchia.route('/debug/poolstatus')
+def poolstatus() -> JSON_STR:
+	"""
+
+	report on the connection pools: checkout latency, waits, fallbacks, connection ages, growth and shrinkage
+
+	only answers requests from the local machine
+
+	:return:
+	"""
+
+	if not requestcamefromlocalhost():
+		return json.dumps(str())
+
+	if hipparchia.config['CONNECTIONTYPE'] == 'simple':
+		return json.dumps({'connectiontype': 'simple'})
+
+	status = PooledConnectionObject.poolstatus()
+
+	return json.dumps(status, indent=4)
+
+
+@hipparchia.route('/debug/queryrecorder')
+def queryrecorder() -> JSON_STR:
+	"""
+
+	what QUERYRECORDER has seen: time spent per table and per where-clause style ('between', 'temptable', ...) plus
+	the slowest queries with their plans
+
+	only answers requests from the local machine
+
+	:return:
+	"""
+
+	if not requestcamefromlocalhost():
+		return json.dumps(str())
+
+	if not hipparchia.config['QUERYRECORDER']:
+		return json.dumps({'queryrecorder': 'off'})
+
+	report = QueryRecorder().report()
+
+	return json.dumps(report, indent=4, ensure_ascii=False)
+
+
+@hipparchia.route('/debug/profiler/<action>')
+@hipparchia.route('/debug/profiler/<action>/<kind>/<path:target>')
+def samplingprofiler(action: str, kind=None, target=None) -> JSON_STR:
+	"""
+
+	arm the SamplingProfiler for a route or a poll id; disarm it; see what it has written
+
+		/debug/profiler/arm/route/search/standard
+		/debug/profiler/arm/poll/1646400123456
+		/debug/profiler/disarm
+		/debug/profiler/status
+
+	only answers requests from the local machine
+
+	:param action:
+	:param kind:
+	:param target:
+	:return:
+	"""
+
+	if not requestcamefromlocalhost():
+		return json.dumps(str())
+
+	if not hipparchia.config['SAMPLINGPROFILERDIRECTORY']:
+		return json.dumps({'profiler': 'SAMPLINGPROFILERDIRECTORY is not set'})
+
+	if action == 'arm' and kind in ['route', 'poll'] and target:
+		if kind == 'route':
+			target = '/' + target.lstrip('/')
+		SamplingProfiler.arm(kind, target)
+	elif action == 'disarm':
+		SamplingProfiler.disarm()
+
+	return json.dumps(SamplingProfiler.status(), indent=4)
+
+
+@hipparchia.before_request
+def startsamplingprofiler():
+	"""
+
+	if the profiler has been armed for this request, start watching the thread that is about to handle it
+
+	:return:
+	"""
+
+	if not hipparchia.config['SAMPLINGPROFILERDIRECTORY'] or request.path.startswith('/debug/profiler'):
+		return
+
+	label = SamplingProfiler.wants(request.path, request.view_args)
+	if label:
+		SamplingProfiler.watch(label)
+
+
+@hipparchia.teardown_request
+def stopsamplingprofiler(exception=None):
+	if SamplingProfiler.iswatching():
+		SamplingProfiler.stopwatching()
+
+
 @hipparchia.route('/debug/testroute')
 def testroute() -> PAGE_STR:
 	"""
@@ -18,8 +18,8 @@ except ImportError:
 
 from server import hipparchia
 from server.authentication.authenticationwrapper import requireauthentication
-from server.dbsupport.lexicaldbfunctions import findentrybyid, headwordsearch, lookformorphologymatches, \
-	probedictionary, querytotalwordcounts, reversedictionarylookup
+from server.dbsupport.lexicaldbfunctions import bulkprobedictionary, bulkquerytotalwordcounts, findentrybyid, \
+	headwordsearch, lookformorphologymatches, reversedictionarylookup
 from server.formatting.betacodetounicode import replacegreekbetacode
 from server.formatting.jsformatting import dictionaryentryjs, insertlexicalbrowserjs, morphologychartjs
 from server.formatting.lexicaformatting import getobservedwordprevalencedata
@@ -29,10 +29,9 @@ from server.formatting.wordformatting import abbreviatedsigmarestoration, attemp
 from server.formatting.wordformatting import setdictionarylanguage
 from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.hipparchiaobjects.lexicaloutputobjects import lexicalOutputObject, multipleWordOutputObject
-from server.hipparchiaobjects.morphanalysisobjects import BaseFormMorphology
+from server.hipparchiaobjects.morphologychartobjects import buildmorphologychart
 from server.hipparchiaobjects.progresspoll import ProgressPoll
 from server.listsandsession.checksession import justlatin, justtlg, probeforsessionvariables
-from server.listsandsession.genericlistfunctions import flattenlistoflists
 from server.startup import authordict
 from server.startup import progresspolldict
 
@@ -100,9 +99,6 @@ def dictsearch(searchterm) -> JSON_STR:
 	searchterm = searchterm[:hipparchia.config['MAXIMUMLEXICALLENGTH']]
 	probeforsessionvariables()
 
-	dbconnection = ConnectionObject()
-	dbcursor = dbconnection.cursor()
-
 	if hipparchia.config['UNIVERSALASSUMESBETACODE']:
 		searchterm = replacegreekbetacode(searchterm.upper())
 
@@ -153,8 +149,8 @@ def dictsearch(searchterm) -> JSON_STR:
 		else:
 			usecounter = True
 
-		wordobjects = [probedictionary(setdictionarylanguage(f[0]) + '_dictionary', 'entry_name', f[0], '=', dbcursor=dbcursor, trialnumber=0) for f in foundtuples]
-		wordobjects = flattenlistoflists(wordobjects)
+		# a fixed handful of queries for all of the entries, their counts and their xrefs
+		wordobjects = bulkprobedictionary([f[0] for f in foundtuples], usedictionary)
 		# drop duplicates: logeion new has key collisions...
 		# BUT hipparchiaDB=# select entry_name, id_number from greek_dictionary where entry_name ~ '^χρά' order by id_number desc;
 		#  entry_name | id_number
@@ -199,8 +195,6 @@ def dictsearch(searchterm) -> JSON_STR:
 
 	jsondict = json.dumps(returndict)
 
-	dbconnection.connectioncleanup()
-
 	return jsondict
 
 
@@ -353,7 +347,9 @@ def reverselexiconsearch(searchid, searchterm) -> JSON_STR:
 
 	entriestuples = list(set(entriestuples))
 
-	unsortedentries = [(querytotalwordcounts(e[0]), e[0], e[1]) for e in entriestuples]
+	allcounts = bulkquerytotalwordcounts([e[0] for e in entriestuples])
+
+	unsortedentries = [(allcounts.get(e[0]), e[0], e[1]) for e in entriestuples]
 	entries = list()
 	for e in unsortedentries:
 		hwcountobject = e[0]
@@ -369,7 +365,7 @@ def reverselexiconsearch(searchid, searchterm) -> JSON_STR:
 	# now we retrieve and format the entries
 	if entriestuples:
 		# summary of entry values first
-		countobjectdict = {e: querytotalwordcounts(e[0]) for e in entriestuples}
+		countobjectdict = {e: allcounts.get(e[0]) for e in entriestuples}
 		summary = list()
 		count = 0
 		for c in countobjectdict.keys():
@@ -393,12 +389,12 @@ def reverselexiconsearch(searchid, searchterm) -> JSON_STR:
 		returnarray.append('\n<br />\n'.join(summary))
 
 		# then the entries proper
-		dbconnection = ConnectionObject()
-		dbconnection.setautocommit()
-		dbcursor = dbconnection.cursor()
-
-		wordobjects = [probedictionary(setdictionarylanguage(e[0]) + '_dictionary', 'entry_name', e[0], '=', dbcursor=dbcursor, trialnumber=0) for e in entriestuples]
-		wordobjects = flattenlistoflists(wordobjects)
+		wordobjects = list()
+		for language in ['greek', 'latin']:
+			wordobjects += bulkprobedictionary([e[0] for e in entriestuples if setdictionarylanguage(e[0]) == language], language)
+		# keep the prevalence order
+		entryorder = {e[0]: n for n, e in enumerate(entriestuples)}
+		wordobjects = sorted(wordobjects, key=lambda x: (entryorder.get(x.entry, len(entryorder)), x.id))
 		outputobjects = [lexicalOutputObject(w) for w in wordobjects]
 		if len(outputobjects) > 1:
 			usecounter = True
@@ -503,7 +499,7 @@ def knownforms(language, lexicalid, xrefid, headword) -> JSON_STR:
 	headword = re.sub(r'[σς]', 'ϲ', headword)
 
 	try:
-		bfo = BaseFormMorphology(headword, xrefid, language, lexicalid, session)
+		chart = buildmorphologychart(headword, xrefid, language, lexicalid, session)
 	except:
 		consolewarning('could not initialize BaseFormMorphology() object')
 		return 'could not initialize BaseFormMorphology() object'
@@ -524,13 +520,10 @@ def knownforms(language, lexicalid, xrefid, headword) -> JSON_STR:
 
 	returnarray = list()
 
-	if bfo.iammostlyconjugated():
-		returnarray.append(topofoutput.format(w=bfo.headword, eid=bfo.lexicalid, lg=bfo.language))
-		returnarray = returnarray + bfo.buildhtmlverbtablerows(session)
-
-	if bfo.iamdeclined():
-		returnarray.append(topofoutput.format(w=bfo.headword, eid=bfo.lexicalid, lg=bfo.language))
-		returnarray = returnarray + bfo.buildhtmldeclinedtablerows()
+	for tables in [chart['conjugated'], chart['declined']]:
+		if tables is not None:
+			returnarray.append(topofoutput.format(w=headword, eid=lexicalid, lg=language))
+			returnarray = returnarray + tables
 
 	returndict = dict()
 	returndict['newhtml'] = '\n'.join(returnarray)
@@ -10,8 +10,10 @@ import json
 import locale
 import re
 import time
+from collections import Counter
 
-from flask import session
+from flask import Response as FlaskResponse
+from flask import session, stream_with_context
 
 try:
 	from rich import print
@@ -37,7 +39,7 @@ from server.startup import progresspolldict, workdict
 from server.textsandindices.indexmaker import buildindextowork
 from server.textsandindices.textandindiceshelperfunctions import getrequiredmorphobjects, textsegmentfindstartandstop, \
 	wordindextohtmltable
-from server.textsandindices.textbuilder import buildtext
+from server.textsandindices.textbuilder import buildtext, streamtext
 
 JSON_STR = str
 
@@ -73,6 +75,8 @@ def textgetter(action: str, one=None, two=None, three=None, four=None, five=None
 							{'fnc': textmaker, 'param': [one, two, three, four]},
 						'make_rawloc':
 							{'fnc': texmakerfromrawlocus, 'param': [one, two, three, four]},
+						'export':
+							{'fnc': textexporter, 'param': [one, two, three, four, five]},
 						}
 
 	if action not in knownfunctions:
@@ -248,39 +252,37 @@ def generatevocabfor(searchid: str, author: str, work=None, passage=None, endpoi
 	cdict = buildindexto(searchid, author, work, passage, endpoint, citationdelimiter, justvocab)
 	lineobjects = grabbundlesoflines(cdict, dbcursor)
 
-	allwords = [l.wordset() for l in lineobjects]
-	allwords = set(flattenlistoflists(allwords))
+	# every word in the passage and how many times it appears
+	allwords = Counter(flattenlistoflists([l.indexablewordlist() for l in lineobjects]))
 
-	morphobjects = getrequiredmorphobjects(allwords)
+	morphobjects = getrequiredmorphobjects(set(allwords.keys()))
 	# 'dominatio': <server.hipparchiaobjects.dbtextobjects.dbMorphologyObject object at 0x14ab92d68>, ...
 
-	baseformsmorphobjects = list()
-	for m in morphobjects:
-		try:
-			baseformsmorphobjects.extend(morphobjects[m].getpossible())
-		except AttributeError:
-			# 'NoneType' object has no attribute 'getpossible'
-			pass
-
-	vocabset = {'{w} ~~~ {t}'.format(w=b.getbaseform(), t=b.gettranslation()) for b in baseformsmorphobjects if b.gettranslation()}
-	vocabset = {v.split(' ~~~ ')[0]: v.split(' ~~~ ')[1].strip() for v in vocabset}
-	vocabset = {v: vocabset[v] for v in vocabset if vocabset[v]}
-
 	# the following can be in entries and will cause problems...:
 	#   <tr opt="n">which had become milder</tr>
-
-	vocabset = {v: re.sub(r'<(|/)tr.*?>', str(), vocabset[v]) for v in vocabset}
+	trstripper = re.compile(r'<(|/)tr.*?>')
+
+	# one pass: the first usable translation of each headword wins; every appearance of a form counts once
+	# towards each of the headwords that it might belong to
+	vocabset = dict()
+	vocabcount = Counter()
+	for form in allwords:
+		if not morphobjects.get(form):
+			continue
+		headwords = set()
+		for b in morphobjects[form].getpossible():
+			baseform = b.getbaseform()
+			if baseform not in vocabset:
+				translation = b.gettranslation().strip()
+				if translation:
+					vocabset[baseform] = re.sub(trstripper, str(), translation)
+			if baseform in vocabset:
+				headwords.add(baseform)
+		for h in headwords:
+			vocabcount[h] += allwords[form]
 
 	# now you have { word1: definition1, word2: definition2, ...}
 
-	vocabcounter = [b.getbaseform() for b in baseformsmorphobjects if b.gettranslation()]
-	vocabcount = dict()
-	for v in vocabcounter:
-		try:
-			vocabcount[v] += 1
-		except KeyError:
-			vocabcount[v] = 1
-
 	po = IndexmakerInputParsingObject(author, work, passage, endpoint, citationdelimiter)
 
 	ao = po.authorobject
@@ -416,30 +418,7 @@ def textmaker(author: str, work=None, passage=None, endpoint=None, citationdelim
 
 	if ao and wo:
 		# we have both an author and a work, maybe we also have a subset of the work
-		if endpoint:
-			firstlinenumber = finddblinefromincompletelocus(wo, po.passageaslist, dbcursor)
-			lastlinenumber = finddblinefromincompletelocus(wo, po.endpointlist, dbcursor, findlastline=True)
-			if firstlinenumber['code'] == 'success' and lastlinenumber['code'] == 'success':
-				startline = firstlinenumber['line']
-				endline = lastlinenumber['line']
-				startlnobj = dblineintolineobject(grabonelinefromwork(ao.universalid, startline, dbcursor))
-				stoplnobj = dblineintolineobject(grabonelinefromwork(ao.universalid, endline, dbcursor))
-			else:
-				msg = '"buildtexttospan/" could not find first and last: {a}w{b} - {c} TO {d}'
-				consolewarning(msg.format(a=author, b=work, c=passage, d=endpoint))
-				startlnobj = makeablankline(work, 0)
-				stoplnobj = makeablankline(work, 1)
-				startline = 0
-				endline = 1
-			segmenttext = 'from {a} to {b}'.format(a=startlnobj.shortlocus(), b=stoplnobj.shortlocus())
-		elif not po.passageaslist:
-			# whole work
-			startline = wo.starts
-			endline = wo.ends
-		else:
-			startandstop = textsegmentfindstartandstop(ao, wo, po.passageaslist, dbcursor)
-			startline = startandstop['startline']
-			endline = startandstop['endline']
+		startline, endline, segmenttext = findtextmakerspan(po, dbcursor)
 		texthtml = buildtext(wo.universalid, startline, endline, linesevery, dbcursor)
 	else:
 		texthtml = str()
@@ -468,6 +447,118 @@ def textmaker(author: str, work=None, passage=None, endpoint=None, citationdelim
 	return results
 
 
+def findtextmakerspan(po: TextmakerInputParsingObject, dbcursor) -> tuple:
+	"""
+
+	(startline, endline, segmenttext) for the passage that a TextmakerInputParsingObject() describes
+
+	:param po:
+	:param dbcursor:
+	:return:
+	"""
+
+	ao = po.authorobject
+	wo = po.workobject
+
+	segmenttext = str()
+
+	if po.endpointlocation:
+		firstlinenumber = finddblinefromincompletelocus(wo, po.passageaslist, dbcursor)
+		lastlinenumber = finddblinefromincompletelocus(wo, po.endpointlist, dbcursor, findlastline=True)
+		if firstlinenumber['code'] == 'success' and lastlinenumber['code'] == 'success':
+			startline = firstlinenumber['line']
+			endline = lastlinenumber['line']
+			startlnobj = dblineintolineobject(grabonelinefromwork(ao.universalid, startline, dbcursor))
+			stoplnobj = dblineintolineobject(grabonelinefromwork(ao.universalid, endline, dbcursor))
+		else:
+			msg = '"buildtexttospan/" could not find first and last: {a} - {c} TO {d}'
+			consolewarning(msg.format(a=wo.universalid, c=po.passageaslist, d=po.endpointlist))
+			startlnobj = makeablankline(wo.universalid, 0)
+			stoplnobj = makeablankline(wo.universalid, 1)
+			startline = 0
+			endline = 1
+		segmenttext = 'from {a} to {b}'.format(a=startlnobj.shortlocus(), b=stoplnobj.shortlocus())
+	elif not po.passageaslist:
+		# whole work
+		startline = wo.starts
+		endline = wo.ends
+	else:
+		startandstop = textsegmentfindstartandstop(ao, wo, po.passageaslist, dbcursor)
+		startline = startandstop['startline']
+		endline = startandstop['endline']
+
+	return startline, endline, segmenttext
+
+
+def textexporter(fileformat: str, author: str, work=None, passage=None, endpoint=None, citationdelimiter='|') -> FlaskResponse:
+	"""
+
+	textmaker() as a download that streams: the lines go out as they are formatted instead of being packed
+	into one json string at the end
+
+		"GET /text/export/txt/gr0057/001"
+		"GET /text/export/html/lt0474/024/20/30"
+
+	:param fileformat:
+	:param author:
+	:param work:
+	:param passage:
+	:param endpoint:
+	:param citationdelimiter:
+	:return:
+	"""
+
+	probeforsessionvariables()
+
+	po = TextmakerInputParsingObject(author, work, passage, endpoint, citationdelimiter)
+
+	ao = po.authorobject
+	wo = po.workobject
+
+	if fileformat not in ['html', 'txt'] or not ao or not wo:
+		return FlaskResponse(response=str(), status=404, mimetype='text/plain')
+
+	dbconnection = ConnectionObject('autocommit')
+	dbcursor = dbconnection.cursor()
+	startline, endline, segmenttext = findtextmakerspan(po, dbcursor)
+	dbconnection.connectioncleanup()
+
+	if not segmenttext:
+		segmenttext = '.'.join(po.passageaslist)
+
+	linesevery = hipparchia.config['SHOWLINENUMBERSEVERY']
+	authorname = avoidsmallvariants(ao.shortname)
+	title = avoidsmallvariants(wo.title)
+
+	def htmlexport():
+		yield '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+		yield '<title>{a}, {t} {s}</title>\n</head>\n<body>\n'.format(a=authorname, t=title, s=segmenttext)
+		yield '<h3>{a}, <span class="work">{t}</span> {s}</h3>\n'.format(a=authorname, t=title, s=segmenttext)
+		for piece in streamtext(wo.universalid, startline, endline, linesevery):
+			if hipparchia.config['INSISTUPONSTANDARDANGLEBRACKETS']:
+				piece = gtltsubstitutes(piece)
+			yield piece
+		yield '</body>\n</html>\n'
+
+	def textexport():
+		yield '{a}, {t} {s}\n\n'.format(a=authorname, t=title, s=segmenttext)
+		yield from streamtext(wo.universalid, startline, endline, linesevery, plaintext=True)
+
+	if fileformat == 'html':
+		generator = htmlexport()
+		mimetype = 'text/html'
+	else:
+		generator = textexport()
+		mimetype = 'text/plain'
+
+	response = FlaskResponse(stream_with_context(generator), status=200, mimetype=mimetype)
+	response.headers['Content-Type'] = '{m}; charset=utf-8'.format(m=mimetype)
+	filename = '{w}.{f}'.format(w=wo.universalid, f=fileformat)
+	response.headers['Content-Disposition'] = 'attachment; filename="{f}"'.format(f=filename)
+
+	return response
+
+
 def texmakerfromrawlocus(author: str, work: str, location: str, endpoint=None) -> JSON_STR:
 	"""
 
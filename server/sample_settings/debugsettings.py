@@ -47,6 +47,25 @@
 #
 # JSONEXTENDEDDEBUGMODE is like the above but now you will be drowned in the JSON for '/lexica', etc. routes
 #
+# QUERYRECORDER will write down every query sent to the database along with its parameters, duration and row count.
+#   Visit '/debug/queryrecorder' from the machine that runs the server to see where the time went. This slows
+#   everything down: turn it on, run the slow search, look, and then turn it off again.
+#
+# QUERYRECORDERTHRESHOLD: queries that take at least this many seconds are run a second time as
+#   'EXPLAIN (ANALYZE, BUFFERS)' and the plan is recorded too.
+#
+# QUERYRECORDERSIZE: how many of the most recent queries '/debug/queryrecorder' will look at.
+#
+# QUERYRECORDERFILE: where the records go; if blank a file in the system's temporary directory is used.
+#
+# SAMPLINGPROFILERDIRECTORY: if set, a low-cost profiler can be switched on and off while the server is running.
+#   From the machine that runs the server visit '/debug/profiler/arm/route/search/standard' (any route will do) or
+#   '/debug/profiler/arm/poll/POLLID' to profile one search, then '/debug/profiler/disarm'. Each request (and each
+#   of the search processes it launched) leaves a '.folded' file here that flamegraph.pl or speedscope can draw.
+#   Example: '/home/hipparchia/profiles'
+#
+# SAMPLINGPROFILERINTERVAL: how many seconds between looks at the stack.
+#
 
 
 SUPPRESSWARNINGS = True
@@ -70,4 +89,11 @@ JSONDEBUGMODE = False
 JSONEXTENDEDDEBUGMODE = False
 SEARCHMARKEDUPLINE = False
 
+QUERYRECORDER = False
+QUERYRECORDERTHRESHOLD = 0.5
+QUERYRECORDERSIZE = 2000
+QUERYRECORDERFILE = ''
+SAMPLINGPROFILERDIRECTORY = ''
+SAMPLINGPROFILERINTERVAL = 0.005
+
 ONTHEFLYLEXICALFIXES = False
\ No newline at end of file
@@ -31,6 +31,20 @@
 #   probably worth leaving off unless you are seeing a lot of error messages in the console/logs:
 #     " >>> PoolError: emergency fallback to SimpleConnectionObject() "
 #
+# POOLMAXIMUMSIZE: an exhausted pool is allowed to grow one connection at a time until it reaches this size; after
+#   that the server falls back to 'simple' connections. 0 means "four times the thread count".
+#
+# POOLCHECKOUTWAIT: how many seconds a request will wait for a connection to be returned to a maxed-out pool before
+#   falling back to a 'simple' connection.
+#
+# POOLCONNECTIONMAXAGE: pooled connections older than this many seconds are closed and replaced the next time they
+#   are returned to or taken from the pool; 0 means never recycle on account of age. Broken connections are always
+#   recycled.
+#
+# POOLSHRINKINTERVAL: every this-many seconds a pool that grew under load will shrink back towards its original
+#   size if the demand has subsided. 0 disables shrinking. Pool statistics are visible at '/debug/poolstatus'
+#   (from the local machine only).
+#
 # POLLCONNECTIONTYPE will either use a shared memory ProgressPoll() or one that saves
 #   information in a redis database. The latter option is set by setting the value to 'redis'.
 #   If Hipparchia is served via WSGI you cannot save the polls in shared memory.
@@ -69,6 +83,10 @@ DBHOST = '127.0.0.1'
 DBPORT = 5432
 CONNECTIONTYPE = 'pool'
 ENABLEPOOLCLEANING = False
+POOLMAXIMUMSIZE = 0
+POOLCHECKOUTWAIT = .25
+POOLCONNECTIONMAXAGE = 3600
+POOLSHRINKINTERVAL = 300
 
 # you might be using redis; but note that redis is NOT pre-installed in standard or minimal installations
 # EXTERNALWSGI users will want POLLCONNECTIONTYPE = 'redis'
@@ -46,9 +46,98 @@
 #   lines back as your intermediate result. You just grabbed a huge % of the
 #   total possible collection of lines. People who don't use a helper app
 #   should fear this number, but golang can get you to 400k in 5s.
+#
+# ASYNCQUERYCONNECTIONS: how many asynchronous connections a single request may keep busy at once when it
+#   has a pile of small independent queries to run (context for the search results of many authors, wordcount
+#   probes, etc.). These are opened in addition to the pooled connections and are kept around for re-use.
+#   0 disables the asynchronous path: the queries will be run one after another on a normal connection.
+#
+# WORDCOUNTSINMEMORY: if 'yes', load all of the wordcounts (and the headword totals) into memory at startup.
+#   Then choosing which term to search for first, weighting vector neighbors, etc. never needs to ask the db
+#   about word frequency. The cost: c. 150MB of RAM and a slower launch (unless you use a snapshot).
+#
+# WORDCOUNTSNAPSHOTFILE: if set, the in-memory wordcounts get read from this file; if the file does not exist
+#   it will be written after the counts are loaded from the db. A snapshot taken from a different build of the
+#   database is ignored and replaced.
+#   Example: '/home/hipparchia/wordcounts.snapshot'
+#
+# CONCORDANCECACHE: if 'yes', each work gets indexed only once and every subsequent index to all or part of it
+#   is built from that stored concordance.
+#
+# CONCORDANCECACHEMEMORYLIMIT: how many works' concordances to keep in memory (most recently used first).
+#
+# CONCORDANCECACHEDIRECTORY: if set, the concordances are also saved here so that they survive a restart.
+#   Each database build gets its own subdirectory; old subdirectories can be deleted by hand.
+#   Example: '/home/hipparchia/concordances'
+#
+# BROWSERPASSAGECACHESIZE: how many rendered browser passages to keep in memory. Each one is c. 20-50KB of html.
+#
+# BROWSERPREFETCH: if 'yes', then after a passage is sent to the browser the passages before and after it are
+#   built in the background so that the next click of the '<' or '>' button is served straight from memory.
+#
+# CITATIONTREES: if 'yes', each work gets a map of all of its citations (book 1 runs from line x to line y and
+#   contains sections 1-40, etc.) the first time it is needed. Then the citation boxes, browsing by locus, and
+#   index spans can be resolved without querying the author tables.
+#
+# CITATIONTREEMEMORYLIMIT: how many works' citation trees to keep in memory (most recently used first).
+#
+# CITATIONTREEDIRECTORY: if set, the citation trees are also saved here so that they survive a restart.
+#   Example: '/home/hipparchia/citationtrees'
+#
+# DICTIONARYENTRYCACHE: if 'yes', the html version of a dictionary entry is built only once and then reused
+#   every time somebody clicks on that word again.
+#
+# DICTIONARYENTRYCACHEMEMORYLIMIT: how many rendered dictionary entries to keep in memory (most recently used first).
+#
+# DICTIONARYENTRYCACHEDIRECTORY: if set, the rendered entries are also saved here so that they survive a restart.
+#   Reloading the dictionaries or upgrading HipparchiaServer gives them a new subdirectory; old subdirectories
+#   can be deleted by hand. Example: '/home/hipparchia/dictionaryentries'
+#
+# DICTIONARYENTRYPREWARM: if 'yes', render every entry in both dictionaries into DICTIONARYENTRYCACHEDIRECTORY
+#   in the background after startup. This takes a while, but it only has to happen once per dictionary build.
+#
+# TEXTEXPORTCHUNKSIZE: '/text/export/...' streams a text to the browser as a download; this is how many lines
+#   are read from the database and formatted at a time.
+#
+# INCLUDELISTCACHE: if 'yes', the list of lines to search inside of a restricted author table (e.g., inscriptions
+#   by date) is built once as a shared table and then reused by every query that needs that same list: lemmatized
+#   searches, proximity searches, vectors, and repeat searches. The shared tables are built by DBWRITEUSER, who
+#   needs permission to create tables; otherwise each connection just reuses its own temporary copy.
+#
+# INCLUDELISTCACHETTL: how many seconds a shared list can sit unused before it is dropped.
+#
+# SELECTIONCACHESIZE: how many different sets of selections (authors, genres, dates, exclusions, ...) to remember
+#   the list of works for. Each one holds a list of work ids: as many as 236k if everything is active.
+#
+# MORPHOLOGYCHARTCACHESIZE: how many 'all known forms' charts to keep in memory. A chart is remembered separately
+#   for each combination of the morphology table settings (dialects, duals, empty rows, ...).
+#
+# MORPHOLOGYCHARTPREWARM: build the charts of this many of the most common headwords in the background after
+#   startup (0 to skip). The charts are built with the default settings and cannot exceed MORPHOLOGYCHARTCACHESIZE.
 
 AUTOCONFIGWORKERS = True
 WORKERS = 3
 
 MPCOMMITCOUNT = 250
 INTERMEDIATESEARCHCAP = 2000000
+ASYNCQUERYCONNECTIONS = 4
+WORDCOUNTSINMEMORY = False
+WORDCOUNTSNAPSHOTFILE = ''
+CONCORDANCECACHE = True
+CONCORDANCECACHEMEMORYLIMIT = 25
+CONCORDANCECACHEDIRECTORY = ''
+BROWSERPASSAGECACHESIZE = 250
+BROWSERPREFETCH = True
+CITATIONTREES = True
+CITATIONTREEMEMORYLIMIT = 500
+CITATIONTREEDIRECTORY = ''
+DICTIONARYENTRYCACHE = True
+DICTIONARYENTRYCACHEMEMORYLIMIT = 2000
+DICTIONARYENTRYCACHEDIRECTORY = ''
+DICTIONARYENTRYPREWARM = False
+TEXTEXPORTCHUNKSIZE = 2000
+INCLUDELISTCACHE = True
+INCLUDELISTCACHETTL = 3600
+SELECTIONCACHESIZE = 50
+MORPHOLOGYCHARTCACHESIZE = 500
+MORPHOLOGYCHARTPREWARM = 0
@@ -96,6 +96,36 @@
 # Searched 1 texts and found 15 proximate terms to graph (21.3s)
 # and 2/3 of that time is spend inside of Word2Vec; i.e., the prep is 7s vs 70s
 
+# VECTORINCREMENTALTRAINING: if 'yes', keep trainable copies of recent models; when a new selection is an
+#   old selection plus a few more works, the old model is trained further on just the new works instead of
+#   building a model from scratch. The result is close to, but not identical with, a fresh model.
+# VECTORINCREMENTALMAXDELTA: the new material can be at most n% of the size (in words) of the material already in the model
+# VECTORINCREMENTALMAXGENERATIONS: after a model has been extended n times the next change forces a full rebuild
+# VECTORBASEMODELSTOKEEP: how many trainable models to hold in memory (these are large: 100s of MB for a big corpus)
+# VECTORBAGCACHESIZE: how many search list items' bags of words to hold in memory for re-use
+# VECTORSTREAMINGCORPUS: if 'yes', nearest neighbor and analogy models are trained from sentences that are
+#   streamed out of the db and spooled to disk instead of from one giant string held in memory; memory use
+#   no longer grows with the size of the selection (topic models still need everything at once)
+# VECTORSTREAMCHUNKSIZE: how many lines to pull from the db (and how many sentences to bag) at a time
+# VECTORSTREAMSPOOLDIRECTORY: where to put the spooled sentences; '' means the system temporary directory
+# VECTORANNINDEX: if 'yes', every new nearest neighbor model gets an approximate nearest neighbor index (a forest of
+#   random projection trees) that is stored along with it; neighbor queries then only score a few thousand likely
+#   candidates instead of the whole vocabulary and the part of speech trimming only checks as many words as it needs
+# VECTORANNTREES: more trees means better recall but a bigger index and slower searches
+# VECTORANNLEAFSIZE: the most words that a leaf of a tree can hold
+# VECTORANNMINIMUMVOCABULARY: do not bother with an index for models with fewer words than this
+# VECTORANNFILTERBATCH: how many candidates to hand to the part of speech filter at a time
+# VECTORANNSEARCHMULTIPLIER: collect this many candidates for every neighbor wanted; the search widens by itself
+#   if the part of speech filter throws out too many of them
+# VECTORANNTIMING: if 'yes', also run every neighbor query through the brute force search and report on the console
+#   how the two compare (time and recall); this costs the brute force search every time, so only for testing
+# VECTORGRAPHCACHE: if 'yes', graphs are kept under a name made out of the model, the word and the neighbors
+#   that were drawn; the same graph will not be drawn twice
+# VECTORGRAPHCACHESIZE: how many graphs to keep in memory
+# VECTORGRAPHCACHEDIRECTORY: if not '', keep the graphs on disk here too and send them straight from the cache;
+#   if '', a graph still goes to the browser via the db so that it does not matter which process (e.g., which
+#   gunicorn worker) gets asked for it
+
 SEMANTICVECTORSENABLED = False
 FORBIDUSERDEFINEDVECTORSPACES = False
 CONCEPTMAPPINGENABLED = False
@@ -115,6 +145,24 @@ VECTORDISTANCECUTOFFNEARESTNEIGHBOR = 15
 VECTORDISTANCECUTOFFLEMMAPAIR = 50
 NEARESTNEIGHBORSCAP = 15
 SENTENCESPERDOCUMENT = 1
+VECTORINCREMENTALTRAINING = False
+VECTORINCREMENTALMAXDELTA = 25
+VECTORINCREMENTALMAXGENERATIONS = 3
+VECTORBASEMODELSTOKEEP = 2
+VECTORBAGCACHESIZE = 50
+VECTORSTREAMINGCORPUS = False
+VECTORSTREAMCHUNKSIZE = 5000
+VECTORSTREAMSPOOLDIRECTORY = ''
+VECTORANNINDEX = True
+VECTORANNTREES = 10
+VECTORANNLEAFSIZE = 64
+VECTORANNMINIMUMVOCABULARY = 5000
+VECTORANNFILTERBATCH = 100
+VECTORANNSEARCHMULTIPLIER = 20
+VECTORANNTIMING = False
+VECTORGRAPHCACHE = True
+VECTORGRAPHCACHESIZE = 100
+VECTORGRAPHCACHEDIRECTORY = ''
 
 # settings for ldatopicgraphing()
 LDAMAXFEATURES = 2000
@@ -129,6 +177,22 @@ LDAMUSTBELONGERTHAN = 3
 AUTOVECTORIZE = False
 CORPORATOAUTOVECTORIZE = ['greekcorpus', 'latincorpus', 'papyruscorpus', 'inscriptioncorpus', 'christiancorpus']
 
+# the vectorbot works from a priority queue: selections that people have asked for (and the authors they come from)
+#   go before the rest; it builds as many models at once as the spare cpus and db connections allow and it pauses
+#   at the end of a training epoch whenever a search is running; every model is built in a process of its own
+#   and the bot stays around after the backlog is done to build whatever people ask for next
+# VECTORBOTMAXCONCURRENT: never build more than this many models at once [this is also how many worker processes
+#   the bot keeps; each one loads its own copy of the author and work data when it starts]
+# VECTORBOTDEMANDHALFLIFE: seconds after which a request counts for half as much
+# VECTORBOTDEMANDWEIGHT: how much one recent request outweighs the default biggest-author-first order (which runs 0-1)
+# VECTORBOTDEMANDMEMORY: how many distinct requested selections to remember
+# VECTORBOTYIELDINTERVAL: seconds between checks to see if the searches that made the bot pause are done
+VECTORBOTMAXCONCURRENT = 2
+VECTORBOTDEMANDHALFLIFE = 86400
+VECTORBOTDEMANDWEIGHT = 10
+VECTORBOTDEMANDMEMORY = 500
+VECTORBOTYIELDINTERVAL = 1
+
 # baggingmethods = {'flat': buildflatbagsofwords,
 #                   'alternates': buildbagsofwordswithalternates,
 #                   'winnertakesall': buildwinnertakesallbagsofwords,
@@ -20,11 +20,11 @@ from flask import request, session
 
 from server import hipparchia
 from server.dbsupport.dblinefunctions import dblineintolineobject, makeablankline, worklinetemplate, grabonelinefromwork
-from server.dbsupport.lexicaldbfunctions import findcountsviawordcountstable, querytotalwordcounts
-from server.dbsupport.tablefunctions import assignuniquename
+from server.dbsupport.lexicaldbfunctions import concurrentwordcountlookups, querytotalwordcounts
 from server.formatting.betacodetounicode import replacegreekbetacode
 from server.formatting.miscformatting import debugmessage, consolewarning
 from server.formatting.wordformatting import badpucntwithbackslash, minimumgreek, removegravity, wordlistintoregex
+from server.hipparchiaobjects.includelistobjects import nameincludelist
 from server.hipparchiaobjects.searchobjects import SearchObject
 from server.hipparchiaobjects.worklineobject import dbWorkLine
 from server.listsandsession.checksession import probeforsessionvariables, justtlg
@@ -306,7 +306,7 @@ def findleastcommonterm(searchphrase: str, accentsneeded: bool) -> str:
 		searchterms = [re.sub(r'v', 'u', t) for t in searchterms]
 		searchterms = {removegravity(t): t for t in searchterms}
 
-		counts = [findcountsviawordcountstable(k) for k in searchterms.keys()]
+		counts = list(concurrentwordcountlookups(list(searchterms.keys())).values())
 		# counts [('βεβήλων', 84, 84, 0, 0, 0, 0), ('ὀλίγοϲ', 596, 589, 0, 3, 4, 0)]
 		# counts [('imperatores', 307, 7, 275, 3, 4, 18), ('paucitate', 42, 0, 42, 0, 0, 0)]
 		totals = [(c[1], c[0]) for c in counts if c]
@@ -355,7 +355,7 @@ def findleastcommontermcount(searchphrase: str, accentsneeded: bool) -> int:
 		searchterms = [re.sub(r'v', 'u', t) for t in searchterms]
 		searchterms = {removegravity(t): t for t in searchterms}
 
-		counts = [findcountsviawordcountstable(k) for k in searchterms.keys()]
+		counts = list(concurrentwordcountlookups(list(searchterms.keys())).values())
 		# counts [('βεβήλων', 84, 84, 0, 0, 0, 0), ('ὀλίγοϲ', 596, 589, 0, 3, 4, 0)]
 		totals = [(c[1], c[0]) for c in counts if c]
 		maxval = sorted(totals, reverse=False)
@@ -704,13 +704,16 @@ def insertuniqunames(sqldict: dict) -> dict:
 
 	swap out "_UNIQUENAME" in the prerolled queries
 
+	with INCLUDELISTCACHE the lemma chunks of one author (gr1001_0, gr1001_1, ...) end up with the same name and so
+	share one include-list: see nameincludelist()
+
 	"""
 
 	for item in sqldict:
 		if sqldict[item]['temptable']:
-			u = assignuniquename()
+			u, t = nameincludelist(sqldict[item]['temptable'])
 			sqldict[item]['query'] = re.sub(r'UNIQUENAME', u, sqldict[item]['query'])
-			sqldict[item]['temptable'] = re.sub(r'UNIQUENAME', u, sqldict[item]['temptable'])
+			sqldict[item]['temptable'] = re.sub(r'UNIQUENAME', u, t)
 
 	return sqldict
 
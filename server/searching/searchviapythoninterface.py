@@ -19,9 +19,9 @@ import psycopg2
 from server.dbsupport.dblinefunctions import dblineintolineobject
 from server.dbsupport.miscdbfunctions import icanpickleconnections
 from server.dbsupport.miscdbfunctions import resultiterator
-from server.dbsupport.tablefunctions import assignuniquename
 from server.formatting.miscformatting import consolewarning
 from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.includelistobjects import executeincludelist, nameincludelist
 from server.hipparchiaobjects.searchobjects import SearchObject
 from server.hipparchiaobjects.worklineobject import dbWorkLine
 from server.threading.mpthreadcount import setthreadcount
@@ -162,10 +162,10 @@ def precomposedsqlsearcher(querydict, dbcursor) -> Generator:
     d = (querydict['data'],)
 
     if t:
-        unique = assignuniquename()
+        unique, t = nameincludelist(t)
         t = re.sub('UNIQUENAME', unique, t)
         q = re.sub('UNIQUENAME', unique, q)
-        dbcursor.execute(t)
+        executeincludelist(t, dbcursor)
 
     found = list()
 
@@ -8,11 +8,15 @@
 
 from typing import List
 
+from server import hipparchia
+
 from server.dbsupport.lexicaldbfunctions import lookformorphologymatches
 from server.formatting.vectorformatting import formatnnmatches, formatnnsimilarity, nearestneighborgenerateoutput
 from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.hipparchiaobjects.vectorobjects import VectorValues
 from server.semanticvectors.vectorgraphing import graphnnmatches
+from server.semanticvectors.nearestneighborindex import fetchnearestneighborindex, modelwordsandvectors, \
+	timeagainstmostsimilar
 from server.semanticvectors.vectorhelpers import emptyvectoroutput
 
 JSON_STR = str
@@ -69,18 +73,16 @@ def generatenearestneighbordata(sentencetuples, workssearched, searchobject, vec
 		html = similarity
 	else:
 		activepoll.statusis('Calculating the nearest neighbors')
-		mostsimilar = findapproximatenearestneighbors(termone, vectorspace, vv)
+		acceptable = None
+		if so.session['trimvectoryby'] != 'none':
+			acceptable = lambda words: trimbypartofspeech(words, so.session['trimvectoryby'], so.session['baggingmethod'])
+		mostsimilar = findapproximatenearestneighbors(termone, vectorspace, vv, acceptable)
 		# [('εὕρηϲιϲ', 1.0), ('εὑρίϲκω', 0.6673248708248138), ('φυϲιάω', 0.5833806097507477), ('νόμοϲ', 0.5505017340183258), ...]
 		if not mostsimilar:
 			# proper noun? Ϲωκράτηϲ --> ϲωκράτηϲ
 			termone = termone[0].lower() + termone[1:]
-			mostsimilar = findapproximatenearestneighbors(termone, vectorspace, vv)
+			mostsimilar = findapproximatenearestneighbors(termone, vectorspace, vv, acceptable)
 		if mostsimilar:
-			# you can get back >1000 items
-			if so.session['trimvectoryby'] != 'none':
-				activepoll.statusis('Trimming by part of speech')
-				validset = trimbypartofspeech([m[0] for m in mostsimilar], so.session['trimvectoryby'], so.session['baggingmethod'])
-				mostsimilar = [m for m in mostsimilar if m[0] in validset]
 			html = formatnnmatches(mostsimilar, vv)
 			activepoll.statusis('Building the graph')
 			mostsimilar = mostsimilar[:vv.neighborscap]
@@ -99,7 +101,7 @@ def generatenearestneighbordata(sentencetuples, workssearched, searchobject, vec
 	return output
 
 
-def findapproximatenearestneighbors(query, mymodel, vectorvalues: VectorValues):
+def findapproximatenearestneighbors(query, mymodel, vectorvalues: VectorValues, acceptable=None):
 	"""
 
 	search for points in space that are close to a given query point
@@ -108,13 +110,34 @@ def findapproximatenearestneighbors(query, mymodel, vectorvalues: VectorValues):
 
 	this returns a list of tuples: (word, distance)
 
+	if the model came with a RandomProjectionForest we only score the candidates that it hands over; otherwise
+	most_similar() has to compare the query to every word in the vocabulary
+
+	'acceptable' is an optional filter (e.g., trimbypartofspeech()): a function that takes a list of words and
+	returns the set of those that can stay
+
 	:param query:
 	:param mymodel:
 	:param vectorvalues:
+	:param acceptable:
 	:return:
 	"""
 
 	explore = max(2500, vectorvalues.neighborscap)
+	# formatnnmatches() shows the graphed neighbors and then 10 more
+	enough = vectorvalues.neighborscap + 10
+
+	index = fetchnearestneighborindex(mymodel)
+	if index:
+		words, vectors = modelwordsandvectors(mymodel)
+		if hipparchia.config['VECTORANNTIMING']:
+			timeagainstmostsimilar(mymodel, query, enough, vectorvalues.nearestneighborcutoffdistance)
+		try:
+			mostsimilar = index.mostsimilar(query, vectors, enough, vectorvalues.nearestneighborcutoffdistance,
+											acceptable=acceptable)
+		except KeyError:
+			mostsimilar = None
+		return mostsimilar
 
 	try:
 		mostsimilar = mymodel.wv.most_similar(query, topn=explore)
@@ -128,6 +151,11 @@ def findapproximatenearestneighbors(query, mymodel, vectorvalues: VectorValues):
 
 	#print('mostsimilar', mostsimilar)
 
+	if mostsimilar and acceptable:
+		# you can get back >1000 items
+		validset = acceptable([m[0] for m in mostsimilar])
+		mostsimilar = [m for m in mostsimilar if m[0] in validset]
+
 	return mostsimilar
 
 
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+    HipparchiaServer: an interface to a database of Greek and Latin texts
+    Copyright: E Gunderson 2016-22
+    License: GNU GENERAL PUBLIC LICENSE 3
+        (see LICENSE in the top level directory of the distribution)
+"""
+
+from typing import List
+
+from server import hipparchia
+from server.hipparchiaobjects.lrumemoryobjects import LRUMemory
+from server.hipparchiaobjects.searchobjects import SearchObject
+from server.startup import authordict, workdict
+
+
+class IncrementalModelManager(object):
+    """
+
+    a borg that remembers trainable Word2Vec models and the bags of words of individual search list items
+
+    checkforstoredvector() only knows exact matches: add one work to a selection of forty and you used to pay for a
+    full retrain; now the model for the forty can be copied and trained a little further on the bags of the new work
+
+    the staleness policy:
+        [a] the old selection must be contained in the new one (you cannot un-train a work)
+        [b] the new material must be no more than VECTORINCREMENTALMAXDELTA percent of the words already in the model
+        [c] a model can only be extended VECTORINCREMENTALMAXGENERATIONS times before it has to be built afresh
+
+    the models are big: only VECTORBASEMODELSTOKEEP of them stay around; they are not copied until somebody actually
+    extends one of them
+
+    """
+
+    _basemodels = LRUMemory('VECTORBASEMODELSTOKEEP')
+    _bags = LRUMemory('VECTORBAGCACHESIZE')
+
+    @staticmethod
+    def modelkey(so: SearchObject) -> tuple:
+        return so.vectorvalues.getvectorvaluethumbprint(), so.session['baggingmethod'], so.sentencebundlesize
+
+    @staticmethod
+    def selectionunits(so: SearchObject) -> frozenset:
+        return frozenset(so.searchlist)
+
+    @staticmethod
+    def isambiguous(unit: str) -> bool:
+        # 'gr0001x001' means 'gr0001w001 with exclusions': but which exclusions depends on the session that asked
+        return len(unit) > 6 and unit[6] == 'x'
+
+    def cantrackselection(self, so: SearchObject) -> bool:
+        """
+
+        a selection with an 'x' unit can neither serve as a base nor be built from one: the same name stands for
+        different text in different sessions
+
+        :param so:
+        :return:
+        """
+
+        return not any(self.isambiguous(u) for u in so.searchlist)
+
+    @staticmethod
+    def wordcount(units) -> int:
+        """
+
+        what [b] is judged by: known before anything has been bagged
+
+        an estimate: a passage or a work with exclusions counts as the whole work
+
+        :param units:
+        :return:
+        """
+
+        count = 0
+        for u in units:
+            try:
+                if len(u) == 6:
+                    count += authordict[u].countwordsinworks()
+                else:
+                    count += workdict[u[:6] + 'w' + u[7:10]].wordcount
+            except (KeyError, TypeError):
+                # TypeError: unsupported operand type(s) for +=: 'int' and 'NoneType'
+                pass
+        return count
+
+    def findbase(self, so: SearchObject) -> tuple:
+        """
+
+        return (basemodelentry, [units to add]) or (None, list())
+
+        :param so:
+        :return:
+        """
+
+        if not self.cantrackselection(so):
+            return None, list()
+
+        key = self.modelkey(so)
+        wanted = self.selectionunits(so)
+        maxgenerations = hipparchia.config['VECTORINCREMENTALMAXGENERATIONS']
+        maxdelta = hipparchia.config['VECTORINCREMENTALMAXDELTA']
+
+        best = None
+        for entry in IncrementalModelManager._basemodels.values():
+            if entry['key'] != key or entry['generation'] >= maxgenerations:
+                continue
+            if not entry['units'] < wanted:
+                continue
+            if self.wordcount(wanted - entry['units']) * 100 > entry['words'] * maxdelta:
+                # too much new material: the old model would distort more than it would help
+                continue
+            if best is None or len(wanted - entry['units']) < len(wanted - best['units']):
+                best = entry
+
+        if not best:
+            return None, list()
+
+        return best, sorted(wanted - best['units'])
+
+    def remember(self, so: SearchObject, trainablemodel, generation: int):
+        """
+
+        the model is kept as is: the caller must not train it any further or reduce it in place
+
+        :param so:
+        :param trainablemodel:
+        :param generation:
+        :return:
+        """
+
+        if not self.cantrackselection(so):
+            return
+
+        units = self.selectionunits(so)
+        entry = {
+            'key': self.modelkey(so),
+            'units': units,
+            'model': trainablemodel,
+            'words': self.wordcount(units),
+            'generation': generation
+        }
+
+        IncrementalModelManager._basemodels.store((entry['key'], entry['units']), entry)
+
+    def fetchbags(self, so: SearchObject, unit: str) -> List[List[str]]:
+        if self.isambiguous(unit):
+            return None
+        return IncrementalModelManager._bags.fetch((self.modelkey(so), unit))
+
+    def storebags(self, so: SearchObject, unit: str, bags: List[List[str]]):
+        if self.isambiguous(unit):
+            return
+        IncrementalModelManager._bags.store((self.modelkey(so), unit), bags)
@@ -6,25 +6,35 @@
         (see LICENSE in the top level directory of the distribution)
 """
 
+import copy
 import multiprocessing
 import re
 import warnings
 from typing import List
 
+from server import hipparchia
 from server.formatting.miscformatting import consolewarning
 from server.dbsupport.vectordbfunctions import storevectorindatabase
 from server.formatting.vectorformatting import analogiesgenerateoutput
 from server.hipparchiaobjects.searchobjects import SearchObject
+from server.listsandsession.whereclauses import configurewhereclausedata
+from server.searching.precomposesql import searchlistintosqldict
+from server.semanticvectors.incrementalmodels import IncrementalModelManager
+from server.semanticvectors.nearestneighborindex import attachnearestneighborindex
+from server.startup import workdict
 from server.threading.mpthreadcount import setthreadcount
+from server.threading.vectorbotscheduler import yieldtosearches
 
 try:
     from gensim.models import Word2Vec
+    from gensim.models.callbacks import CallbackAny2Vec
 except ImportError:
     from multiprocessing import current_process
 
     if current_process().name == 'MainProcess':
         print('gensim not available')
     Word2Vec = None
+    CallbackAny2Vec = object
 
 try:
     from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
@@ -57,6 +67,17 @@ JSON_STR = str
 JSONDICT = str
 
 
+class YieldToSearches(CallbackAny2Vec):
+    """
+
+    let the vectorbot step aside between training epochs whenever somebody is searching
+
+    """
+
+    def on_epoch_end(self, model):
+        yieldtosearches()
+
+
 def buildgensimmodel(so: SearchObject, bagsofwords: List[List[str]]) -> Word2Vec:
     """
 
@@ -180,6 +201,11 @@ def buildgensimmodel(so: SearchObject, bagsofwords: List[List[str]]) -> Word2Vec
 
     computeloss = False
 
+    if so.iamarobot:
+        callbacks = [YieldToSearches()]
+    else:
+        callbacks = list()
+
     # Note that for a fully deterministically-reproducible run, you must also limit the model to a single worker thread
     # (workers=1), to eliminate ordering jitter from OS thread scheduling.
     try:
@@ -196,7 +222,8 @@ def buildgensimmodel(so: SearchObject, bagsofwords: List[List[str]]) -> Word2Vec
                                        sg=1,  # the results seem terrible if you say sg=0
                                        window=vv.window,
                                        workers=workers,
-                                       compute_loss=computeloss)
+                                       compute_loss=computeloss,
+                                       callbacks=callbacks)
             except TypeError:
                 # gensim 3.8.3 API
                 gensimmodel = Word2Vec(bagsofwords,
@@ -208,7 +235,8 @@ def buildgensimmodel(so: SearchObject, bagsofwords: List[List[str]]) -> Word2Vec
                                        sg=1,  # the results seem terrible if you say sg=0
                                        window=vv.window,
                                        workers=workers,
-                                       compute_loss=computeloss)
+                                       compute_loss=computeloss,
+                                       callbacks=callbacks)
 
     except RuntimeError:
         # RuntimeError: you must first build vocabulary before training the model
@@ -219,6 +247,90 @@ def buildgensimmodel(so: SearchObject, bagsofwords: List[List[str]]) -> Word2Vec
         print('loss after {n} iterations was: {l}'.format(n=vv.trainingiterations,
                                                           l=gensimmodel.get_latest_training_loss()))
 
+    if gensimmodel and hipparchia.config['VECTORINCREMENTALTRAINING']:
+        # keep the trainable model around: a later selection that adds a work or two can start from here
+        IncrementalModelManager().remember(so, gensimmodel, 0)
+        gensimmodel = reducedcopyofgensimmodel(gensimmodel)
+    else:
+        gensimmodel = reducegensimmodel(gensimmodel)
+
+    gensimmodel = attachnearestneighborindex(gensimmodel)
+
+    # print(model.wv['puer'])
+
+    storevectorindatabase(so, gensimmodel)
+
+    return gensimmodel
+
+
+def extendstoredgensimmodel(so: SearchObject, bagger) -> Word2Vec:
+    """
+
+    try to derive the model for this selection from a model for a slightly smaller selection
+
+    see IncrementalModelManager() for the rules; None means "build it from scratch"
+
+    'bagger' is acquireandbagthewords(): each new search list item is bagged on its own so that its bags can be
+    re-used the next time that item gets toggled on
+
+    :param so:
+    :param bagger:
+    :return:
+    """
+
+    manager = IncrementalModelManager()
+    base, toadd = manager.findbase(so)
+    if not base:
+        return None
+
+    # findbase() has already applied the VECTORINCREMENTALMAXDELTA limit: nothing gets bagged for a model that is not
+    # going to be extended
+    newbags = list()
+    for unit in toadd:
+        bags = manager.fetchbags(so, unit)
+        if bags is None:
+            so.poll.statusis('Bagging the words of {u}'.format(u=unit))
+            unitso = copy.copy(so)
+            unitso.searchlist = [unit]
+            unitso.indexrestrictions = configurewhereclausedata(unitso.searchlist, workdict, unitso)
+            unitso.searchsqldict = searchlistintosqldict(unitso, str(), vectors=True)
+            bags = bagger(unitso)
+            manager.storebags(so, unit, bags)
+        newbags.extend(bags)
+
+    so.poll.statusis('Extending a stored model')
+    # the base stays as it was: other selections might want to start from it too
+    gensimmodel = copy.deepcopy(base['model'])
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=DeprecationWarning)
+        if newbags:
+            gensimmodel.build_vocab(newbags, update=True)
+            try:
+                # gensim 4 API
+                epochs = gensimmodel.epochs
+            except AttributeError:
+                # gensim 3.8.3 API
+                epochs = gensimmodel.iter
+            gensimmodel.train(newbags, total_examples=len(newbags), epochs=epochs)
+
+    manager.remember(so, gensimmodel, base['generation'] + 1)
+
+    gensimmodel = reducedcopyofgensimmodel(gensimmodel)
+    gensimmodel = attachnearestneighborindex(gensimmodel)
+    storevectorindatabase(so, gensimmodel)
+
+    return gensimmodel
+
+
+def reducegensimmodel(gensimmodel: Word2Vec) -> Word2Vec:
+    """
+
+    drop the training data: the model can be queried but no longer trained
+
+    :param gensimmodel:
+    :return:
+    """
+
     reducedmodel = None
 
     if gensimmodel:
@@ -242,11 +354,25 @@ def buildgensimmodel(so: SearchObject, bagsofwords: List[List[str]]) -> Word2Vec
     if reducedmodel:
         gensimmodel = reducedmodel
 
-    # print(model.wv['puer'])
+    return gensimmodel
 
-    storevectorindatabase(so, gensimmodel)
 
-    return gensimmodel
+def reducedcopyofgensimmodel(gensimmodel: Word2Vec) -> Word2Vec:
+    """
+
+    reducegensimmodel() without touching the trainable model that the IncrementalModelManager is holding on to
+
+    gensim 4 reduces into a new model that shares nothing but the word vectors, and those only ever get trained on a
+    copy; gensim 3.8.3 reduces in place and so it needs a copy to work on
+
+    :param gensimmodel:
+    :return:
+    """
+
+    if hasattr(gensimmodel, 'delete_temporary_training_data'):
+        gensimmodel = copy.deepcopy(gensimmodel)
+
+    return reducegensimmodel(gensimmodel)
 
 
 def buildsklearnselectedworks(so: SearchObject, bagsofsentences: list):
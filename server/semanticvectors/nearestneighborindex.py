@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import heapq
+import time
+from typing import List
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+
+class RandomProjectionForest(object):
+	"""
+
+	an approximate nearest neighbor index for the vocabulary of a Word2Vec model
+
+	most_similar() takes the dot product of the query with every vector in the model; the forest lets you look at
+	a few hundred plausible candidates instead and then score only those exactly
+
+	each tree splits the (normalized) vectors by a hyperplane that runs halfway between two randomly chosen words,
+	and then splits each half again until the leaves hold no more than 'leafsize' words; a search walks all of the
+	trees at once, always descending into the branch whose hyperplane is closest to the query
+
+	nothing but the two words that define each hyperplane is kept: the vectors themselves stay in the model and
+	the index is pickled right along with it in 'storedvectors'
+
+		splits:     [(worda, wordb, offset), ...]
+		children:   [(left, right), ...]        [n >= 0 is splits[n]; n < 0 is leaves[-n - 1]]
+		leaves:     [array([3, 17, 2207, ...]), ...]
+		roots:      [one child reference per tree]
+
+	"""
+
+	def __init__(self, words: List[str], vectors, trees: int, leafsize: int, seed=1):
+		self.words = words
+		self.positions = {w: n for n, w in enumerate(words)}
+		self.norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+		self.norms[self.norms == 0] = 1
+		self.leafsize = max(leafsize, 2)
+		self.splits = list()
+		self.children = list()
+		self.leaves = list()
+		self.roots = list()
+
+		normalized = vectors / self.norms[:, None]
+		randomness = np.random.RandomState(seed)
+		everything = np.arange(len(words))
+		for t in range(trees):
+			self.roots.append(self._buildtree(everything, normalized, randomness))
+
+	def _newleaf(self, members) -> int:
+		self.leaves.append(np.array(members, dtype=np.int32))
+		return -len(self.leaves)
+
+	def _buildtree(self, members, normalized, randomness) -> int:
+		"""
+
+		build one tree; iterative because a recursive version can blow the stack on a lopsided tree
+
+		:param members:
+		:param normalized:
+		:param randomness:
+		:return:
+		"""
+
+		root = None
+		# (members, parent split, which side of the parent)
+		stack = [(members, None, None)]
+		while stack:
+			members, parent, side = stack.pop()
+			reference = None
+			if len(members) > self.leafsize:
+				# a few tries: duplicate vectors can make every word land on the same side
+				for attempt in range(3):
+					a, b = randomness.choice(members, 2, replace=False)
+					normal = normalized[a] - normalized[b]
+					offset = float(np.dot(normal, (normalized[a] + normalized[b]) / 2))
+					above = np.dot(normalized[members], normal) > offset
+					if 0 < np.count_nonzero(above) < len(members):
+						self.splits.append((int(a), int(b), offset))
+						self.children.append([None, None])
+						reference = len(self.splits) - 1
+						stack.append((members[~above], reference, 0))
+						stack.append((members[above], reference, 1))
+						break
+
+			if reference is None:
+				reference = self._newleaf(members)
+
+			if parent is None:
+				root = reference
+			else:
+				self.children[parent][side] = reference
+
+		return root
+
+	def _margin(self, split: int, query, vectors) -> float:
+		a, b, offset = self.splits[split]
+		normal = vectors[a] / self.norms[a] - vectors[b] / self.norms[b]
+		return float(np.dot(query, normal)) - offset
+
+	def candidates(self, query, vectors, searchk: int) -> set:
+		"""
+
+		walk every tree at once and collect the contents of the most promising leaves until you have 'searchk' words
+
+		:param query:
+		:param vectors:
+		:param searchk:
+		:return:
+		"""
+
+		found = set()
+		heap = [(-float('inf'), r) for r in self.roots]
+		heapq.heapify(heap)
+		while heap and len(found) < searchk:
+			priority, reference = heapq.heappop(heap)
+			priority = -priority
+			if reference < 0:
+				found.update(self.leaves[-reference - 1].tolist())
+				continue
+			margin = self._margin(reference, query, vectors)
+			left, right = self.children[reference]
+			heapq.heappush(heap, (-min(priority, -margin), left))
+			heapq.heappush(heap, (-min(priority, margin), right))
+
+		return found
+
+	def mostsimilar(self, word: str, vectors, enough: int, cutoff: float, acceptable=None) -> List[tuple]:
+		"""
+
+		the same [(word, similarity), ...] that most_similar() returns, but only the best 'enough' of the words
+		above the cutoff
+
+		the walk collects enough * VECTORANNSEARCHMULTIPLIER candidates: asking for thousands of them would make
+		the forest visit (and then score) the whole of a modest vocabulary, i.e., brute force with extra steps
+
+		'acceptable' is a function that takes a list of words and returns the set of those you are willing to see:
+		e.g., only the verbs; it is called on small batches of the best candidates until there are 'enough'; if it
+		throws out so many that there are not 'enough' left the walk is redone with twice as many candidates
+
+		:param word:
+		:param vectors:
+		:param enough:
+		:param cutoff:
+		:param acceptable:
+		:return:
+		"""
+
+		try:
+			position = self.positions[word]
+		except KeyError:
+			raise KeyError("word '{w}' not in vocabulary".format(w=word))
+
+		query = vectors[position] / self.norms[position]
+		vocabularysize = len(self.words)
+		searchk = min(vocabularysize, enough * max(hipparchia.config['VECTORANNSEARCHMULTIPLIER'], 1))
+		batchsize = hipparchia.config['VECTORANNFILTERBATCH']
+		# only ask 'acceptable' about a word once even if the walk gets redone
+		verdicts = dict()
+
+		while True:
+			ranked = self._rankcandidates(position, query, vectors, searchk, cutoff)
+
+			if not acceptable:
+				return ranked[:enough]
+
+			filtered = list()
+			rejected = 0
+			for start in range(0, len(ranked), batchsize):
+				batch = ranked[start:start + batchsize]
+				unjudged = [b[0] for b in batch if b[0] not in verdicts]
+				if unjudged:
+					valid = acceptable(unjudged)
+					verdicts.update({u: u in valid for u in unjudged})
+				passed = [b for b in batch if verdicts[b[0]]]
+				rejected += len(batch) - len(passed)
+				filtered += passed
+				if len(filtered) >= enough:
+					return filtered[:enough]
+
+			if not rejected or searchk >= vocabularysize:
+				return filtered
+
+			searchk = min(vocabularysize, searchk * 2)
+
+	def _rankcandidates(self, position: int, query, vectors, searchk: int, cutoff: float) -> List[tuple]:
+		"""
+
+		score the candidates exactly and return the ones above the cutoff, best first
+
+		:param position:
+		:param query:
+		:param vectors:
+		:param searchk:
+		:param cutoff:
+		:return:
+		"""
+
+		found = self.candidates(query, vectors, searchk)
+		found.discard(position)
+
+		found = np.fromiter(found, dtype=np.int64, count=len(found))
+		scores = np.dot(vectors[found], query) / self.norms[found]
+		keep = scores > cutoff
+		found = found[keep]
+		scores = scores[keep]
+		order = np.argsort(-scores)
+		return [(self.words[found[o]], float(scores[o])) for o in order]
+
+
+def modelwordsandvectors(gensimmodel) -> tuple:
+	"""
+
+	the gensim 3.8 vs 4.0 API difference again
+
+	:param gensimmodel:
+	:return:
+	"""
+
+	try:
+		# gensim 4 API
+		words = list(gensimmodel.wv.index_to_key)
+	except AttributeError:
+		# gensim 3.8.3 API
+		words = list(gensimmodel.wv.index2word)
+
+	return words, gensimmodel.wv.vectors
+
+
+def attachnearestneighborindex(gensimmodel):
+	"""
+
+	build a forest for a freshly built model and hang it on the model so that it gets stored with it
+
+	small vocabularies are not worth it: brute force on a few thousand words is already quick
+
+	:param gensimmodel:
+	:return:
+	"""
+
+	if not gensimmodel or not np or not hipparchia.config['VECTORANNINDEX']:
+		return gensimmodel
+
+	words, vectors = modelwordsandvectors(gensimmodel)
+	if len(words) < hipparchia.config['VECTORANNMINIMUMVOCABULARY']:
+		return gensimmodel
+
+	gensimmodel.nearestneighborindex = RandomProjectionForest(words, vectors, hipparchia.config['VECTORANNTREES'],
+															hipparchia.config['VECTORANNLEAFSIZE'])
+
+	return gensimmodel
+
+
+def fetchnearestneighborindex(gensimmodel) -> RandomProjectionForest:
+	"""
+
+	the index of a model if it has one and if it still matches the model (a stored model might predate the index)
+
+	:param gensimmodel:
+	:return:
+	"""
+
+	index = getattr(gensimmodel, 'nearestneighborindex', None)
+	if not index or not np or not hipparchia.config['VECTORANNINDEX']:
+		return None
+
+	words, vectors = modelwordsandvectors(gensimmodel)
+	if len(words) != len(index.words):
+		return None
+
+	return index
+
+
+def timeagainstmostsimilar(gensimmodel, word: str, enough: int, cutoff: float):
+	"""
+
+	VECTORANNTIMING: run the same query through the forest and through most_similar() and report how long each
+	one took and how many of the true neighbors the forest found
+
+	the part of speech filter is left out: it costs the same either way
+
+	:param gensimmodel:
+	:param word:
+	:param enough:
+	:param cutoff:
+	:return:
+	"""
+
+	index = fetchnearestneighborindex(gensimmodel)
+	if not index or word not in index.positions:
+		return
+
+	words, vectors = modelwordsandvectors(gensimmodel)
+
+	start = time.time()
+	approximate = index.mostsimilar(word, vectors, enough, cutoff)
+	forest = time.time() - start
+
+	start = time.time()
+	exact = gensimmodel.wv.most_similar(word, topn=enough)
+	exact = [e for e in exact if e[1] > cutoff]
+	bruteforce = time.time() - start
+
+	found = len({a[0] for a in approximate} & {e[0] for e in exact})
+	m = 'nearest neighbors of "{w}" ({v} words): forest {f}ms; most_similar() {b}ms; found {n} of {e}'
+	consolewarning(m.format(w=word, v=len(words), f=round(forest * 1000, 2), b=round(bruteforce * 1000, 2),
+							n=found, e=len(exact)), color='cyan')
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+    HipparchiaServer: an interface to a database of Greek and Latin texts
+    Copyright: E Gunderson 2016-22
+    License: GNU GENERAL PUBLIC LICENSE 3
+        (see LICENSE in the top level directory of the distribution)
+"""
+
+import os
+import re
+import tempfile
+from string import punctuation
+from typing import Generator, List
+
+import psycopg2
+
+from server import hipparchia
+from server.dbsupport.dblinefunctions import dblineintolineobject
+from server.dbsupport.lexicaldbfunctions import rankheadwordsbyprevalence
+from server.formatting.miscformatting import consolewarning
+from server.formatting.wordformatting import elidedextrapunct
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.includelistobjects import executeincludelist
+from server.hipparchiaobjects.searchobjects import SearchObject
+from server.listsandsession.genericlistfunctions import findsetofallwords
+from server.searching.miscsearchfunctions import insertuniqunames
+from server.semanticvectors.vectorhelpers import cleanvectortext, convertmophdicttodict, recursivesplit
+from server.textsandindices.textandindiceshelperfunctions import getrequiredmorphobjects
+
+
+class StreamedBagsOfWords(object):
+    """
+
+    a re-iterable stand-in for the List[List[str]] that acquireandbagthewords() returns
+
+    Word2Vec() walks its corpus once to build the vocabulary and then once per epoch; every walk re-reads the
+    spooled sentences and bags them on the fly, so only one block of sentences is ever in memory
+
+    the spool file belongs to this object: call cleanup() when the model has been built
+
+    """
+
+    def __init__(self, spoolfile: str, sentencecount: int, baggingmethod: str, morphdict: dict, blocksize: int):
+        self.spoolfile = spoolfile
+        self.sentencecount = sentencecount
+        self.baggingmethod = baggingmethod
+        self.morphdict = morphdict
+        self.blocksize = max(blocksize, 1)
+        self.bagger = self._pickbagger()
+
+    def _pickbagger(self):
+        # importing at the top would be circular: vectorpipeline.py imports this module
+        from server.semanticvectors.vectorpipeline import alternatesbagger, flatbagger, unlemmatizedbagger
+
+        if self.baggingmethod == 'winnertakesall':
+            # winnertakesallbagger() ranks every headword every time it is called; do that once and then
+            # a flatbagger() that only ever sees one headword per form gives the same bags
+            allheadwords = {item for x in self.morphdict for item in self.morphdict[x]}
+            rankedheadwords = rankheadwordsbyprevalence(list(allheadwords))
+            winners = dict()
+            for word in self.morphdict:
+                try:
+                    possibilities = sorted([(item, rankedheadwords[item]) for item in self.morphdict[word]], key=lambda x: x[1])
+                except KeyError:
+                    continue
+                if possibilities:
+                    winners[word] = [possibilities[-1][0]]
+            self.morphdict = winners
+            return flatbagger
+
+        baggingmethods = {'flat': flatbagger,
+                          'alternates': alternatesbagger,
+                          'unlemmatized': unlemmatizedbagger}
+
+        return baggingmethods[self.baggingmethod]
+
+    def __len__(self):
+        return self.sentencecount
+
+    def __iter__(self):
+        dropempties = self.baggingmethod == 'winnertakesall'
+        with open(self.spoolfile, 'r', encoding='utf-8') as f:
+            block = list()
+            for sentence in f:
+                block.append(sentence.rstrip('\n'))
+                if len(block) >= self.blocksize:
+                    yield from self._bagblock(block, dropempties)
+                    block = list()
+            if block:
+                yield from self._bagblock(block, dropempties)
+
+    def _bagblock(self, block: List[str], dropempties: bool) -> Generator:
+        for bag in self.bagger(self.morphdict, block):
+            if bag or not dropempties:
+                yield bag
+
+    def cleanup(self):
+        try:
+            os.remove(self.spoolfile)
+        except OSError:
+            pass
+
+
+def streamvectorlines(so: SearchObject) -> Generator:
+    """
+
+    yield the dbWorkLines for the search one table at a time
+
+    a named (i.e., server-side) cursor means that only 'chunksize' rows ever make it over to python at once;
+    the db does the sorting that acquireandbagthewords() does via sorted()
+
+    :param so:
+    :return:
+    """
+
+    chunksize = hipparchia.config['VECTORSTREAMCHUNKSIZE']
+    so.searchsqldict = insertuniqunames(so.searchsqldict)
+
+    dbconnection = ConnectionObject()
+    dbcursor = dbconnection.cursor()
+
+    for count, table in enumerate(sorted(so.searchsqldict)):
+        querydict = so.searchsqldict[table]
+        if querydict['temptable']:
+            executeincludelist(querydict['temptable'], dbcursor)
+
+        q = '{q} ORDER BY wkuniversalid, index'.format(q=querydict['query'])
+        # the vector queries are not looking for anything in particular: usually there is no '%s' to fill
+        if '%s' in q:
+            d = querydict['data']
+        else:
+            d = None
+
+        # the connection is in autocommit mode: a named cursor then has to be declared 'WITH HOLD'
+        streamer = dbconnection.dbconnection.cursor(name='vectorstream_{n}'.format(n=count), withhold=True)
+        streamer.itersize = chunksize
+        try:
+            streamer.execute(q, d)
+            for row in streamer:
+                line = dblineintolineobject(row)
+                # kill off titles and salutations: dangerous if there is a body l1 value of 't' out there
+                if line.l1 not in ['t', 'sa']:
+                    yield line
+        except psycopg2.DatabaseError as e:
+            consolewarning('streamvectorlines() could not read {t}: {e}'.format(t=table, e=e), color='red')
+        finally:
+            streamer.close()
+
+    dbconnection.connectioncleanup()
+
+
+def streamsentences(so: SearchObject) -> Generator:
+    """
+
+    yield lists of cleaned sentences: one list per chunk of lines
+
+    the last piece of every chunk might be half of a sentence: it is carried over and glued onto the front of
+    the next chunk; so too a word hyphenated across the chunk boundary
+
+    the same cleanups as acquireandbagthewords() [c] and [d1]; but no locus markup since it would just get
+    thrown away again
+
+    :param so:
+    :return:
+    """
+
+    chunksize = hipparchia.config['VECTORSTREAMCHUNKSIZE']
+    terminations = ['.', '?', '!', '·', ';']
+    punct = re.compile('[{s}]'.format(s=re.escape(punctuation + elidedextrapunct)))
+    hyphenated = re.compile(r'-\s{1,2}')
+
+    def cleanchunk(text: str) -> str:
+        text = re.sub(hyphenated, str(), text)
+        text = cleanvectortext(text)  # this contains a de-abbreviator, html stripper, etc.
+        return text.lower()
+
+    carryover = str()
+    chunk = list()
+    for line in streamvectorlines(so):
+        chunk.append(line.markedup)
+        if len(chunk) < chunksize:
+            continue
+        text = cleanchunk('{c} {t}'.format(c=carryover, t=' '.join(chunk)))
+        chunk = list()
+        # recursivesplit() consumes its list of terminations
+        sentences = recursivesplit([text], list(terminations))
+        carryover = sentences.pop()
+        yield [re.sub(punct, str(), s) for s in sentences]
+
+    text = cleanchunk('{c} {t}'.format(c=carryover, t=' '.join(chunk)))
+    sentences = recursivesplit([text], list(terminations))
+    yield [re.sub(punct, str(), s) for s in sentences]
+
+
+def streamandbagthewords(so: SearchObject) -> StreamedBagsOfWords:
+    """
+
+    the bounded-memory version of acquireandbagthewords()
+
+        [a] stream the lines and the sentences to a spool file, collecting the set of words as we go
+        [b] find all of the parsing info relative to these words
+        [c] hand back an iterable that bags the spooled sentences lazily
+
+    :param so:
+    :return:
+    """
+
+    so.poll.statusis('Grabbing and spooling the sentences')
+    so.poll.allworkis(-1)
+    so.poll.sethits(0)
+
+    lemmatize = so.session['baggingmethod'] != 'unlemmatized'
+    bundlesize = max(so.sentencebundlesize, 1)
+
+    descriptor, spoolfile = tempfile.mkstemp(prefix='hipparchia_vectors_', suffix='.txt',
+                                             dir=hipparchia.config['VECTORSTREAMSPOOLDIRECTORY'] or None)
+
+    allwords = set()
+    sentencecount = 0
+    bundle = list()
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as spool:
+            for sentences in streamsentences(so):
+                if lemmatize:
+                    allwords.update(findsetofallwords(sentences))
+                for s in sentences:
+                    # a sentence cannot contain a newline if it is going to be one line of the spool
+                    bundle.append(s.replace('\n', ' '))
+                    if len(bundle) < bundlesize:
+                        continue
+                    # zip(*[iter(allsentences)] * so.sentencebundlesize) also drops an incomplete final bundle
+                    spool.write(' '.join(bundle) + '\n')
+                    sentencecount += 1
+                    bundle = list()
+    except Exception:
+        os.remove(spoolfile)
+        raise
+
+    morphdict = dict()
+    if lemmatize:
+        so.poll.statusis('Building the parsing table')
+        mo = getrequiredmorphobjects(allwords, furtherdeabbreviate=True)
+        morphdict = convertmophdicttodict(mo)
+
+    so.poll.statusis('Filling the bags of words')
+    return StreamedBagsOfWords(spoolfile, sentencecount, so.session['baggingmethod'], morphdict,
+                               hipparchia.config['VECTORSTREAMCHUNKSIZE'])
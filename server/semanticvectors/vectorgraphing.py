@@ -88,6 +88,7 @@ import psycopg2
 from server.dbsupport.tablefunctions import assignuniquename
 from server.dbsupport.vectordbfunctions import createstoredimagestable
 from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.vectorgraphobjects import VectorGraphCache
 from server.startup import authordict, workdict
 
 
@@ -114,7 +115,12 @@ def graphbliteraldistancematches(searchterm, mostsimilartuples, searchobject):
 	relevantconnections = dict()
 
 	title = givetitletograph('Words most concretely connected with', searchterm, searchobject)
-	imagename = graphmatches(title, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype='rudimentary')
+	imagekey = vectorgraphkey(title, searchterm, searchobject, mostsimilartuples, 'rudimentary')
+	cachedimage = VectorGraphCache().fetch(imagekey) if imagekey else None
+	if cachedimage:
+		return storevectorgraph(cachedimage, imagekey)
+
+	imagename = graphmatches(title, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype='rudimentary', imagekey=imagekey)
 
 	return imagename
 
@@ -131,6 +137,14 @@ def graphnnmatches(searchterm, mostsimilartuples, vectorspace, searchobject):
 	:return:
 	"""
 
+	title = givetitletograph('Conceptual neighborhood of', searchterm, searchobject)
+
+	# the neighbors of the neighbors cost a most_similar() apiece: check for an old drawing first
+	imagekey = vectorgraphkey(title, searchterm, searchobject, mostsimilartuples, 'nn')
+	cachedimage = VectorGraphCache().fetch(imagekey) if imagekey else None
+	if cachedimage:
+		return storevectorgraph(cachedimage, imagekey)
+
 	terms = [searchterm] + [t[0] for t in mostsimilartuples]
 
 	interrelationships = {t: vectorspace.wv.most_similar(t) for t in terms}
@@ -141,20 +155,43 @@ def graphnnmatches(searchterm, mostsimilartuples, vectorspace, searchobject):
 		relevantconnections[i] = [sim for sim in interrelationships[i] if sim[0] in terms]
 		# relevantconnections[i] = [s for s in interrelationships[i] if s[1] > hipparchia.config['VECTORDISTANCECUTOFFNEARESTNEIGHBOR']]
 
-	title = givetitletograph('Conceptual neighborhood of', searchterm, searchobject)
-
-	imagename = graphmatches(title, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype='nn')
+	imagename = graphmatches(title, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype='nn', imagekey=imagekey)
 
 	return imagename
 
 
-def graphmatches(graphtitle, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype):
+def vectorgraphkey(graphtitle, searchterm, searchobject, mostsimilartuples, vtype) -> str:
+	"""
+
+	the name under which VectorGraphCache() files a graph; None if graphs are not to be cached
+
+	the model is identified by what checkforstoredvector() looks for; the neighbors themselves are in there too and
+	so a rebuilt model with different neighbors will not be confused with the old one
+
+	:param graphtitle:
+	:param searchterm:
+	:param searchobject:
+	:param mostsimilartuples:
+	:param vtype:
+	:return:
+	"""
+
+	if not hipparchia.config['VECTORGRAPHCACHE']:
+		return None
+
+	vv = searchobject.vectorvalues
+	model = (getattr(searchobject, 'searchlistthumbprint', None), vv.getvectorvaluethumbprint(), searchobject.session['baggingmethod'])
+
+	return VectorGraphCache.keyfor(model, vtype, graphtitle, searchterm, list(mostsimilartuples), generatethefineprint(vtype, vv))
+
+
+def graphmatches(graphtitle, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype, imagekey=None):
 	# fnc = bokehgraphmatches
 	fnc = matplotgraphmatches
-	return fnc(graphtitle, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype)
+	return fnc(graphtitle, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype, imagekey)
 
 
-def matplotgraphmatches(graphtitle, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype):
+def matplotgraphmatches(graphtitle, searchterm, searchobject, mostsimilartuples, terms, relevantconnections, vtype, imagekey=None):
 	"""
 
 	mostsimilartuples come in a list and look like:
@@ -255,12 +292,12 @@ def matplotgraphmatches(graphtitle, searchterm, searchobject, mostsimilartuples,
 	# everybody from here on out want bytes and not '_io.BytesIO'
 	graphobject = graphobject.getvalue()
 
-	imagename = storevectorgraph(graphobject)
+	imagename = storevectorgraph(graphobject, imagekey)
 
 	return imagename
 
 
-def storevectorgraph(figureasbytes):
+def storevectorgraph(figureasbytes, imagekey=None):
 	"""
 
 	store a graph in the image table so that you can subsequently display it in the browser
@@ -270,10 +307,20 @@ def storevectorgraph(figureasbytes):
 	also note that we hand the data to the db and then immediatel grab it out of the db because of
 	constraints imposed by the way flask works
 
+	if the graph has a VectorGraphCache() key the cache remembers it; the cache only takes the place of the db if
+	there is a VECTORGRAPHCACHEDIRECTORY: the memory of this process is no use to another process that might be the
+	one that gets asked for the image
+
 	:param figureasbytes:
+	:param imagekey:
 	:return:
 	"""
 
+	if imagekey:
+		VectorGraphCache().store(imagekey, figureasbytes)
+		if hipparchia.config['VECTORGRAPHCACHEDIRECTORY']:
+			return imagekey
+
 	dbconnection = ConnectionObject(ctype='rw')
 	dbconnection.setautocommit()
 	cursor = dbconnection.cursor()
@@ -316,6 +363,10 @@ def fetchvectorgraph(imagename) -> bytes:
 	:return:
 	"""
 
+	cachedimage = VectorGraphCache().fetch(imagename)
+	if cachedimage:
+		return cachedimage
+
 	if hipparchia.config['RETAINFIGURES']:
 		deletewhendone = False
 	else:
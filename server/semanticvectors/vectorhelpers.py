@@ -15,15 +15,15 @@ import psycopg2
 
 from server import hipparchia
 from server.dbsupport.dblinefunctions import dblineintolineobject, grabonelinefromwork, worklinetemplate
-from server.dbsupport.lexicaldbfunctions import findcountsviawordcountstable, querytotalwordcounts
+from server.dbsupport.lexicaldbfunctions import bulkfindallwordcounts, querytotalwordcounts
 from server.dbsupport.miscdbfunctions import resultiterator
-from server.dbsupport.tablefunctions import assignuniquename
 from server.formatting.miscformatting import consolewarning
+from server.formatting.renderingpatterns import stripmarkup, vectorabbreviationfinder, vectorcleaningtable
 from server.formatting.wordformatting import acuteorgrav, basiclemmacleanup, elidedextrapunct, removegravity, tidyupterm
 from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.includelistobjects import executeincludelist, nameincludelist
 from server.hipparchiaobjects.progresspoll import ProgressPoll
 from server.hipparchiaobjects.searchobjects import SearchObject, SearchOutputObject
-from server.hipparchiaobjects.wordcountobjects import dbWordCountObject
 from server.hipparchiaobjects.worklineobject import dbWorkLine
 from server.searching.sqlsearching import precomposedsqlsearch
 from server.searching.miscsearchfunctions import buildbetweenwhereextension
@@ -99,6 +99,53 @@ vectorlabels = {
 }
 
 
+praenomina = {
+	'A.': 'Aulus',
+	'App.': 'Appius',
+	'C.': 'Caius',
+	'G.': 'Gaius',
+	'Cn.': 'Cnaius',
+	'Gn.': 'Gnaius',
+	'D.': 'Decimus',
+	'L.': 'Lucius',
+	'M.': 'Marcus',
+	'M.’': 'Manius',
+	'N.': 'Numerius',
+	'P.': 'Publius',
+	'Q.': 'Quintus',
+	'S.': 'Spurius',
+	'Sp.': 'Spurius',
+	'Ser.': 'Servius',
+	'Sex.': 'Sextus',
+	'T.': 'Titus',
+	'Ti.': 'Tiberius',
+	'V.': 'Vibius'
+}
+
+datestrings = {
+	'a.': 'ante',
+	'd.': 'dies',
+	'Id.': 'Idibus',
+	'Kal.': 'Kalendas',
+	'Non.': 'Nonas',
+	'prid.': 'pridie',
+	'Ian.': 'Ianuarias',
+	'Feb.': 'Februarias',
+	'Mart.': 'Martias',
+	'Apr.': 'Aprilis',
+	'Mai.': 'Maias',
+	'Iun.': 'Iunias',
+	'Quint.': 'Quintilis',
+	'Sext.': 'Sextilis',
+	'Sept.': 'Septembris',
+	'Oct.': 'Octobris',
+	'Nov.': 'Novembris',
+	'Dec.': 'Decembris'
+}
+
+vectorabbreviations = {**praenomina, **datestrings}
+
+
 def cleanvectortext(texttostrip):
 	"""
 
@@ -120,62 +167,15 @@ def cleanvectortext(texttostrip):
 	#
 	# Note that the case of the substitute is off; but all we really care about is getting the headword right
 
-	praenomina = {
-		'A.': 'Aulus',
-		'App.': 'Appius',
-		'C.': 'Caius',
-		'G.': 'Gaius',
-		'Cn.': 'Cnaius',
-		'Gn.': 'Gnaius',
-		'D.': 'Decimus',
-		'L.': 'Lucius',
-		'M.': 'Marcus',
-		'M.’': 'Manius',
-		'N.': 'Numerius',
-		'P.': 'Publius',
-		'Q.': 'Quintus',
-		'S.': 'Spurius',
-		'Sp.': 'Spurius',
-		'Ser.': 'Servius',
-		'Sex.': 'Sextus',
-		'T.': 'Titus',
-		'Ti.': 'Tiberius',
-		'V.': 'Vibius'
-	}
-
-	datestrings = {
-		'a.': 'ante',
-		'd.': 'dies',
-		'Id.': 'Idibus',
-		'Kal.': 'Kalendas',
-		'Non.': 'Nonas',
-		'prid.': 'pridie',
-		'Ian.': 'Ianuarias',
-		'Feb.': 'Februarias',
-		'Mart.': 'Martias',
-		'Apr.': 'Aprilis',
-		'Mai.': 'Maias',
-		'Iun.': 'Iunias',
-		'Quint.': 'Quintilis',
-		'Sext.': 'Sextilis',
-		'Sept.': 'Septembris',
-		'Oct.': 'Octobris',
-		'Nov.': 'Novembris',
-		'Dec.': 'Decembris'
-	}
-
-	searchdict = {**praenomina, **datestrings}
-
-	htmlstrip = re.compile(r'<.*?>')
-	wholetext = re.sub(htmlstrip, str(), texttostrip)
-	wholetext = re.sub('&nbsp;', str(), wholetext)
-	wholetext = re.sub(r'\w+\.', lambda x: replaceabbreviations(x.group(0), searchdict), wholetext)
+	# the dictionaries and patterns are built once at import time and not once per call
+
+	wholetext = stripmarkup(texttostrip)
+	wholetext = wholetext.replace('&nbsp;', str())
+	wholetext = re.sub(vectorabbreviationfinder, lambda x: replaceabbreviations(x.group(0), vectorabbreviations), wholetext)
 	# speakers in plays? need to think about catching:  'XY. (says something) AB. (replies)'
 
-	invals = "vjσς"
-	outvals = "uiϲϲ"
 	text = wholetext.lower()
-	wholetext = text.translate(str.maketrans(invals, outvals))
+	wholetext = text.translate(vectorcleaningtable)
 
 	return wholetext
 
@@ -242,9 +242,9 @@ def findsentences(authortable: str, so: SearchObject, dbcursor: ConnectionObject
 	if r['type'] == 'temptable':
 		# make the table
 		q = r['where']['tempquery']
-		avoidcollisions = assignuniquename()
+		avoidcollisions, q = nameincludelist(q)
 		q = re.sub('_includelist', '_includelist_{a}'.format(a=avoidcollisions), q)
-		dbcursor.execute(q)
+		executeincludelist(q, dbcursor)
 		# now you can work with it
 		wtempate = """
 		EXISTS
@@ -886,8 +886,9 @@ def relativehomonymnweight(worda, wordb, morphdict) -> float:
 	auniqueforms = morphdict[worda] - morphdict[wordb]
 	buniqueforms = morphdict[wordb] - morphdict[worda]
 
-	auniquecounts = [dbWordCountObject(*findcountsviawordcountstable(wd)) for wd in auniqueforms]
-	buniquecounts = [dbWordCountObject(*findcountsviawordcountstable(wd)) for wd in buniqueforms]
+	uniquecounts = bulkfindallwordcounts(list(auniqueforms | buniqueforms))
+	auniquecounts = [uniquecounts[f] for f in auniqueforms if f in uniquecounts]
+	buniquecounts = [uniquecounts[f] for f in buniqueforms if f in uniquecounts]
 
 	aunique = sum([x.t for x in auniquecounts])
 	bunique = sum([x.t for x in buniquecounts])
@@ -27,10 +27,12 @@ from server.searching.sqlsearching import basicprecomposedsqlsearcher
 from server.searching.precomposesql import searchlistintosqldict
 from server.semanticvectors.gensimnearestneighbors import generatenearestneighbordata
 from server.semanticvectors.modelbuilders import buildgensimmodel, buildsklearnselectedworks, \
-    gensimgenerateanalogies
+    extendstoredgensimmodel, gensimgenerateanalogies
+from server.semanticvectors.streamingcorpus import streamandbagthewords
 from server.semanticvectors.vectorhelpers import mostcommonwordsviaheadwords, removestopwords, cleanvectortext, \
     recursivesplit, convertmophdicttodict, emptyvectoroutput
 from server.startup import listmapper, workdict
+from server.threading.vectorbotscheduler import VectorDemandLedger
 from server.textsandindices.textandindiceshelperfunctions import getrequiredmorphobjects
 
 try:
@@ -115,7 +117,12 @@ def pythonvectors(so: SearchObject) -> JSON_STR:
     so.poll.allworkis(-1)  # this turns off the % completed notice in the JS
     so.poll.sethits(0)
 
+    if hipparchia.config['AUTOVECTORIZE'] and not so.iamarobot and so.session['baggingmethod'] == hipparchia.config['DEFAULTBAGGINGMETHOD']:
+        # tell the vectorbot what people are interested in: it builds with the default bagging method
+        VectorDemandLedger().record(so.searchlist)
+
     themodel = checkforstoredvector(so)
+    modelwasstored = bool(themodel)
 
     if not themodel:
         # [1] generate a searchlist: use executesearch() as the template
@@ -126,6 +133,20 @@ def pythonvectors(so: SearchObject) -> JSON_STR:
         # [2] do a searchlistintosqldict() [this is killing lda...]
         so.searchsqldict = searchlistintosqldict(so, str(), vectors=True)
 
+        if so.vectorquerytype in ['nearestneighborsquery', 'analogies'] and hipparchia.config['VECTORINCREMENTALTRAINING']:
+            # maybe a model for a slightly smaller selection can be trained a little further
+            themodel = extendstoredgensimmodel(so, acquireandbagthewords)
+
+    if not themodel and so.vectorquerytype in ['nearestneighborsquery', 'analogies'] and hipparchia.config['VECTORSTREAMINGCORPUS']:
+        # Word2Vec() is happy with any re-iterable corpus: nothing like the whole text ever has to be in memory
+        bagsofwords = streamandbagthewords(so)
+        so.poll.statusis('Building the model')
+        try:
+            # the same gensim model can serve both analogies and neighbors
+            themodel = buildgensimmodel(so, bagsofwords)
+        finally:
+            bagsofwords.cleanup()
+    elif not themodel:
         bagsofwords = acquireandbagthewords(so)
 
         # [4] hand the bags over to Word2Vec(), etc.
@@ -142,7 +163,7 @@ def pythonvectors(so: SearchObject) -> JSON_STR:
             themodel = buildsklearnselectedworks(so, bagsofsentences)
         else:
             pass
-    elif so.iamarobot:
+    elif so.iamarobot and modelwasstored:
         # there is a model and the bot is attempting to build something that has already been build
         return '<!-- MODEL EXISTS -->'
 
@@ -19,9 +19,10 @@ from server.dbsupport.bulkdboperations import loadallauthorsasobjects, loadallwo
 	loadallworksintoallauthors, loadlemmataasobjects
 from server.dbsupport.miscdbfunctions import probefordatabases
 from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.wordcountstoreobjects import WordCountStore
 from server.listsandsession.genericlistfunctions import dictitemstartswith, findspecificdate
 from server.listsandsession.sessiondicts import buildaugenresdict, buildauthorlocationdict, buildkeyedlemmata, \
-	buildworkgenresdict, buildworkprovenancedict
+	buildworkgenresdict, buildworkprovenancedict, buildworksortkeys
 from server.threading.mpthreadcount import setthreadcount
 from server.versioning import fetchhipparchiaserverversion, readgitdata
 
@@ -115,12 +116,20 @@ if current_process().name == 'MainProcess':
 	# lemmatadict too long to be used by the hinter: need quicker access; so partition it up into keyedlemmata
 	keyedlemmata = buildkeyedlemmata(list(lemmatadict.keys()))
 
+	if hipparchia.config['WORDCOUNTSINMEMORY']:
+		print('loading wordcounts', end='')
+		launchtime = time.time()
+		WordCountStore().load()
+		elapsed = round(time.time() - launchtime, 1)
+		secho(' ({n} forms; {e}s)'.format(n=WordCountStore().size(), e=elapsed), fg='red')
+
 	print('building core dictionaries', end='')
 	launchtime = time.time()
 	authorgenresdict = buildaugenresdict(authordict)
 	authorlocationdict = buildauthorlocationdict(authordict)
 	workgenresdict = buildworkgenresdict(workdict)
 	workprovenancedict = buildworkprovenancedict(workdict)
+	worksortkeys = buildworksortkeys(authordict, workdict)
 	elapsed = round(time.time() - launchtime, 1)
 	secho(' ({e}s)'.format(e=elapsed), fg='red')
 
@@ -187,6 +196,7 @@ else:
 	authorlocationdict = dict()
 	workgenresdict = dict()
 	workprovenancedict = dict()
+	worksortkeys = dict()
 	lemmatadict = dict()
 	listmapper = dict()
 	allincerta = dict()
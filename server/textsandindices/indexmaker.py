@@ -15,8 +15,11 @@ from flask import session
 from server import hipparchia
 from server.dbsupport.dblinefunctions import grabbundlesoflines, makeablankline
 from server.dbsupport.lexicaldbfunctions import findentrybyid
+from server.formatting.collationkeys import polytoniccollationkey
+from server.hipparchiaobjects.concordanceobjects import ConcordanceStore, WorkConcordance
 from server.hipparchiaobjects.worklineobject import dbWorkLine
 from server.listsandsession.genericlistfunctions import polytonicsort
+from server.startup import workdict
 from server.textsandindices.textandindiceshelperfunctions import dictmerger, getrequiredmorphobjects
 from server.threading.mpthreadcount import setthreadcount
 
@@ -60,16 +63,20 @@ def buildindextowork(cdict: dict, activepoll, headwords: bool, cursor) -> List[t
 
 	activepoll.allworkis(-1)
 
-	lineobjects = grabbundlesoflines(cdict, cursor)
-
-	activepoll.statusis('Compiling the index')
-	if activepoll.polltype == 'RedisProgressPoll':
-		activepoll.allworkis(len(lineobjects))
-		activepoll.remain(len(lineobjects))
+	if hipparchia.config['CONCORDANCECACHE']:
+		activepoll.statusis('Compiling the index')
+		completeindexdict = cachedindexmaker(cdict, activepoll, cursor)
 	else:
-		activepoll.allworkis(-1)
-		activepoll.setnotes('(progress information unavailable)')
-	completeindexdict = pooledindexmaker(lineobjects)
+		lineobjects = grabbundlesoflines(cdict, cursor)
+
+		activepoll.statusis('Compiling the index')
+		if activepoll.polltype == 'RedisProgressPoll':
+			activepoll.allworkis(len(lineobjects))
+			activepoll.remain(len(lineobjects))
+		else:
+			activepoll.allworkis(-1)
+			activepoll.setnotes('(progress information unavailable)')
+		completeindexdict = pooledindexmaker(lineobjects)
 
 	# completeindexdict: { wordA: [(workid1, index1, locus1), (workid2, index2, locus2),...], wordB: [(...)]}
 	# {'illic': [('lt0472w001', 2048, '68A.35')], 'carpitur': [('lt0472w001', 2048, '68A.35')], ...}
@@ -98,10 +105,7 @@ def generatesortedoutputbyword(completeindexdict: dict, onework: bool, alphabeti
 
 	unsortedoutput = htmlifysimpleindex(completeindexdict, onework)
 	if alphabetical:
-		sortkeys = [x[0] for x in unsortedoutput]
-		outputdict = {x[0]: x for x in unsortedoutput}
-		sortkeys = polytonicsort(sortkeys)
-		sortedoutput = [outputdict[x] for x in sortkeys]
+		sortedoutput = sorted([x for x in unsortedoutput if x[0]], key=lambda x: polytoniccollationkey(x[0]))
 	else:
 		sortedoutput = sorted(unsortedoutput, key=lambda x: int(x[1]), reverse=True)
 	# pad position 0 with a fake, unused headword so that these tuples have the same shape as the ones in the other branch of the condition
@@ -442,3 +446,106 @@ def pooledindexmaker(lineobjects: List[dbWorkLine]) -> dict:
 		masterdict = dictmerger(masterdict, tomerge)
 
 	return masterdict
+
+
+def cachedindexmaker(cdict: dict, activepoll, cursor) -> dict:
+	"""
+
+	pooledindexmaker() via the ConcordanceStore: each work is indexed (in full) only once; after that any segment
+	of it is just a matter of filtering the stored postings
+
+	the output is the same masterdict that pooledindexmaker() would have built
+
+	:param cdict:
+	:param activepoll:
+	:param cursor:
+	:return:
+	"""
+
+	store = ConcordanceStore()
+
+	totallines = sum([cdict[w][1] - cdict[w][0] + 1 for w in cdict])
+	# see the note on CLICKABLEINDEXEDPASSAGECAP in linesintoindex()
+	cap = hipparchia.config['CLICKABLEINDEXEDPASSAGECAP']
+	anchored = totallines < cap or cap < 0 or session['indexskipsknownwords']
+
+	masterdict = dict()
+	for workid in cdict:
+		try:
+			starts = workdict[workid].starts
+			ends = workdict[workid].ends
+		except KeyError:
+			starts, ends = cdict[workid]
+
+		concordance = store.fetch(workid, starts, ends)
+		if not concordance:
+			activepoll.setnotes('indexing {w} (this only needs to happen once)'.format(w=workid))
+			lineobjects = grabbundlesoflines({workid: (starts, ends)}, cursor)
+			concordance = buildworkconcordance(workid, starts, ends, lineobjects)
+			store.store(concordance)
+
+		firstline, lastline = cdict[workid]
+		masterdict = dictmerger(masterdict, concordance.indexentries(firstline, lastline, anchored))
+
+	activepoll.setnotes('')
+
+	return masterdict
+
+
+def buildworkconcordance(workid: str, starts: int, ends: int, lineobjects: List[dbWorkLine]) -> WorkConcordance:
+	"""
+
+	index every line of a work: unlike linesintoindex() we keep the postings and the loci apart so that the
+	result can be filtered and formatted later in whatever way the request needs
+
+	the lines are split up and sent to a Pool() just like pooledindexmaker() does it
+
+	:param workid:
+	:param starts:
+	:param ends:
+	:param lineobjects:
+	:return:
+	"""
+
+	workers = setthreadcount()
+
+	if len(lineobjects) > 100 * workers:
+		chunksize = int(len(lineobjects) / workers) + 1
+		chunklines = [lineobjects[i:i + chunksize] for i in range(0, len(lineobjects), chunksize)]
+		with Pool(processes=int(workers)) as pool:
+			chunkresults = pool.map(linesintopostings, chunklines)
+	else:
+		chunkresults = [linesintopostings(lineobjects)]
+
+	postings = dict()
+	loci = dict()
+	for p, l in chunkresults:
+		postings = dictmerger(postings, p)
+		loci.update(l)
+
+	return WorkConcordance(workid, starts, ends, postings, loci)
+
+
+def linesintopostings(lineobjects: List[dbWorkLine]) -> tuple:
+	"""
+
+	({word: [index1, index2, ...]}, {index: locus})
+
+	:param lineobjects:
+	:return:
+	"""
+
+	postings = dict()
+	loci = dict()
+
+	for line in lineobjects:
+		if not line.index:
+			continue
+		loci[line.index] = line.locus()
+		for w in line.indexablewordlist():
+			try:
+				postings[w].append(line.index)
+			except KeyError:
+				postings[w] = [line.index]
+
+	return postings, loci
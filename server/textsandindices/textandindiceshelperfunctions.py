@@ -15,7 +15,7 @@ from typing import List
 from server import hipparchia
 from server.dbsupport.citationfunctions import finddblinefromincompletelocus
 from server.dbsupport.dblinefunctions import dblineintolineobject, grabonelinefromwork
-from server.dbsupport.lexicaldbfunctions import lookformorphologymatches
+from server.dbsupport.lexicaldbfunctions import bulkfindmorphologymatches, lookformorphologymatches
 from server.dbsupport.miscdbfunctions import icanpickleconnections
 from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.hipparchiaobjects.worklineobject import dbWorkLine
@@ -212,11 +212,20 @@ def getrequiredmorphobjects(setofterms: set, furtherdeabbreviate=False) -> dict:
 
 	find the morphobjects associated with them
 
+	most terms are found just as they are: bulkfindmorphologymatches() gets all of those in one query per language;
+	only the leftovers need the workers and the retries inside of lookformorphologymatches()
+
 	:param terms:
 	:return:
 	"""
 
-	workers = setthreadcount()
+	found = bulkfindmorphologymatches(setofterms)
+	leftovers = [t for t in setofterms if t not in found]
+
+	if not leftovers:
+		return found
+
+	workers = min(setthreadcount(), len(leftovers))
 
 	if icanpickleconnections():
 		oneconnectionperworker = {i: ConnectionObject() for i in range(workers)}
@@ -225,10 +234,10 @@ def getrequiredmorphobjects(setofterms: set, furtherdeabbreviate=False) -> dict:
 
 	if platform.system() == 'Windows':
 		# windows hates multiprocessing; but in practice windows should never be coming here: HipparchiaGoDBHelper...
-		return mpmorphology(list(setofterms), furtherdeabbreviate, dict(), oneconnectionperworker[0])
+		return {**mpmorphology(leftovers, furtherdeabbreviate, dict(), oneconnectionperworker[0]), **found}
 
 	manager = Manager()
-	terms = manager.list(list(setofterms))
+	terms = manager.list(leftovers)
 	morphobjects = manager.dict()
 
 	jobs = [Process(target=mpmorphology, args=(terms, furtherdeabbreviate, morphobjects, oneconnectionperworker[i]))
@@ -242,7 +251,7 @@ def getrequiredmorphobjects(setofterms: set, furtherdeabbreviate=False) -> dict:
 		for c in oneconnectionperworker:
 			oneconnectionperworker[c].connectioncleanup()
 
-	return morphobjects
+	return {**dict(morphobjects), **found}
 
 
 def mpmorphology(terms: list, furtherdeabbreviate: bool, dictofmorphobjects, dbconnection: ConnectionObject) -> dict:
@@ -297,11 +306,24 @@ def paragraphformatting(listoflines: List[dbWorkLine]) -> List[dbWorkLine]:
 	:return:
 	"""
 
+	listoflines, memory = continueparagraphformatting(listoflines)
+	return listoflines
+
+
+def continueparagraphformatting(listoflines: List[dbWorkLine], memory=str()) -> tuple:
+	"""
+
+	paragraphformatting() for a text that arrives in pieces: hand the memory that one piece returns
+	to the call for the next piece and a span that is open at the end of one piece stays open in the next
+
+	:param listoflines:
+	:param memory:
+	:return:
+	"""
+
 	spanopenfinder = re.compile(r'<span class="(.*?)">')
 	spanclosefinder = re.compile(r'</span>')
 
-	memory = str()
-
 	# it is possible that this will not yield balanced HTML: the original data is unbalanced
 	# e.g. <span class="normal"> furenti similis. <hmu_serviusformatting>sane quidam volunt, Vergilium</span></hmu_serviusformatting>
 	# this gets 'fixed' by hmurewrite() which yields '</span></span>' instead
@@ -334,7 +356,7 @@ def paragraphformatting(listoflines: List[dbWorkLine]) -> List[dbWorkLine]:
 			line.markedup = '{ln}</span>'.format(ln=line.markedup)
 			memory = paragraphtag
 		line.generatehtmlversion()
-	return listoflines
+	return listoflines, memory
 
 
 def spanopenedbutnotclosed(linehtml, openfinder, closefinder) -> str:
@@ -7,14 +7,18 @@
 """
 
 import re
+from typing import Generator, Iterable
 
+import psycopg2
 from flask import session
 
+from server import hipparchia
 from server.browsing.browserfunctions import checkfordocumentmetadata
 from server.dbsupport.dblinefunctions import dblineintolineobject, worklinetemplate
+from server.hipparchiaobjects.connectionobject import ConnectionObject
 from server.listsandsession.sessionfunctions import findactivebrackethighlighting
 from server.startup import workdict
-from server.textsandindices.textandindiceshelperfunctions import paragraphformatting, setcontinuationvalue
+from server.textsandindices.textandindiceshelperfunctions import continueparagraphformatting, setcontinuationvalue
 
 
 def buildtext(work: str, firstline: int, lastline: int, linesevery: int, cursor) -> str:
@@ -29,8 +33,6 @@ def buildtext(work: str, firstline: int, lastline: int, linesevery: int, cursor)
 	:return:
 	"""
 
-	workobject = workdict[work]
-
 	auid = work[0:6]
 
 	qtemplate = """
@@ -43,6 +45,93 @@ def buildtext(work: str, firstline: int, lastline: int, linesevery: int, cursor)
 	results = cursor.fetchall()
 
 	output = ['<table>\n']
+	output.extend(generatetextlines(work, [results], linesevery))
+	output.append('</table>\n')
+
+	html = '\n'.join(output)
+
+	return html
+
+
+def streamtext(work: str, firstline: int, lastline: int, linesevery: int, plaintext=False) -> Generator[str, None, None]:
+	"""
+
+	buildtext() for an export: the whole of Galen does not need to sit in memory as rows, line objects,
+	html, and then json all at once
+
+	a server-side cursor hands over TEXTEXPORTCHUNKSIZE rows at a time and the output goes out as soon as each
+	chunk has been formatted; the bracket and paragraph state is carried from one chunk into the next
+
+	the cursor lives inside of one read-only transaction that is rolled back at the end: a cursor declared 'WITH HOLD'
+	[which is what autocommit would require] gets materialized in full by postgres before the first row comes back
+
+	NB: the connection [a pooled one, if that is what you use] is held for the whole of the download; a slow client
+	on a big work keeps it checked out for that long
+
+	:param work:
+	:param firstline:
+	:param lastline:
+	:param linesevery:
+	:param plaintext:
+	:return:
+	"""
+
+	chunksize = max(hipparchia.config['TEXTEXPORTCHUNKSIZE'], 1)
+
+	qtemplate = """
+	SELECT {wltmp} FROM {a} WHERE (index >= %s and index <= %s) ORDER BY index ASC
+	"""
+
+	query = qtemplate.format(wltmp=worklinetemplate, a=work[0:6])
+	data = (firstline, lastline)
+
+	dbconnection = ConnectionObject()
+	dbconnection.dbconnection.autocommit = False
+	streamer = dbconnection.dbconnection.cursor(name='textexport_{w}'.format(w=work))
+
+	def chunks() -> Generator[list, None, None]:
+		while True:
+			rows = streamer.fetchmany(chunksize)
+			if not rows:
+				return
+			yield rows
+
+	try:
+		streamer.execute(query, data)
+		if not plaintext:
+			yield '<table>\n'
+		for piece in generatetextlines(work, chunks(), linesevery, plaintext=plaintext):
+			yield piece + '\n'
+		if not plaintext:
+			yield '</table>\n'
+	finally:
+		try:
+			streamer.close()
+			dbconnection.dbconnection.rollback()
+		except psycopg2.Error:
+			# the connection died underneath us: connectioncleanup() will notice
+			pass
+		dbconnection.connectioncleanup()
+
+
+def generatetextlines(work: str, chunksofrows: Iterable[list], linesevery: int, plaintext=False) -> Generator[str, None, None]:
+	"""
+
+	turn db rows into the lines of buildtext() one chunk of rows at a time
+
+	everything that looks back at the previous line (bracket continuations, paragraph formatting, line numbering)
+	lives in here and so survives the boundaries between chunks
+
+	plaintext yields 'locus<tab>text' instead of html
+
+	:param work:
+	:param chunksofrows:
+	:param linesevery:
+	:param plaintext:
+	:return:
+	"""
+
+	workobject = workdict[work]
 
 	# consecutive lines can get numbered twice
 	# 660	       ἤν τιϲ ὀφείλων ἐξαρνῆται. Πρ. πόθεν οὖν ἐδάνειϲ’ ὁ
@@ -98,23 +187,30 @@ def buildtext(work: str, firstline: int, lastline: int, linesevery: int, cursor)
 			'curly': {'c': re.compile(r'\}')},
 	}
 
-	if results:
-		previousline = dblineintolineobject(results[0])
-		brackettypes = findactivebrackethighlighting()
-		editorialcontinuation = {'square': False, 'round': False, 'curly': False, 'angled': False}
+	brackettypes = findactivebrackethighlighting()
+	editorialcontinuation = {'square': False, 'round': False, 'curly': False, 'angled': False}
+	previousline = None
+	paragraphmemory = str()
+
+	for results in chunksofrows:
+		if not results:
+			continue
+
+		if not previousline:
+			previousline = dblineintolineobject(results[0])
 
 		lines = [dblineintolineobject(line) for line in results]
-		lines = paragraphformatting(lines)  # polish up the HTML of the lines
+		lines, paragraphmemory = continueparagraphformatting(lines, paragraphmemory)  # polish up the HTML of the lines
 		for thisline in lines:
 			if workobject.isnotliterary() and thisline.index == workobject.starts:
 				# line.index == workobject.starts added as a check because
 				# otherwise you will re-see date info in the middle of some documents
 				# it gets reasserted with a CD block reinitialization
 				metadata = checkfordocumentmetadata(thisline, workobject)
-				if metadata:
-					output.append(metadata)
+				if metadata and not plaintext:
+					yield metadata
 
-			if brackettypes:
+			if brackettypes and not plaintext:
 				columnb = thisline.markeditorialinsersions(editorialcontinuation, bracketfinder=bracketfinder)
 				editorialcontinuation = {t: setcontinuationvalue(thisline, previousline, editorialcontinuation[t], t, openfinder=openfinder, closefinder=closefinder)
 				                         for t in brackettypes}
@@ -136,22 +232,21 @@ def buildtext(work: str, firstline: int, lastline: int, linesevery: int, cursor)
 			else:
 				avoiddoubletap = False
 
+			if plaintext:
+				yield '{ca}\t{cb}'.format(ca=columna, cb=thisline.unformattedline())
+				previousline = thisline
+				continue
+
 			notes = '; '.join(thisline.insetannotations())
 
 			if columna and session['simpletextoutput']:
 				columna = '({a})'.format(a=columna)
 
 			linehtml = linetemplate.format(ca=columna, cb=columnb, cc=notes)
-	
-			output.append(linehtml)
 
-			previousline = thisline
-	
-	output.append('</table>\n')
-
-	html = '\n'.join(output)
+			yield linehtml
 
-	return html
+			previousline = thisline
 
 
 def determinelinetemplate(shownotes=True) -> str:
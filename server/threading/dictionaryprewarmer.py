@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import threading
+import time
+
+import psycopg2
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.lexicalobjects import dbGreekWord, dbLatinWord
+from server.hipparchiaobjects.renderedentryobjects import RenderedEntryCache
+from server.threading.vectorbotscheduler import searchesareactive
+
+
+def prewarmrenderedentries():
+	"""
+
+	walk through both dictionaries and render every entry that is not yet in DICTIONARYENTRYCACHEDIRECTORY
+
+	this only makes sense with a cache directory: the memory cache could not hold a whole dictionary anyway and the
+	entries go straight to disk without pushing the recently used ones out of memory
+
+	the job steps aside while anybody is searching; restart the server and it picks up where it left off since
+	whatever is already on disk gets skipped
+
+	:return:
+	"""
+
+	if not hipparchia.config['DICTIONARYENTRYCACHE'] or not hipparchia.config['DICTIONARYENTRYCACHEDIRECTORY']:
+		consolewarning('DICTIONARYENTRYPREWARM needs DICTIONARYENTRYCACHE and DICTIONARYENTRYCACHEDIRECTORY', color='red')
+		return
+
+	batchsize = 250
+	cache = RenderedEntryCache()
+	qtemplate = """
+	SELECT entry_name, metrical_entry, id_number, pos, translations, entry_body, {ec}
+		FROM {d}_dictionary WHERE id_number > %s ORDER BY id_number ASC LIMIT {b}
+	"""
+
+	dictionaries = [('greek', 'unaccented_entry', dbGreekWord), ('latin', 'entry_key', dbLatinWord)]
+
+	starttime = time.time()
+	rendered = 0
+	for usedictionary, extracolumn, objecttemplate in dictionaries:
+		q = qtemplate.format(ec=extracolumn, d=usedictionary, b=batchsize)
+		lastid = -1
+		while True:
+			while searchesareactive():
+				time.sleep(1)
+
+			dbconnection = ConnectionObject()
+			dbcursor = dbconnection.cursor()
+			try:
+				dbcursor.execute(q, (lastid,))
+				found = dbcursor.fetchall()
+			except psycopg2.Error as e:
+				consolewarning('prewarmrenderedentries() could not read {d}_dictionary: {e}'.format(d=usedictionary, e=e), color='red')
+				found = list()
+			dbconnection.connectioncleanup()
+
+			if not found:
+				break
+
+			lastid = found[-1][2]
+			for f in found:
+				wordobject = objecttemplate(*f)
+				if cache.isondisk(wordobject):
+					continue
+				cache.store(wordobject, wordobject.renderentry(), keepinmemory=False)
+				rendered += 1
+
+	consolewarning('prewarmrenderedentries() rendered {n} dictionary entries in {t}s'.format(n=rendered, t=round(time.time() - starttime, 1)))
+	return
+
+
+dictionaryprewarmer = threading.Thread(target=prewarmrenderedentries, name='dictionaryprewarmer', args=tuple(), daemon=True)
+dictionaryprewarmer.start()
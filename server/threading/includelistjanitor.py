@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import threading
+import time
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+from server.hipparchiaobjects.includelistobjects import purgestaleincludelists
+
+
+def sweepincludelists():
+	"""
+
+	every so often drop the shared include-lists that have outlived INCLUDELISTCACHETTL
+
+	:return:
+	"""
+
+	ttl = hipparchia.config['INCLUDELISTCACHETTL']
+	interval = max(int(ttl / 4), 60)
+
+	while True:
+		dropped = purgestaleincludelists(ttl)
+		if dropped:
+			consolewarning('sweepincludelists() dropped {n} stale include-lists'.format(n=dropped))
+		time.sleep(interval)
+
+
+includelistjanitor = threading.Thread(target=sweepincludelists, name='includelistjanitor', args=tuple(), daemon=True)
+includelistjanitor.start()
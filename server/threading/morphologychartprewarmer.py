@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import re
+import threading
+import time
+
+import psycopg2
+
+from server import hipparchia
+from server.formatting.miscformatting import consolewarning
+from server.formatting.wordformatting import depunct
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.hipparchiaobjects.morphologychartobjects import MorphologyChartCache, buildmorphologychart
+from server.startup import lemmatadict
+from server.threading.vectorbotscheduler import searchesareactive
+
+
+def prewarmmorphologycharts():
+	"""
+
+	build the morphology charts of the MORPHOLOGYCHARTPREWARM most common headwords with the default session settings
+
+	the charts go into the MorphologyChartCache: so there is no point in building more of them than it can hold
+
+	the job steps aside while anybody is searching
+
+	:return:
+	"""
+
+	howmany = min(hipparchia.config['MORPHOLOGYCHARTPREWARM'], hipparchia.config['MORPHOLOGYCHARTCACHESIZE'])
+
+	dbconnection = ConnectionObject()
+	dbcursor = dbconnection.cursor()
+	q = 'SELECT entry_name FROM dictionary_headword_wordcounts ORDER BY total_count DESC LIMIT %s'
+	try:
+		dbcursor.execute(q, (howmany,))
+		headwords = [h[0] for h in dbcursor.fetchall()]
+	except psycopg2.Error as e:
+		consolewarning('prewarmmorphologycharts() could not read the headword counts: {e}'.format(e=e), color='red')
+		headwords = list()
+	dbconnection.connectioncleanup()
+
+	settings = MorphologyChartCache.defaultsettings()
+
+	starttime = time.time()
+	built = 0
+	for h in headwords:
+		while searchesareactive():
+			time.sleep(1)
+
+		if h not in lemmatadict:
+			continue
+
+		# the same clean-up that knownforms() gives its input
+		headword = re.sub(r'[σς]', 'ϲ', depunct(h))
+		language = 'latin' if re.search(r'[a-z]', headword) else 'greek'
+		xrefid = str(lemmatadict[h].xref)
+
+		try:
+			buildmorphologychart(headword, xrefid, language, str(), settings)
+			built += 1
+		except Exception as e:
+			consolewarning('prewarmmorphologycharts() failed for {h}: {e}'.format(h=h, e=e))
+
+	consolewarning('prewarmmorphologycharts() built {n} morphology charts in {t}s'.format(n=built, t=round(time.time() - starttime, 1)))
+	return
+
+
+morphologychartprewarmer = threading.Thread(target=prewarmmorphologycharts, name='morphologychartprewarmer', args=tuple(), daemon=True)
+morphologychartprewarmer.start()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+	HipparchiaServer: an interface to a database of Greek and Latin texts
+	Copyright: E Gunderson 2016-22
+	License: GNU GENERAL PUBLIC LICENSE 3
+		(see LICENSE in the top level directory of the distribution)
+"""
+
+import heapq
+import os
+import threading
+import time
+from typing import List
+
+import psycopg2
+
+from server import hipparchia
+from server.hipparchiaobjects.connectionobject import ConnectionObject
+from server.startup import authordict, progresspolldict, workdict
+from server.threading.mpthreadcount import setthreadcount
+
+
+class VectorDemandLedger(object):
+	"""
+
+	a borg that remembers which selections people have actually asked to vectorize
+
+	every request adds 1 to the score of its selection; the scores decay with a half-life of
+	VECTORBOTDEMANDHALFLIFE seconds so that last week's enthusiasm does not crowd out today's
+
+		_selections: {('lt0474w011', 'lt0474w012'): [score, lastupdate], ...}
+
+	"""
+
+	_lock = threading.Lock()
+	_selections = dict()
+	_version = 0
+
+	@staticmethod
+	def _decayed(score: float, lastupdate: float, now: float) -> float:
+		halflife = max(hipparchia.config['VECTORBOTDEMANDHALFLIFE'], 1)
+		return score * 0.5 ** ((now - lastupdate) / halflife)
+
+	def record(self, searchlist: List[str]):
+		key = tuple(sorted(searchlist))
+		now = time.time()
+		with VectorDemandLedger._lock:
+			try:
+				score, lastupdate = VectorDemandLedger._selections[key]
+			except KeyError:
+				score, lastupdate = 0.0, now
+			VectorDemandLedger._selections[key] = [self._decayed(score, lastupdate, now) + 1, now]
+			VectorDemandLedger._version += 1
+			limit = hipparchia.config['VECTORBOTDEMANDMEMORY']
+			if len(VectorDemandLedger._selections) > limit:
+				ranked = sorted(VectorDemandLedger._selections, key=lambda k: self._decayed(*VectorDemandLedger._selections[k], now))
+				for k in ranked[:len(ranked) - limit]:
+					del VectorDemandLedger._selections[k]
+
+	def version(self) -> int:
+		return VectorDemandLedger._version
+
+	def scores(self) -> dict:
+		now = time.time()
+		with VectorDemandLedger._lock:
+			return {k: self._decayed(*VectorDemandLedger._selections[k], now) for k in VectorDemandLedger._selections}
+
+
+class VectorWorkQueue(object):
+	"""
+
+	a priority queue of selections for the vectorbot
+
+	the old bot just worked from the biggest author down to the smallest; that order survives as a tiebreaker, but
+	anything that people have been asking about jumps the line:
+
+		[a] a selection that was requested is queued as is (if its model is still current the bot learns that fast)
+		[b] an author gets the demand for every selection that touched one of its works
+		[c] a multi-author item (e.g., a whole corpus) gets the mean demand of its authors
+
+	the heap is rebuilt whenever the ledger has heard of a new request
+
+	"""
+
+	def __init__(self, workpile: List[tuple]):
+		self.ledger = VectorDemandLedger()
+		self.lock = threading.Lock()
+		# {('gr2062',): (['gr2062'], 4182615), ...}
+		self.pending = dict()
+		self.finished = set()
+		self.heap = list()
+		self.builtfromversion = None
+		self.stopped = False
+		# bigger first, as before
+		for n, item in enumerate(sorted(workpile, key=lambda x: x[1])):
+			self.pending[tuple(sorted(item[0]))] = (item[0], item[1], n / max(len(workpile), 1))
+
+	@staticmethod
+	def selectionwordcount(searchlist: List[str]) -> int:
+		count = 0
+		for item in searchlist:
+			try:
+				if len(item) == 6:
+					count += authordict[item].countwordsinworks()
+				else:
+					count += workdict[item[:10]].wordcount
+			except (KeyError, TypeError):
+				# TypeError: unsupported operand type(s) for +=: 'int' and 'NoneType'
+				pass
+		return count
+
+	def _rebuild(self):
+		demand = self.ledger.scores()
+
+		# [a] requested selections that can be replayed: 'gr0001x001' depends on the passage exclusions of a session
+		for selection in demand:
+			if selection in self.pending or selection in self.finished:
+				continue
+			if any(len(s) > 6 and s[6] == 'x' for s in selection):
+				continue
+			wordcount = self.selectionwordcount(list(selection))
+			if wordcount < hipparchia.config['MAXVECTORSPACE']:
+				self.pending[selection] = (list(selection), wordcount, 0.0)
+
+		# [b] what each author has been asked about
+		authordemand = dict()
+		for selection in demand:
+			for a in {s[:6] for s in selection}:
+				authordemand[a] = authordemand.get(a, 0.0) + demand[selection]
+
+		weight = hipparchia.config['VECTORBOTDEMANDWEIGHT']
+		self.heap = list()
+		for key in self.pending:
+			searchlist, wordcount, baseline = self.pending[key]
+			if key in demand:
+				requested = demand[key]
+			else:
+				# [c]
+				requested = sum(authordemand.get(a[:6], 0.0) for a in key) / len(key)
+			heapq.heappush(self.heap, (-(weight * requested + baseline), key))
+
+		self.builtfromversion = self.ledger.version()
+
+	def nextjob(self) -> tuple:
+		"""
+
+		(searchlist, wordcount) for the most urgent item or None if the queue is empty
+
+		:return:
+		"""
+
+		with self.lock:
+			if self.stopped:
+				return None
+			if self.builtfromversion != self.ledger.version():
+				self._rebuild()
+			while self.heap:
+				priority, key = heapq.heappop(self.heap)
+				if key in self.pending:
+					searchlist, wordcount, baseline = self.pending.pop(key)
+					self.finished.add(key)
+					return searchlist, wordcount
+			return None
+
+	def haswork(self) -> bool:
+		"""
+
+		is there anything for nextjob() to hand out? new requests count: the queue keeps growing as long as people
+		keep asking for models
+
+		:return:
+		"""
+
+		with self.lock:
+			if self.stopped:
+				return False
+			if self.builtfromversion != self.ledger.version():
+				self._rebuild()
+			return len(self.pending) != 0
+
+	def clear(self):
+		with self.lock:
+			self.stopped = True
+			self.pending = dict()
+			self.heap = list()
+
+	def remaining(self) -> int:
+		with self.lock:
+			return len(self.pending)
+
+
+# set inside of the processes of the vectorbot pool: see becomevectorbotworker()
+pausesignal = None
+
+
+def searchesareactive() -> bool:
+	return len(progresspolldict.keys()) != 0
+
+
+def becomevectorbotworker(signal):
+	"""
+
+	the initializer of the processes of the vectorbot pool
+
+	the worker calls itself 'vectorbot' so that ConnectionObject() keeps it out of the pool and yieldtosearches()
+	knows that it is allowed to pause it
+
+	the searches run in the parent process and so the worker cannot see its progresspolldict: the parent raises
+	'signal' while they are running
+
+	:param signal:
+	:return:
+	"""
+
+	global pausesignal
+	pausesignal = signal
+	threading.current_thread().name = 'vectorbot'
+
+
+def yieldtosearches():
+	"""
+
+	block while somebody is searching
+
+	the vectorbot calls this at the end of every training epoch; the old bot could only pause between whole models
+	and then always slept for 30s
+
+	:return:
+	"""
+
+	if threading.current_thread().name != 'vectorbot':
+		return
+
+	interval = hipparchia.config['VECTORBOTYIELDINTERVAL']
+
+	if pausesignal is not None:
+		while pausesignal.is_set():
+			time.sleep(interval)
+		return
+
+	while searchesareactive():
+		time.sleep(interval)
+
+
+def freedbconnections() -> int:
+	"""
+
+	how many more connections will postgres accept?
+
+	:return:
+	"""
+
+	q = """
+	SELECT (SELECT setting::int FROM pg_settings WHERE name = 'max_connections') - (SELECT count(*) FROM pg_stat_activity)
+	"""
+
+	dbconnection = ConnectionObject()
+	dbcursor = dbconnection.cursor()
+	try:
+		dbcursor.execute(q)
+		free = dbcursor.fetchone()[0]
+	except psycopg2.Error:
+		free = None
+	dbconnection.connectioncleanup()
+
+	if free is None:
+		# can't tell: do not let this be the thing that stops the bot
+		free = hipparchia.config['VECTORBOTMAXCONCURRENT'] * (setthreadcount() + 2)
+
+	return free
+
+
+def availablevectorbotslots(running: int) -> int:
+	"""
+
+	how many models can be built at once right now?
+
+	every job wants setthreadcount() cpus for Word2Vec() and about as many db connections for grabbing its lines;
+	the load average includes the jobs that are already running, so they are added back in
+
+	there is always room for one job: that is what the old bot did no matter what
+
+	:param running:
+	:return:
+	"""
+
+	perjob = setthreadcount()
+
+	try:
+		load = os.getloadavg()[0]
+	except (AttributeError, OSError):
+		# windows
+		load = 0
+
+	sparecpus = (os.cpu_count() or 1) - load + running * perjob
+	cpuslots = int(sparecpus // perjob)
+	dbslots = freedbconnections() // (perjob + 2) + running
+
+	return max(1, min(hipparchia.config['VECTORBOTMAXCONCURRENT'], cpuslots, dbslots))
@@ -18,7 +18,9 @@ from server.hipparchiaobjects.progresspoll import NullProgressPoll
 from server.hipparchiaobjects.searchobjects import SearchObject
 from server.semanticvectors.externalvectorsearches import externalvectors
 from server.semanticvectors.vectorpipeline import pythonvectors
-from server.startup import authordict, listmapper, progresspolldict
+from server.startup import authordict, listmapper
+from server.threading.vectorbotscheduler import VectorWorkQueue, availablevectorbotslots, becomevectorbotworker, \
+	searchesareactive
 
 
 def startvectorizing():
@@ -46,10 +48,19 @@ def startvectorizing():
 
 	linux does not seem to have this problem
 
+	the work is handed out by a VectorWorkQueue: what people have been asking for goes first; as many models get
+	built at once as the spare cpus and db connections allow; a running job pauses at the end of its current
+	training epoch when a search comes in
+
+	every model is built in a worker process that was spawned (not forked): pythonvectors() forks search workers
+	of its own and forking out of this process, with its many busy threads, is asking for deadlocks
+
+	the bot does not quit when the queue runs dry: it waits for somebody to ask for a model that it has not built
+
 	:return:
 	"""
 
-	workpile = None
+	workpile = list()
 
 	commandlineargs = getcommandlineargs()
 
@@ -58,65 +69,123 @@ def startvectorizing():
 
 	# [(['gr2062'], 4182615), (['gr0057'], 2594166), (['gr4090'], 2202504), ...]
 
+	workqueue = VectorWorkQueue(workpile)
+	minwords = 500
+	interval = hipparchia.config['VECTORBOTYIELDINTERVAL']
+
+	context = multiprocessing.get_context('spawn')
+	pausesignal = context.Event()
+	workers = max(hipparchia.config['VECTORBOTMAXCONCURRENT'], 1)
+	pool = context.Pool(processes=workers, initializer=becomevectorbotworker, initargs=(pausesignal,))
+
+	# {AsyncResult: (searchlist, wordcount), ...}
+	running = dict()
+	idle = False
+	# asking postgres how busy it is every second is a bit much
+	nextestimate = 0
+
+	while True:
+		if searchesareactive():
+			pausesignal.set()
+		else:
+			pausesignal.clear()
+
+		for r in [r for r in running if r.ready()]:
+			searchlist, wordcount = running.pop(r)
+			try:
+				jsonmessage = r.get()
+			except Exception as e:
+				consolewarning('vectorbot failed on {s}: {e}'.format(s=searchlist, e=e), color='red')
+				jsonmessage = str()
+			reportonselection(searchlist, wordcount, jsonmessage, workqueue)
+			nextestimate = 0
+
+		if workqueue.stopped and not running:
+			break
+
+		cangrow = not pausesignal.is_set() and len(running) < workers and workqueue.haswork()
+		if cangrow and time.time() >= nextestimate:
+			if len(running) < availablevectorbotslots(len(running)):
+				job = workqueue.nextjob()
+				if job:
+					idle = False
+					searchlist, wordcount = job
+					if wordcount > minwords:
+						running[pool.apply_async(vectorizeoneselection, (searchlist,))] = (searchlist, wordcount)
+					continue
+			else:
+				nextestimate = time.time() + 10 * interval
+
+		if not running and not workqueue.haswork() and not idle:
+			idle = True
+			if multiprocessing.current_process().name == 'MainProcess':
+				consolewarning('vectorbot is idle: only items with fewer than {min} words remain; new requests will wake it up'.format(min=minwords), color='green')
+
+		time.sleep(interval)
+
+	pool.close()
+	pool.join()
+
+	return
+
+
+def vectorizeoneselection(searchlist: List[str]) -> str:
+	"""
+
+	build (or discover that somebody already built) the model for one selection
+
+	this runs inside of a process of the vectorbot pool
+
+	:param searchlist:
+	:return:
+	"""
+
 	if hipparchia.config['EXTERNALVECTORHELPER']:
 		vectorfunction = externalvectors
 	else:
 		vectorfunction = pythonvectors
 
-	emptypoll = NullProgressPoll(None)
-	modeltype = 'nearestneighborsquery'
-
-	minwords = 500
-
-	while workpile:
-		if len(progresspolldict.keys()) != 0:
-			# consolewarning('vectorbot pausing to make way for a search')
-			time.sleep(30)
+	so = buildfakesearchobject()
+	so.searchlist = searchlist
+	so.poll = NullProgressPoll(None)
+	so.vectorquerytype = 'nearestneighborsquery'
+	so.termone = 'FAKESEARCH'
 
-		# the typical searchlist is one item: ['lt1414']
-		searching = workpile.pop()
-		searchlist = searching[0]
-		wordcount = searching[1]
+	for c in hipparchia.config['CORPORATOAUTOVECTORIZE']:
+		so.session[c] = True
 
-		if wordcount > minwords:
-			so = buildfakesearchobject()
-			so.searchlist = searchlist
-			so.poll = emptypoll
-			so.vectorquerytype = modeltype
-			so.termone = 'FAKESEARCH'
+	return vectorfunction(so)
 
-			for c in hipparchia.config['CORPORATOAUTOVECTORIZE']:
-				so.session[c] = True
 
-			jsonmessage = vectorfunction(so)
+def reportonselection(searchlist: List[str], wordcount: int, jsonmessage: str, workqueue: VectorWorkQueue):
+	"""
 
-			if jsonmessage == '<!-- MODEL BUILT -->':
-				built = True
-			else:
-				built = False
+	what the bot says once a job is done
 
-			if '<!-- MODEL FAILED -->' in jsonmessage:
-				consolewarning('vectorbot failed on {s} and will be shutting down'.format(s=searchlist), color='red')
-				workpile = list()
-				jsonmessage = None
+	:param searchlist:
+	:param wordcount:
+	:param jsonmessage:
+	:param workqueue:
+	:return:
+	"""
 
-			if '<!-- MODEL EXISTS -->' in jsonmessage:
-				# debugmessage('startvectorizing() says that {i} has already been built'.format(i=searchlist[0]))
-				pass
+	built = jsonmessage == '<!-- MODEL BUILT -->'
 
-			if built and len(searchlist) > 1:
-				v = '{i}+ {n} more items vectorized ({w} words)'
-			else:
-				v = '{i} vectorized ({w} words)'
+	if '<!-- MODEL FAILED -->' in jsonmessage:
+		consolewarning('vectorbot failed on {s} and will be shutting down'.format(s=searchlist), color='red')
+		workqueue.clear()
 
-			if built and wordcount > 5000:
-				consolewarning(v.format(i=searchlist[0], w=wordcount, n=len(searchlist) - 1), color='green', isbold=False)
+	if built and len(searchlist) > 1:
+		v = '{i}+ {n} more items vectorized ({w} words)'
+	else:
+		v = '{i} vectorized ({w} words)'
 
-			if built and len(workpile) % 25 == 0:
-				consolewarning('{n} items remain to vectorize'.format(n=len(workpile)), color='green', isbold=False)
+	if built and wordcount > 5000:
+		consolewarning(v.format(i=searchlist[0], w=wordcount, n=len(searchlist) - 1), color='green', isbold=False)
 
-	if hipparchia.config['AUTOVECTORIZE'] and multiprocessing.current_process().name == 'MainProcess':
-		consolewarning('vectorbot shutting down: only items with fewer than {min} words remain'.format(min=minwords), color='green')
+	remaining = workqueue.remaining()
+	if built and remaining % 25 == 0:
+		consolewarning('{n} items remain to vectorize'.format(n=remaining), color='green', isbold=False)
 
 	return
 
@@ -243,5 +312,7 @@ def buildfakesearchobject(qtype='nearestneighborsquery') -> SearchObject:
 	return so
 
 
-vectorbot = threading.Thread(target=startvectorizing, name='vectorbot', args=tuple())
-vectorbot.start()
+if multiprocessing.current_process().name == 'MainProcess':
+	# the spawned workers of the vectorbot pool import this module too: they must not start a bot of their own
+	vectorbot = threading.Thread(target=startvectorizing, name='vectorbot', args=tuple(), daemon=True)
+	vectorbot.start()